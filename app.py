@@ -2,16 +2,24 @@
 """
 AI Security Scanner Platform - AWS CDK Application
 Implements secure-by-default infrastructure patterns from ZipHQ [citation:10]
+
+Stacks (see stacks/registry.py for what each depends on):
+  1. network   - Main VPC + Sandbox VPC + Peering
+  2. database  - RDS PostgreSQL with Secrets Manager
+  3. redis     - ElastiCache
+  4. ecs       - Django Backend + Celery Workers
+  5. lambda    - AI Script Generator + Sandbox Detonator
+  6. frontend  - AWS Amplify (Next.js)
+  7. cicd      - CodePipeline with tfsec Security Scanning
+
+Build a subset with -c stacks=lambda,network (dependencies are added);
+add -c stack_dependencies=lookup to read them from SSM instead.
 """
 
+import os
+
 import aws_cdk as cdk
-from stacks.network_stack import NetworkStack
-from stacks.database_stack import DatabaseStack
-from stacks.redis_stack import RedisStack
-from stacks.ecs_stack import EcsStack
-from stacks.lambda_stack import LambdaStack
-from stacks.frontend_stack import FrontendStack
-from stacks.cicd_stack import CicdStack
+from stacks import registry
 
 app = cdk.App()
 
@@ -35,105 +43,13 @@ tags = {
 }
 
 # ============================================================================
-# STACK 1: NETWORK - Main VPC + Sandbox VPC + Peering
-# ============================================================================
-network_stack = NetworkStack(
-    app, f"{project_name}-{environment}-network",
-    env=env,
-    tags=tags,
-    environment=environment,
-    project_name=project_name
-)
-
-# ============================================================================
-# STACK 2: DATABASE - RDS PostgreSQL with Secrets Manager
-# ============================================================================
-db_stack = DatabaseStack(
-    app, f"{project_name}-{environment}-database",
-    vpc=network_stack.main_vpc,
-    ecs_security_group=network_stack.ecs_tasks_sg,
-    env=env,
-    tags=tags,
-    environment=environment,
-    project_name=project_name
-)
-db_stack.add_dependency(network_stack)
-
-# ============================================================================
-# STACK 3: REDIS - ElastiCache
-# ============================================================================
-redis_stack = RedisStack(
-    app, f"{project_name}-{environment}-redis",
-    vpc=network_stack.main_vpc,
-    ecs_security_group=network_stack.ecs_tasks_sg,
-    env=env,
-    tags=tags,
-    environment=environment,
-    project_name=project_name
-)
-redis_stack.add_dependency(network_stack)
-
-# ============================================================================
-# STACK 4: ECS - Django Backend + Celery Workers
-# ============================================================================
-ecs_stack = EcsStack(
-    app, f"{project_name}-{environment}-ecs",
-    vpc=network_stack.main_vpc,
-    ecs_security_group=network_stack.ecs_tasks_sg,
-    alb_security_group=network_stack.alb_sg,
-    rds_instance=db_stack.rds_instance,
-    redis_cluster=redis_stack.redis_cluster,
-    rds_secret=db_stack.rds_secret,
-    openai_secret=db_stack.openai_secret,  # From DatabaseStack
-    env=env,
-    tags=tags,
-    environment=environment,
-    project_name=project_name
-)
-ecs_stack.add_dependency(db_stack)
-ecs_stack.add_dependency(redis_stack)
-
-# ============================================================================
-# STACK 5: LAMBDA - AI Script Generator + Sandbox Detonator
-# ============================================================================
-lambda_stack = LambdaStack(
-    app, f"{project_name}-{environment}-lambda",
-    main_vpc=network_stack.main_vpc,
-    sandbox_vpc=network_stack.sandbox_vpc,
-    ecs_security_group=network_stack.ecs_tasks_sg,
-    sandbox_lambda_sg=network_stack.sandbox_lambda_sg,
-    openai_secret=db_stack.openai_secret,
-    env=env,
-    tags=tags,
-    environment=environment,
-    project_name=project_name
-)
-lambda_stack.add_dependency(db_stack)
-lambda_stack.add_dependency(network_stack)
-
-# ============================================================================
-# STACK 6: FRONTEND - AWS Amplify (Next.js)
-# ============================================================================
-frontend_stack = FrontendStack(
-    app, f"{project_name}-{environment}-frontend",
-    alb_dns=ecs_stack.alb.load_balancer_dns_name,
-    env=env,
-    tags=tags,
-    environment=environment,
-    project_name=project_name
-)
-frontend_stack.add_dependency(ecs_stack)
-
-# ============================================================================
-# STACK 7: CI/CD - CodePipeline with tfsec Security Scanning
+# STACK SELECTION - requested stacks plus their dependency closure
 # ============================================================================
-cicd_stack = CicdStack(
-    app, f"{project_name}-{environment}-cicd",
-    env=env,
-    tags=tags,
-    environment=environment,
-    project_name=project_name
+selected = registry.select(
+    registry.parse(app.node.try_get_context("stacks")),
+    lookup=str(app.node.try_get_context("stack_dependencies")).lower() == "lookup"
 )
+registry.build(app, selected, env, tags, environment, project_name)
 
 # ============================================================================
 # SYNTHESIZE
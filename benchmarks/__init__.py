@@ -0,0 +1,17 @@
+"""
+Local benchmarks for the scanner Lambda handlers and the CDK app.
+Run with `python -m benchmarks.<name>` from the repository root; no AWS needed.
+
+- handlers:        both handlers end to end (cold/warm, percentiles, throughput, RSS)
+- detonator_spawn: per-script process start-up, subprocess vs zygote
+- import_time:     handler init cost from `-X importtime`, per request path
+- sqs_batches:     queued detonation throughput by SQS batch size, partial failures
+- synth_timing:    `cdk synth` cost per stack selection (needs aws-cdk-lib)
+- result_writer:   verdict write strategies + failover drill (needs a PostgreSQL)
+- llm_rate_limit:  generator against a 429ing stub, per limiter setup + breaker drill
+- probe_harness:   multi-probe scripts, ad-hoc urllib vs pooled scanner_probe
+- target_fanout:   one finding on many hosts, per-host generation vs fan-out
+
+Reports share the envelope in benchmarks.report; pass `--json` to keep one
+and `--compare` with an earlier report to see what moved between commits.
+"""
@@ -0,0 +1,85 @@
+"""
+Per-script spawn overhead of the detonator: fresh interpreter vs warm zygote.
+
+    python -m benchmarks.detonator_spawn [--runs 50] [--json out.json]
+
+The script under test only does the imports generated scripts typically make,
+so the measured time is almost entirely process start-up overhead.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+DETONATOR_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'lambda', 'script_detonator')
+sys.path.insert(0, DETONATOR_DIR)
+
+import execution  # noqa: E402
+
+PROBE_SCRIPT = """
+import json, socket, ssl, http.client, urllib.request, urllib.parse
+import os, sys
+print(json.dumps({'target': os.environ.get('TARGET_URL')}))
+sys.exit(1)
+"""
+
+
+def _measure(script_path, runs, use_zygote):
+    os.environ['DETONATOR_USE_ZYGOTE'] = 'true' if use_zygote else 'false'
+    env = dict(os.environ, TARGET_URL='http://127.0.0.1:9', SCAN_ID='bench')
+    if use_zygote:
+        execution.warm_up()
+        # Let the zygote finish its preloads before timing anything
+        execution.run_script(script_path, env, timeout=30)
+
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = execution.run_script(script_path, env, timeout=30)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert result.returncode == 1, result.stderr
+    samples.sort()
+    return {
+        'runner': result.runner,
+        'runs': runs,
+        'mean_ms': round(statistics.mean(samples), 2),
+        'p50_ms': round(samples[len(samples) // 2], 2),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+        'min_ms': round(samples[0], 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--json', help="write results to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as f:
+        f.write(PROBE_SCRIPT)
+        script_path = f.name
+    try:
+        before = _measure(script_path, args.runs, use_zygote=False)
+        after = _measure(script_path, args.runs, use_zygote=True)
+    finally:
+        os.unlink(script_path)
+
+    report = {
+        'benchmark': 'detonator_spawn',
+        'subprocess': before,
+        'zygote': after,
+        'speedup_p50': round(before['p50_ms'] / after['p50_ms'], 2) if after['p50_ms'] else None,
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
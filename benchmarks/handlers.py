@@ -0,0 +1,234 @@
+"""
+End-to-end benchmarks for both Lambda handlers, entirely offline.
+
+    python -m benchmarks.handlers [--only generator|detonator] [--runs 30]
+        [--concurrency 8] [--stub-latency-ms 250] [--chunk-delay-ms 5]
+        [--json out.json] [--compare baseline.json]
+
+Generator: lambda_handler against pipeline.stub_openai (configurable latency
+and token streaming), blocking and streaming modes, caches off.
+Detonator: lambda_handler with a corpus of representative scripts - fast,
+slow, chatty (megabytes of output) and one that always times out.
+
+For each scenario the report has cold start (fresh interpreter: import +
+first invocation), warm latency percentiles, and latency/throughput with
+`concurrency` invocations in flight. Each handler is measured in its own
+child process so its peak RSS (and that of the scripts it ran) is its own.
+The generator section is skipped when the openai package is not installed.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import report
+
+TARGET_URL = 'http://127.0.0.1:9/login'
+
+# Representative detonator workloads: (script, timeout seconds, expected status)
+CORPUS = {
+    'fast': ("import sys\nprint('probing target')\nsys.exit(1)\n", 30, 200),
+    'slow': ("import sys, time\ntime.sleep(0.5)\nprint('done')\nsys.exit(1)\n", 30, 200),
+    'chatty': ("import sys\nfor i in range(100000):\n    print(f'response line {i}: ' + 'x' * 60)\nsys.exit(1)\n",
+               30, 200),
+    'timeout': ("import time\nwhile True:\n    time.sleep(0.1)\n", 1, 408),
+}
+
+# Slow scenarios get fewer sequential runs so the suite finishes in minutes
+RUNS_DIVISOR = {'fast': 1, 'chatty': 5, 'slow': 10, 'timeout': 30}
+
+GENERATOR_ENV = {
+    'OPENAI_API_KEY': 'benchmark',
+    'MODEL_FAST': '',
+    'SCRIPT_CACHE_BACKEND': 'none',
+    'SEMANTIC_CACHE': 'false',
+}
+
+DETONATOR_ENV = {
+    'RESULT_CACHE_BACKEND': 'none',
+}
+
+
+def _generator_events(mode):
+    def make(i):
+        return {
+            'vulnerability': f'SQL injection in login form, variant {i}',
+            'target_url': TARGET_URL,
+            'scan_id': 'bench',
+            'stream': mode == 'stream',
+            'bypass_cache': True,
+        }
+    return make
+
+
+def _detonator_events(scenario):
+    script, timeout, _ = CORPUS[scenario]
+
+    def make(i):
+        return {'script': script, 'target_url': TARGET_URL, 'scan_id': f'bench-{i}', 'timeout': timeout}
+    return make
+
+
+def _invoke(handler, event):
+    from pipeline.invokers import LocalContext
+    started = time.perf_counter()
+    response = handler(event, LocalContext('benchmark'))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    body = response.get('body')
+    return response.get('statusCode'), json.loads(body) if isinstance(body, str) else body, elapsed_ms
+
+
+def _scenario(handler, make_event, runs, concurrency, expected_status, ttft=False):
+    """Warm sequential latency, then `concurrency` invocations in flight"""
+    errors = 0
+    status, _, first_ms = _invoke(handler, make_event(0))
+    errors += status != expected_status
+
+    latencies, ttfts = [], []
+    for i in range(runs):
+        status, body, elapsed_ms = _invoke(handler, make_event(i + 1))
+        errors += status != expected_status
+        latencies.append(elapsed_ms)
+        if ttft and body.get('generation', {}).get('ttft_ms') is not None:
+            ttfts.append(body['generation']['ttft_ms'])
+
+    calls = max(runs, concurrency * 2)
+    concurrent_latencies = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for status, _, elapsed_ms in pool.map(lambda i: _invoke(handler, make_event(10000 + i)), range(calls)):
+            errors += status != expected_status
+            concurrent_latencies.append(elapsed_ms)
+    wall = time.perf_counter() - started
+
+    result = {
+        'first_warm_invoke_ms': round(first_ms, 2),
+        'warm': report.latency_stats(latencies),
+        'concurrent': dict(
+            report.latency_stats(concurrent_latencies),
+            concurrency=concurrency,
+            throughput_per_second=round(calls / wall, 2),
+        ),
+        'errors': errors,
+    }
+    if ttfts:
+        result['ttft'] = report.latency_stats(ttfts)
+    return result
+
+
+def _cold_start(handler_name, event, env):
+    """Import + first invocation in a fresh interpreter"""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.handlers', '--cold-probe', handler_name, '--event', json.dumps(event)],
+        cwd=report.REPO_ROOT, env=env, capture_output=True, text=True, timeout=300
+    )
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1:]}
+    result = json.loads(completed.stdout)
+    result['process_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def _cold_probe(handler_name, event):
+    from pipeline import invokers
+    started = time.perf_counter()
+    handler = invokers.load_handler(handler_name)
+    imported = time.perf_counter()
+    status, _, first_ms = _invoke(handler, event)
+    print(json.dumps({
+        'import_ms': round((imported - started) * 1000, 2),
+        'first_invoke_ms': round(first_ms, 2),
+        'total_ms': round((time.perf_counter() - started) * 1000, 2),
+        'status': status,
+    }))
+
+
+def _generator_suite(args):
+    from pipeline import invokers
+    from pipeline.stub_openai import StubOpenAI
+
+    results = {}
+    with StubOpenAI(latency_ms=args.stub_latency_ms, chunk_delay_ms=args.chunk_delay_ms) as stub:
+        os.environ.update(GENERATOR_ENV, OPENAI_BASE_URL=stub.base_url)
+        os.environ.pop('OPENAI_SECRET_ARN', None)
+        results['cold_start'] = _cold_start('generator', _generator_events('blocking')(0), dict(os.environ))
+        handler = invokers.load_handler('generator')
+        for mode in ('blocking', 'stream'):
+            results[mode] = _scenario(handler, _generator_events(mode), args.runs, args.concurrency,
+                                      200, ttft=mode == 'stream')
+        results['stub_requests'] = stub.stats()['requests']
+    results['peak_rss_mb'] = report.peak_rss_mb()
+    return results
+
+
+def _detonator_suite(args):
+    from pipeline import invokers
+
+    os.environ.update(DETONATOR_ENV)
+    results = {'cold_start': _cold_start('detonator', _detonator_events('fast')(0), dict(os.environ))}
+    handler = invokers.load_handler('detonator')
+    for scenario, (_, _, expected_status) in CORPUS.items():
+        runs = max(2, args.runs // RUNS_DIVISOR[scenario])
+        concurrency = min(args.concurrency, runs)
+        results[scenario] = _scenario(handler, _detonator_events(scenario), runs, concurrency, expected_status)
+    results['peak_rss_mb'] = report.peak_rss_mb()
+    return results
+
+
+def _run_suite_in_child(name, args):
+    command = [sys.executable, '-m', 'benchmarks.handlers', '--suite', name,
+               '--runs', str(args.runs), '--concurrency', str(args.concurrency),
+               '--stub-latency-ms', str(args.stub_latency_ms), '--chunk-delay-ms', str(args.chunk_delay_ms)]
+    completed = subprocess.run(command, cwd=report.REPO_ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-3:]}
+    return json.loads(completed.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', choices=['generator', 'detonator'])
+    parser.add_argument('--runs', type=int, default=30, help='sequential warm invocations per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--stub-latency-ms', type=int, default=250, help='stub model latency before the first token')
+    parser.add_argument('--chunk-delay-ms', type=int, default=5, help='stub delay between streamed lines')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    # Internal: child process modes
+    parser.add_argument('--suite', choices=['generator', 'detonator'], help=argparse.SUPPRESS)
+    parser.add_argument('--cold-probe', choices=['generator', 'detonator'], help=argparse.SUPPRESS)
+    parser.add_argument('--event', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.cold_probe:
+        _cold_probe(args.cold_probe, json.loads(args.event))
+        return
+    if args.suite:
+        suite = _generator_suite if args.suite == 'generator' else _detonator_suite
+        print(json.dumps(suite(args)))
+        return
+
+    results = {}
+    if args.only in (None, 'generator'):
+        if importlib.util.find_spec('openai') is None:
+            results['generator'] = {'skipped': 'openai package not installed'}
+        else:
+            results['generator'] = _run_suite_in_child('generator', args)
+    if args.only in (None, 'detonator'):
+        results['detonator'] = _run_suite_in_child('detonator', args)
+
+    report.emit(
+        report.new_report('handlers', results, runs=args.runs, concurrency=args.concurrency,
+                          stub_latency_ms=args.stub_latency_ms, chunk_delay_ms=args.chunk_delay_ms),
+        json_path=args.json, compare_path=args.compare
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Init cost of each handler module, from `python -X importtime`.
+
+    python -m benchmarks.import_time [--runs 5] [--top 10] [--json out.json] [--compare baseline.json]
+
+Every run is a fresh interpreter that imports the handler's index.py the way
+Lambda does (handler dir + shared layer on sys.path) and then, per scenario:
+- import:           nothing else
+- rejected_request: invokes it with an invalid event (400)
+- first_request:    generator only - a real generation against the local stub
+                    OpenAI server (skipped when openai is not installed)
+Reported per scenario: median process wall time, index import and invoke
+times, which heavy packages ended up loaded, and the most expensive imports.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from benchmarks import report
+
+HANDLERS = {
+    'generator': os.path.join(report.REPO_ROOT, 'lambda', 'ai_script_generator'),
+    'detonator': os.path.join(report.REPO_ROOT, 'lambda', 'script_detonator'),
+}
+COMMON_LAYER_DIR = os.path.join(report.REPO_ROOT, 'lambda', 'common', 'python')
+
+# Packages whose presence after a request says an import was not deferred
+HEAVY_PACKAGES = ('openai', 'httpx', 'pydantic', 'boto3', 'botocore', 'numpy')
+
+DRIVER = """
+import json, sys, time
+sys.path[:0] = {paths!r}
+started = time.perf_counter()
+import index
+result = {{'import_ms': (time.perf_counter() - started) * 1000}}
+event = {event!r}
+if event is not None:
+    class Context:
+        function_name = 'import-time'
+        def get_remaining_time_in_millis(self):
+            return 300000
+    invoked = time.perf_counter()
+    response = index.lambda_handler(event, Context())
+    result['invoke_ms'] = (time.perf_counter() - invoked) * 1000
+    result['status'] = response['statusCode']
+result['heavy_loaded'] = sorted(m for m in {heavy!r} if m in sys.modules)
+print(json.dumps(result))
+"""
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def top_imports(entries, limit):
+    """Most expensive top-level packages by cumulative time (handler modules excluded)"""
+    by_package = {}
+    for module, _, cumulative_us, _ in entries:
+        if module == 'index':
+            continue
+        package = module.split('.')[0]
+        by_package[package] = max(by_package.get(package, 0), cumulative_us)
+    ranked = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [{'package': package, 'cumulative_ms': round(us / 1000, 2)} for package, us in ranked]
+
+
+def _run_once(handler, event, env):
+    code = DRIVER.format(paths=[COMMON_LAYER_DIR, HANDLERS[handler]], event=event, heavy=HEAVY_PACKAGES)
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=HANDLERS[handler], env=env, capture_output=True, text=True, timeout=300
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    entries = parse_importtime(completed.stderr)
+    result['process_import_ms'] = round(sum(self_us for _, self_us, _, _ in entries) / 1000, 2)
+    return result, entries
+
+
+def _scenario(handler, event, env, runs, top):
+    samples = []
+    entries = []
+    for _ in range(runs):
+        result, entries = _run_once(handler, event, env)
+        samples.append(result)
+
+    def median(key):
+        values = [s[key] for s in samples if key in s]
+        return round(statistics.median(values), 2) if values else None
+
+    summary = {
+        'runs': runs,
+        'index_import_ms': median('import_ms'),
+        'all_imports_ms': median('process_import_ms'),
+        'heavy_loaded': samples[-1]['heavy_loaded'],
+        'top_imports': top_imports(entries, top),
+    }
+    if event is not None:
+        summary['invoke_ms'] = median('invoke_ms')
+        summary['status'] = samples[-1].get('status')
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='expensive packages to list per scenario')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, OPENAI_API_KEY='benchmark', SCRIPT_CACHE_BACKEND='none', SEMANTIC_CACHE='false',
+               RESULT_CACHE_BACKEND='none', MODEL_FAST='')
+    env.pop('OPENAI_SECRET_ARN', None)
+    env.pop('TIMING_METRICS', None)
+
+    results = {}
+    for handler in HANDLERS:
+        results[handler] = {
+            'import': _scenario(handler, None, env, args.runs, args.top),
+            'rejected_request': _scenario(handler, {}, env, args.runs, args.top),
+        }
+
+    if importlib.util.find_spec('openai') is None:
+        results['generator']['first_request'] = {'skipped': 'openai package not installed'}
+    else:
+        from pipeline.stub_openai import StubOpenAI
+        with StubOpenAI() as stub:
+            event = {'vulnerability': 'SQL injection in login form', 'target_url': 'http://127.0.0.1:9/login'}
+            results['generator']['first_request'] = _scenario(
+                'generator', event, dict(env, OPENAI_BASE_URL=stub.base_url), args.runs, args.top
+            )
+
+    report.emit(report.new_report('import_time', results, runs=args.runs),
+                json_path=args.json, compare_path=args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Generator behaviour against a rate-limited LLM endpoint, per limiter setup.
+
+    python -m benchmarks.llm_rate_limit [--requests 60] [--concurrency 16]
+        [--stub-rps 10] [--stub-latency-ms 100] [--json out.json] [--compare baseline.json]
+
+Runs lambda_handler in-process against pipeline.stub_openai throttling past
+--stub-rps requests per second (429 with retry-after-ms), `concurrency`
+invocations in flight:
+
+- no_retry: no buckets, no retries - every 429 becomes a 503
+- retry:    jittered backoff honoring Retry-After, no buckets
+- limiter:  memory token bucket just under the stub's limit, plus retry
+- shed:     limiter with a 1s wait budget and three times the load - the
+            excess should come back as fast 503s, not slow ones
+
+Each reports successes, 503s, 429s the stub sent (throttle rate), latency
+percentiles and the mean rate_limit_wait / retry_backoff per invocation.
+Then a breaker drill: sequential calls into a saturated endpoint must stop
+reaching it once the circuit opens. Needs the openai package.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import report
+
+BASE_ENV = {
+    'OPENAI_API_KEY': 'benchmark',
+    'MODEL_FAST': '',
+    'SCRIPT_CACHE_BACKEND': 'none',
+    'SEMANTIC_CACHE': 'false',
+    'PREFLIGHT_SCRIPTS': 'false',
+    'STREAM_GENERATION': 'false',
+    'TIMING_METRICS': 'false',
+}
+
+
+def _scenarios(rps):
+    # 90% of the stub's limit, refilled continuously; the stub counts a rolling
+    # second, so a burst on top of the refill would walk straight into 429s
+    limits = json.dumps({'*': {'rpm': int(rps * 60 * 0.9)}})
+    return {
+        'no_retry': {'LLM_RATE_LIMIT_BACKEND': 'none', 'LLM_MAX_RETRIES': '0', 'LLM_BREAKER_THRESHOLD': '1000'},
+        'retry': {'LLM_RATE_LIMIT_BACKEND': 'none', 'LLM_MAX_RETRIES': '8', 'LLM_BREAKER_THRESHOLD': '1000'},
+        'limiter': {'LLM_RATE_LIMIT_BACKEND': 'memory', 'LLM_RATE_LIMITS': limits,
+                    'LLM_RATE_LIMIT_BURST_SECONDS': '0.1', 'LLM_MAX_RETRIES': '8',
+                    'LLM_BREAKER_THRESHOLD': '1000'},
+        'shed': {'LLM_RATE_LIMIT_BACKEND': 'memory', 'LLM_RATE_LIMITS': limits,
+                 'LLM_RATE_LIMIT_BURST_SECONDS': '0.1', 'LLM_RATE_LIMIT_MAX_WAIT_SECONDS': '1',
+                 'LLM_MAX_RETRIES': '8', 'LLM_BREAKER_THRESHOLD': '1000'},
+    }
+
+
+def _configure(env):
+    from scanner_common import rate_limit
+    for name in [k for k in os.environ if k.startswith('LLM_')]:
+        del os.environ[name]
+    os.environ.update(env)
+    # A fresh limiter (buckets, breakers) per scenario
+    rate_limit._limiter = None
+
+
+def _invoke(handler, i):
+    from pipeline.invokers import LocalContext
+    event = {'vulnerability': f'SQL injection in login form, variant {i}', 'target_url': 'http://127.0.0.1:9/login',
+             'stream': False, 'bypass_cache': True, 'timings': True}
+    started = time.perf_counter()
+    response = handler(event, LocalContext('benchmark', timeout_ms=60000))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return response['statusCode'], elapsed_ms, json.loads(response['body']).get('timings', {})
+
+
+def _run(handler, stub, requests, concurrency):
+    before = stub.stats()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda i: _invoke(handler, i), range(requests)))
+    elapsed = time.perf_counter() - started
+    after = stub.stats()
+
+    statuses = [status for status, _, _ in outcomes]
+    served = after['requests'] - before['requests']
+    throttled = after['throttled'] - before['throttled']
+    return {
+        'ok': statuses.count(200),
+        'unavailable_503': statuses.count(503),
+        'errors_500': statuses.count(500),
+        'stub_throttled': throttled,
+        'throttle_rate': round(throttled / max(1, served + throttled), 3),
+        'latency_ms': report.latency_stats([ms for status, ms, _ in outcomes if status == 200]),
+        'latency_503_ms': report.latency_stats([ms for status, ms, _ in outcomes if status == 503]),
+        'mean_rate_limit_wait_ms': round(sum(t.get('rate_limit_wait', 0) for _, _, t in outcomes) / requests, 2),
+        'mean_retry_backoff_ms': round(sum(t.get('retry_backoff', 0) for _, _, t in outcomes) / requests, 2),
+        'elapsed_ms': round(elapsed * 1000, 2),
+        'throughput_per_second': round(statuses.count(200) / elapsed, 2),
+    }
+
+
+def _breaker_drill(handler, stub, calls=20, threshold=3):
+    """Saturate the stub, then call sequentially: only the calls before the circuit opens reach it"""
+    _configure({'LLM_RATE_LIMIT_BACKEND': 'none', 'LLM_MAX_RETRIES': '0',
+                'LLM_BREAKER_THRESHOLD': str(threshold), 'LLM_BREAKER_RESET_SECONDS': '60'})
+    saved, stub.rate_limit_rps = stub.rate_limit_rps, 1
+    stub._admitted = [time.monotonic() + 3600]
+    try:
+        before = stub.stats()
+        outcomes = [_invoke(handler, i) for i in range(calls)]
+        after = stub.stats()
+    finally:
+        stub.rate_limit_rps = saved
+        stub._admitted = []
+    reached = after['throttled'] - before['throttled'] + after['requests'] - before['requests']
+    return {
+        'calls': calls,
+        'reached_endpoint': reached,
+        'shed': sum(1 for status, _, _ in outcomes if status == 503) - reached,
+        'ok': reached == threshold,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--stub-rps', type=int, default=10)
+    parser.add_argument('--stub-latency-ms', type=int, default=100)
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    args = parser.parse_args(argv)
+
+    from pipeline.stub_openai import StubOpenAI
+    from pipeline import invokers
+
+    os.environ.update(BASE_ENV)
+    results = {}
+    with StubOpenAI(latency_ms=args.stub_latency_ms, rate_limit_rps=args.stub_rps) as stub:
+        os.environ['OPENAI_BASE_URL'] = stub.base_url
+        handler = invokers.load_handler('generator')
+        for name, env in _scenarios(args.stub_rps).items():
+            _configure(env)
+            requests = args.requests * 3 if name == 'shed' else args.requests
+            results[name] = _run(handler, stub, requests, args.concurrency)
+            # Let the stub's window drain between scenarios
+            time.sleep(1.0)
+        results['breaker'] = _breaker_drill(handler, stub)
+
+    report.emit(
+        report.new_report('llm_rate_limit', results, requests=args.requests, concurrency=args.concurrency,
+                          stub_rps=args.stub_rps, stub_latency_ms=args.stub_latency_ms),
+        json_path=args.json, compare_path=args.compare
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Multi-probe validation scripts: ad-hoc urllib vs the scanner_probe helper.
+
+    python -m benchmarks.probe_harness [--probes 30] [--runs 10]
+        [--latency-ms 5] [--connect-delay-ms 20] [--json out.json] [--compare baseline.json]
+
+Each variant sends the same `probes` requests to a local HTTP/1.1 target
+through the detonator's lambda_handler (zygote on, caches off):
+
+- urllib:        urlopen per probe, a new connection each time - what
+                 generated scripts used to do
+- probe:         scanner_probe.get per probe over one keep-alive connection
+- probe_many:    scanner_probe.many, PROBE_WORKERS probes in flight
+
+The target sleeps latency_ms per request and connect_delay_ms per new
+connection (standing in for TCP/TLS set-up on a real network). Also checks
+that the handler lifts the evidence and verdict lines into "probe".
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks import report
+
+SCRIPTS = {
+    'urllib': '''import os, sys, urllib.request
+base = os.environ['TARGET_URL']
+for i in range({probes}):
+    with urllib.request.urlopen(f"{{base}}/item/{{i}}", timeout=5) as r:
+        r.read()
+print("done")
+sys.exit(1)
+''',
+    'probe': '''import scanner_probe as probe
+for i in range({probes}):
+    r = probe.get(f"/item/{{i}}")
+    if r.error:
+        probe.evidence('error', r.error)
+probe.evidence('reachable', 'all items answered', r)
+probe.verdict(False, 'nothing found')
+''',
+    'probe_many': '''import scanner_probe as probe
+responses = probe.many([('GET', f"/item/{{i}}") for i in range({probes})])
+errors = [r for r in responses if r.error]
+for r in errors:
+    probe.evidence('error', r.error)
+probe.evidence('reachable', f"{{len(responses) - len(errors)}} items answered", responses[-1])
+probe.verdict(False, 'nothing found')
+''',
+}
+
+
+class _Target(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; like any real server, don't let Nagle hold the body
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        self.server.connections += 1
+        time.sleep(self.server.connect_delay)
+        super().setup()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def target_server(latency_ms, connect_delay_ms):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Target)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000.0
+    server.connect_delay = connect_delay_ms / 1000.0
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _variant(handler, server, script, runs):
+    from pipeline.invokers import LocalContext
+    target_url = f"http://127.0.0.1:{server.server_address[1]}"
+    samples, body = [], None
+    connections_before = server.connections
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = handler({'script': script, 'target_url': target_url, 'scan_id': 'bench', 'timeout': 60,
+                            'force_rerun': True}, LocalContext('benchmark'))
+        samples.append((time.perf_counter() - started) * 1000)
+        body = json.loads(response['body'])
+        assert response['statusCode'] == 200, body
+    probe = body.get('probe')
+    return {
+        'latency_ms': report.latency_stats(samples),
+        'connections_per_run': round((server.connections - connections_before) / runs, 1),
+        'evidence_records': len(probe['evidence']) if probe else 0,
+        'verdict_probes': (probe.get('verdict') or {}).get('probes') if probe else None,
+        'stdout_bytes': body['output']['stdout']['bytes'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--probes', type=int, default=30)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--latency-ms', type=float, default=5)
+    parser.add_argument('--connect-delay-ms', type=float, default=20)
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    args = parser.parse_args(argv)
+
+    os.environ.update(RESULT_CACHE_BACKEND='none', DETONATOR_USE_ZYGOTE='true', DETONATOR_PREFLIGHT='true')
+    from pipeline import invokers
+    handler = invokers.load_handler('detonator')
+    server = target_server(args.latency_ms, args.connect_delay_ms)
+    try:
+        results = {
+            name: _variant(handler, server, script.format(probes=args.probes), args.runs)
+            for name, script in SCRIPTS.items()
+        }
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    report.emit(
+        report.new_report('probe_harness', results, probes=args.probes, runs=args.runs,
+                          latency_ms=args.latency_ms, connect_delay_ms=args.connect_delay_ms),
+        json_path=args.json, compare_path=args.compare
+    )
+
+
+if __name__ == '__main__':
+    main()
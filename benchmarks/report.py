@@ -0,0 +1,132 @@
+"""
+Shared helpers for benchmark output: latency percentiles, peak RSS and JSON
+reports that can be compared across commits.
+"""
+
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Metrics where a bigger number is an improvement; everything else (latency,
+# memory) is better when smaller
+HIGHER_IS_BETTER = ('throughput_per_second', 'speedup')
+
+
+def percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of already sorted samples"""
+    if not sorted_samples:
+        return None
+    rank = max(0, min(len(sorted_samples) - 1, math.ceil(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[rank]
+
+
+def latency_stats(samples_ms):
+    """p50/p95/p99/mean/min/max of a list of millisecond samples"""
+    samples = sorted(samples_ms)
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples),
+        'mean_ms': round(sum(samples) / len(samples), 2),
+        'p50_ms': round(percentile(samples, 0.50), 2),
+        'p95_ms': round(percentile(samples, 0.95), 2),
+        'p99_ms': round(percentile(samples, 0.99), 2),
+        'min_ms': round(samples[0], 2),
+        'max_ms': round(samples[-1], 2),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set of this process and of its largest child, in MiB"""
+    # ru_maxrss is KiB on Linux (bytes on macOS)
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def new_report(name, results, **settings):
+    """Envelope shared by every benchmark so reports from any commit line up"""
+    return {
+        'benchmark': name,
+        'revision': git_revision(),
+        'timestamp': int(time.time()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'settings': settings,
+        'results': results,
+    }
+
+
+def _numeric_leaves(value, path=''):
+    if isinstance(value, bool):
+        return
+    if isinstance(value, (int, float)):
+        yield path, value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from _numeric_leaves(item, f"{path}.{key}" if path else key)
+
+
+def compare(current, baseline):
+    """
+    Change of every numeric metric present in both reports' "results":
+    {path: {"baseline", "current", "change_pct", "regression"}}.
+    """
+    before = dict(_numeric_leaves(baseline.get('results', {})))
+    comparison = {}
+    for path, value in _numeric_leaves(current.get('results', {})):
+        if path not in before:
+            continue
+        old = before[path]
+        change = None if old == 0 else round((value - old) / abs(old) * 100, 1)
+        higher_is_better = path.rsplit('.', 1)[-1] in HIGHER_IS_BETTER
+        comparison[path] = {
+            'baseline': old,
+            'current': value,
+            'change_pct': change,
+            'regression': change is not None and (change < 0 if higher_is_better else change > 0),
+        }
+    return comparison
+
+
+def print_comparison(comparison, threshold_pct=5.0, stream=sys.stderr):
+    """Human-readable summary of the metrics that moved by more than threshold_pct"""
+    moved = [(path, c) for path, c in comparison.items()
+             if c['change_pct'] is not None and abs(c['change_pct']) >= threshold_pct]
+    if not moved:
+        print(f"No metric moved by {threshold_pct}% or more", file=stream)
+        return
+    for path, c in sorted(moved):
+        flag = 'REGRESSION' if c['regression'] else 'improved'
+        print(f"{path:60} {c['baseline']:>12} -> {c['current']:>12} ({c['change_pct']:+.1f}%) {flag}", file=stream)
+
+
+def emit(report, json_path=None, compare_path=None):
+    """Print the report (and comparison, if asked); optionally write it to json_path"""
+    if compare_path:
+        with open(compare_path) as f:
+            report['comparison'] = compare(report, json.load(f))
+        print_comparison(report['comparison'])
+    print(json.dumps(report, indent=2))
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,177 @@
+"""
+Verdict write throughput against a real PostgreSQL, per write strategy.
+
+    python -m benchmarks.result_writer --dsn postgresql://localhost/scanner
+        [--rows 5000] [--batch-size 500] [--json out.json] [--compare baseline.json]
+
+Strategies, each writing the same rows into a scratch table:
+- connect_per_row: a new connection and INSERT per verdict (one Lambda
+                   invocation each, no proxy) - the pattern RDS Proxy exists for
+- row:             one connection, INSERT + COMMIT per verdict
+- insert / copy:   scanner_common.result_writer, batch_size rows per transaction
+
+Then a failover drill: the writer's backend is terminated from a second
+session between batches and mid-COPY, and the table must still end up with
+every row exactly once. Needs psycopg; --dsn defaults to $RESULTS_DATABASE_URL.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from benchmarks import report
+
+COMMON_LAYER_DIR = os.path.join(report.REPO_ROOT, 'lambda', 'common', 'python')
+
+
+def _entries(count):
+    return [
+        {'id': i, 'target_url': f'http://10.0.1.{i % 250}:8080/login', 'status': 'ok',
+         'vulnerable': i % 7 == 0, 'exit_code': 0 if i % 7 == 0 else 1, 'timed_out': False,
+         'elapsed_ms': 100 + i % 900, 'output_digest': f'{i:064x}', 'result_cache_hit': i % 5 == 0}
+        for i in range(count)
+    ]
+
+
+def _insert_one(conn, table, row):
+    from psycopg import sql
+    from scanner_common.result_writer import COLUMNS
+    conn.execute(
+        sql.SQL('INSERT INTO {table} ({columns}) VALUES ({values})').format(
+            table=sql.Identifier(table),
+            columns=sql.SQL(', ').join(map(sql.Identifier, COLUMNS)),
+            values=sql.SQL(', ').join(sql.Placeholder() * len(COLUMNS))
+        ),
+        row
+    )
+    conn.commit()
+
+
+def _count(dsn, table):
+    import psycopg
+    from psycopg import sql
+    with psycopg.connect(dsn) as conn:
+        total, distinct = conn.execute(
+            sql.SQL('SELECT count(*), count(DISTINCT item_id) FROM {table}').format(table=sql.Identifier(table))
+        ).fetchone()
+    return total, distinct
+
+
+def _reset(dsn, table):
+    import psycopg
+    from psycopg import sql
+    from scanner_common.result_writer import SCHEMA
+    with psycopg.connect(dsn) as conn:
+        conn.execute(sql.SQL('DROP TABLE IF EXISTS {table}').format(table=sql.Identifier(table)))
+        conn.execute(sql.SQL(SCHEMA).format(table=sql.Identifier(table)))
+
+
+def _drop(dsn, table):
+    import psycopg
+    from psycopg import sql
+    with psycopg.connect(dsn) as conn:
+        conn.execute(sql.SQL('DROP TABLE IF EXISTS {table}').format(table=sql.Identifier(table)))
+
+
+def _strategy(name, dsn, table, entries, batch_size):
+    import psycopg
+    from scanner_common.result_writer import ResultWriter, row_from_entry
+
+    _reset(dsn, table)
+    started = time.perf_counter()
+    if name == 'connect_per_row':
+        for entry in entries:
+            with psycopg.connect(dsn) as conn:
+                _insert_one(conn, table, row_from_entry('bench', entry))
+    elif name == 'row':
+        with psycopg.connect(dsn) as conn:
+            for entry in entries:
+                _insert_one(conn, table, row_from_entry('bench', entry))
+    else:
+        writer = ResultWriter(dsn, table=table, method=name, batch_size=batch_size)
+        for entry in entries:
+            writer.add('bench', entry)
+        writer.flush()
+        writer.close()
+    elapsed = time.perf_counter() - started
+    total, _ = _count(dsn, table)
+    return {
+        'rows': total,
+        'elapsed_ms': round(elapsed * 1000, 2),
+        'throughput_per_second': round(total / elapsed, 1),
+    }
+
+
+def _failover_drill(dsn, table, entries, batch_size, method):
+    """Kill the writer's backend twice mid-run; every row must land exactly once"""
+    import psycopg
+    from scanner_common.result_writer import ResultWriter
+
+    _reset(dsn, table)
+    writer = ResultWriter(dsn, table=table, method=method, batch_size=batch_size, backoff_seconds=0.05)
+    admin = psycopg.connect(dsn, autocommit=True)
+
+    def kill():
+        if writer._conn is not None and not writer._conn.closed:
+            admin.execute('SELECT pg_terminate_backend(%s)', (writer._conn.info.backend_pid,))
+
+    kill_points = {len(entries) // 3, 2 * len(entries) // 3}
+    for index, entry in enumerate(entries):
+        if index in kill_points:
+            # Between batches: the next flush finds a dead connection
+            kill()
+        writer.add('bench', entry)
+    # Mid-flush: terminate while the last batch is being written
+    killer = threading.Timer(0.001, kill)
+    killer.start()
+    writer.flush()
+    killer.join()
+    writer.close()
+    admin.close()
+
+    total, distinct = _count(dsn, table)
+    return {
+        'rows': total,
+        'distinct_rows': distinct,
+        'expected_rows': len(entries),
+        'pending': writer.pending(),
+        'retries': writer.stats['retries'],
+        'ok': total == distinct == len(entries),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dsn', default=os.environ.get('RESULTS_DATABASE_URL'))
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error('--dsn (or RESULTS_DATABASE_URL) is required')
+
+    sys.path.insert(0, COMMON_LAYER_DIR)
+    table = f'bench_scan_results_{os.getpid()}'
+    entries = _entries(args.rows)
+    results = {}
+    try:
+        for name in ('connect_per_row', 'row', 'insert', 'copy'):
+            # Per-row connections are slow enough that a tenth of the rows tells the story
+            sample = entries[:max(1, args.rows // 10)] if name == 'connect_per_row' else entries
+            results[name] = _strategy(name, args.dsn, table, sample, args.batch_size)
+        results['failover'] = {
+            method: _failover_drill(args.dsn, table, entries, args.batch_size, method)
+            for method in ('insert', 'copy')
+        }
+    finally:
+        _drop(args.dsn, table)
+
+    report.emit(report.new_report('result_writer', results, rows=args.rows, batch_size=args.batch_size),
+                json_path=args.json, compare_path=args.compare)
+
+
+if __name__ == '__main__':
+    main()
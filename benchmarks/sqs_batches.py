@@ -0,0 +1,105 @@
+"""
+Queued detonation throughput by SQS batch size, with fake SQS events.
+
+    python -m benchmarks.sqs_batches [--messages 40] [--batch-sizes 1 5 10]
+        [--script-seconds 0.5] [--json out.json] [--compare baseline.json]
+
+Pushes the same messages through the detonator's lambda_handler in
+batches of each size, the way the SQS event source would, and reports
+messages per second and invocations used. Also checks the partial batch
+response: a batch with a malformed body, a missing script, a script that
+fails pre-flight and good messages must fail exactly the retryable ones.
+"""
+
+import argparse
+import json
+import os
+import time
+
+from benchmarks import report
+
+
+def sqs_event(bodies, start=0):
+    """Fake SQS event, one record per body (dicts are JSON encoded)"""
+    return {'Records': [
+        {
+            'messageId': f"msg-{start + i}",
+            'receiptHandle': f"handle-{start + i}",
+            'eventSource': 'aws:sqs',
+            'eventSourceARN': 'arn:aws:sqs:us-east-1:123456789012:detonations',
+            'attributes': {'ApproximateReceiveCount': '1'},
+            'body': body if isinstance(body, str) else json.dumps(body),
+        }
+        for i, body in enumerate(bodies)
+    ]}
+
+
+def _request(i, seconds):
+    script = f"import sys, time\ntime.sleep({seconds})\nprint('probe {i}')\nsys.exit(1)\n"
+    return {'script': script, 'target_url': f'http://127.0.0.1:9/item/{i}', 'scan_id': 'bench', 'timeout': 30}
+
+
+def _throughput(handler, batch_size, messages, seconds):
+    from pipeline.invokers import LocalContext
+    requests = [_request(i, seconds) for i in range(messages)]
+    failures = 0
+    invocations = 0
+    started = time.perf_counter()
+    for start in range(0, messages, batch_size):
+        response = handler(sqs_event(requests[start:start + batch_size], start), LocalContext('benchmark'))
+        failures += len(response['batchItemFailures'])
+        invocations += 1
+    elapsed = time.perf_counter() - started
+    return {
+        'messages': messages,
+        'invocations': invocations,
+        'failures': failures,
+        'elapsed_ms': round(elapsed * 1000, 2),
+        'throughput_per_second': round(messages / elapsed, 2),
+    }
+
+
+def _partial_failure(handler):
+    from pipeline.invokers import LocalContext
+    bodies = [
+        _request(0, 0),
+        'not json',
+        {'script': 'import definitely_not_a_module\n', 'target_url': 'http://127.0.0.1:9/', 'scan_id': 'bench'},
+        {'target_url': 'http://127.0.0.1:9/', 'scan_id': 'bench'},
+        _request(4, 0),
+    ]
+    response = handler(sqs_event(bodies), LocalContext('benchmark'))
+    failed = sorted(f['itemIdentifier'] for f in response['batchItemFailures'])
+    # Malformed and missing-script messages are retried (then DLQ); a pre-flight
+    # rejection is a settled verdict
+    expected = ['msg-1', 'msg-3']
+    return {'failed': failed, 'expected': expected, 'ok': failed == expected}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=40)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 5, 10])
+    parser.add_argument('--script-seconds', type=float, default=0.5, help='how long each script runs')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    args = parser.parse_args(argv)
+
+    os.environ.update(RESULT_SINK='none', RESULT_CACHE_BACKEND='none', DETONATOR_PREFLIGHT='true')
+    from pipeline import invokers
+    handler = invokers.load_handler('detonator')
+
+    results = {
+        f"batch_{size}": _throughput(handler, size, args.messages, args.script_seconds)
+        for size in args.batch_sizes
+    }
+    results['partial_failure'] = _partial_failure(handler)
+    report.emit(
+        report.new_report('sqs_batches', results, messages=args.messages, script_seconds=args.script_seconds,
+                          max_workers=int(os.environ.get('DETONATOR_MAX_WORKERS', 8))),
+        json_path=args.json, compare_path=args.compare
+    )
+
+
+if __name__ == '__main__':
+    main()
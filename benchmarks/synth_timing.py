@@ -0,0 +1,119 @@
+"""
+How long `cdk synth` takes, per stack selection.
+
+    python -m benchmarks.synth_timing [--runs 3] [--lookup] [--json out.json] [--compare baseline.json]
+        [selection ...]        # e.g. lambda  network  lambda,network  all
+
+Each selection (default: every stack on its own, then "all") is synthesized
+in a fresh interpreter the way app.py does it, into a throwaway cloud
+assembly. Reported medians: importing aws_cdk (starts the jsii runtime),
+constructing each stack, app.synth() (template rendering, validation,
+asset hashing) and the whole process. --lookup also times every selection
+with -c stack_dependencies=lookup; offline, CDK's dummy lookup values are
+used, which is enough to time it. Selections that cannot synth in this
+tree (a stack module is missing, say) are reported with their error.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks import report
+
+
+def _probe(selection, lookup):
+    """Child process: synth one selection, print its timings as JSON"""
+    import tempfile
+
+    started = time.perf_counter()
+    import aws_cdk as cdk
+    from stacks import registry
+    imported = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as outdir:
+        app = cdk.App(outdir=outdir)
+        names = registry.select(registry.parse(selection), lookup=lookup)
+        stack_seconds = {}
+        # Lookups need a concrete account/region; offline they return dummy values
+        env = cdk.Environment(account='123456789012', region='us-east-1')
+        registry.build(app, names, env, {"Project": "benchmark"}, "dev", "benchmark", timings=stack_seconds)
+        built = time.perf_counter()
+        app.synth()
+        synthesized = time.perf_counter()
+
+    print(json.dumps({
+        'stacks': names,
+        'import_cdk_ms': (imported - started) * 1000,
+        'construct_ms': {name: seconds * 1000 for name, seconds in stack_seconds.items()},
+        'construct_total_ms': (built - imported) * 1000,
+        'synth_ms': (synthesized - built) * 1000,
+    }))
+
+
+def _run_once(selection, lookup):
+    command = [sys.executable, '-m', 'benchmarks.synth_timing', '--probe', selection]
+    if lookup:
+        command.append('--lookup')
+    env = dict(os.environ, JSII_SILENCE_WARNING_DEPRECATED_NODE_VERSION='1')
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=report.REPO_ROOT, env=env, capture_output=True, text=True, timeout=900)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def _selection(selection, lookup, runs):
+    try:
+        samples = [_run_once(selection, lookup) for _ in range(runs)]
+    except RuntimeError as e:
+        return {'error': str(e)}
+
+    def median(values):
+        return round(statistics.median(values), 2)
+
+    return {
+        'stacks': samples[0]['stacks'],
+        'process_ms': median([s['process_ms'] for s in samples]),
+        'import_cdk_ms': median([s['import_cdk_ms'] for s in samples]),
+        'construct_total_ms': median([s['construct_total_ms'] for s in samples]),
+        'synth_ms': median([s['synth_ms'] for s in samples]),
+        'construct_ms': {
+            name: median([s['construct_ms'][name] for s in samples]) for name in samples[0]['construct_ms']
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('selections', nargs='*', help='values for -c stacks= (default: each stack, then all)')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--lookup', action='store_true', help='also time -c stack_dependencies=lookup')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    parser.add_argument('--probe', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        _probe(args.probe, args.lookup)
+        return
+
+    from stacks import registry
+    selections = args.selections or list(registry.ORDER) + ['all']
+    results = {}
+    for selection in selections:
+        results[selection] = _selection(selection, False, args.runs)
+        if args.lookup:
+            results[f"{selection}:lookup"] = _selection(selection, True, args.runs)
+
+    report.emit(report.new_report('synth_timing', results, runs=args.runs),
+                json_path=args.json, compare_path=args.compare)
+
+
+if __name__ == '__main__':
+    main()
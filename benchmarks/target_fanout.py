@@ -0,0 +1,157 @@
+"""
+One finding reported on many hosts: per-host generate+detonate vs fan-out.
+
+    python -m benchmarks.target_fanout [--findings 4] [--hosts 12]
+        [--stub-latency-ms 300] [--json out.json] [--compare baseline.json]
+
+Runs pipeline.orchestrator locally (LocalInvoker) against pipeline.stub_openai
+answering with the scanner_probe script, and `hosts` local HTTP targets:
+
+- per_host:        findings x hosts pipeline entries, script cache off - a
+                   generation and a detonation per host, as before
+- per_host_cached: the same entries with the (now target-free) memory script
+                   cache; only concurrent misses still reach the LLM
+- fan_out:         fan_out=True groups them into one entry per finding: one
+                   generation, one detonator fan-out call across its hosts
+
+Each reports LLM requests, detonator calls, targets with a verdict and wall
+time. Then an escalation drill: a fast tier that pins the example target
+must be escalated (hardcoded_target) and the served script be agnostic.
+Needs the openai package.
+"""
+
+import argparse
+import json
+import os
+import time
+
+from benchmarks import report
+from benchmarks.probe_harness import target_server
+
+BASE_ENV = {
+    'OPENAI_API_KEY': 'benchmark',
+    'MODEL_FAST': '',
+    'SEMANTIC_CACHE': 'false',
+    'PREFLIGHT_SCRIPTS': 'true',
+    'STREAM_GENERATION': 'false',
+    'TIMING_METRICS': 'false',
+    'LLM_RATE_LIMIT_BACKEND': 'none',
+    'RESULT_CACHE_BACKEND': 'none',
+    'DETONATOR_USE_ZYGOTE': 'true',
+    'DETONATOR_PREFLIGHT': 'true',
+}
+
+
+class _CountingInvoker:
+    """LocalInvoker that counts detonator calls"""
+
+    def __init__(self, invoker):
+        self.invoker = invoker
+        self.detonations = 0
+
+    def generate(self, payload):
+        return self.invoker.generate(payload)
+
+    def detonate(self, payload):
+        self.detonations += 1
+        return self.invoker.detonate(payload)
+
+
+def _reset_script_cache(backend):
+    import script_cache
+    os.environ['SCRIPT_CACHE_BACKEND'] = backend
+    script_cache._backend, script_cache._backend_loaded = None, False
+
+
+def _scenario(stub, findings, fan_out):
+    from pipeline.invokers import LocalInvoker
+    from pipeline.orchestrator import run_scan
+    invoker = _CountingInvoker(LocalInvoker())
+    before = stub.stats()['requests']
+    started = time.perf_counter()
+    scan = run_scan(findings, invoker, scan_id='bench', generate_concurrency=4, detonate_concurrency=2,
+                    fan_out=fan_out)
+    elapsed = time.perf_counter() - started
+    verdicts = set()
+    for result in scan['results']:
+        if 'verdicts' in result:
+            verdicts.update((result['id'], target) for target, verdict in result['verdicts'].items()
+                            if verdict['status'] == 'ok')
+        elif result['status'] == 'detonated':
+            verdicts.add((result['id'], result['target_url']))
+    return {
+        'pipeline_entries': len(scan['results']),
+        'llm_requests': stub.stats()['requests'] - before,
+        'detonator_calls': invoker.detonations,
+        'targets_with_verdict': len(verdicts),
+        'failed': scan['summary']['generation_failed'] + scan['summary']['detonation_failed'],
+        'elapsed_ms': round(elapsed * 1000, 2),
+    }
+
+
+def _escalation_drill(hosts):
+    from pipeline import invokers
+    handler = invokers.load_handler('generator')
+    os.environ.update(MODEL_FAST='stub-fast', MODEL='stub-large')
+    try:
+        response = handler({'vulnerability': 'Reflected XSS in search parameter', 'target_url': hosts[0],
+                            'target_urls': hosts, 'bypass_cache': True}, invokers.LocalContext('benchmark'))
+    finally:
+        os.environ['MODEL_FAST'] = ''
+    body = json.loads(response['body'])
+    return {
+        'status': response['statusCode'],
+        'tier': body.get('tier'),
+        'escalation_reason': (body.get('routing') or {}).get('escalation_reason'),
+        'target_agnostic': body.get('target_agnostic'),
+        'ok': body.get('escalation_reason') is None and body.get('tier') == 'large'
+        and (body.get('routing') or {}).get('escalation_reason') == 'hardcoded_target'
+        and body.get('target_agnostic') is True,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--findings', type=int, default=4)
+    parser.add_argument('--hosts', type=int, default=12)
+    parser.add_argument('--stub-latency-ms', type=int, default=300)
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    args = parser.parse_args(argv)
+
+    from pipeline.stub_openai import StubOpenAI
+    from pipeline import invokers
+
+    os.environ.update(BASE_ENV)
+    servers = [target_server(5, 0) for _ in range(args.hosts)]
+    hosts = [f"http://127.0.0.1:{server.server_address[1]}" for server in servers]
+    findings = [
+        {'id': f"f-{k}-{h}", 'vulnerability': f"SQL injection in /item/{k} id parameter", 'target_url': host}
+        for k in range(args.findings) for h, host in enumerate(hosts)
+    ]
+    results = {}
+    try:
+        with StubOpenAI(latency_ms=args.stub_latency_ms, default_behavior='probe',
+                        behaviors={'stub-fast': 'hardcoded'}) as stub:
+            os.environ['OPENAI_BASE_URL'] = stub.base_url
+            invokers.load_handler('generator')
+            for name, backend, fan_out in (('per_host', 'none', False), ('per_host_cached', 'memory', False),
+                                           ('fan_out', 'none', True)):
+                _reset_script_cache(backend)
+                results[name] = _scenario(stub, findings, fan_out)
+            _reset_script_cache('none')
+            results['escalation'] = _escalation_drill(hosts)
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+    report.emit(
+        report.new_report('target_fanout', results, findings=args.findings, hosts=args.hosts,
+                          stub_latency_ms=args.stub_latency_ms),
+        json_path=args.json, compare_path=args.compare
+    )
+
+
+if __name__ == '__main__':
+    main()
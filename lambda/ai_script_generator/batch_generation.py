@@ -0,0 +1,218 @@
+"""
+Batch generation: one event carries many findings, fanned out concurrently
+to the LLM through AsyncOpenAI with a bounded number of requests in flight.
+
+Expected event format:
+{
+    "scan_id": "12345",
+    "findings": [
+        {"id": "f-1", "vulnerability": "SQL injection in login endpoint", "target_url": "http://example.com",
+         "target_urls": [...], "category": "sqli"},
+        ...
+    ],
+    "max_concurrency": 8      # optional, capped by BATCH_MAX_CONCURRENCY
+}
+
+Every finding gets its own result entry; a failure is recorded on that entry
+instead of failing the batch. Scripts are target-agnostic, so findings that
+share a cache key (the same issue reported on several hosts) share a single
+LLM request; the later ones are marked "coalesced". Findings still running when the invocation's
+time budget runs out are cancelled and reported as skipped; findings the
+rate limiter shed (see scanner_common.rate_limit) are reported as throttled,
+with a retry_after hint.
+"""
+
+import asyncio
+import os
+import time
+
+from openai import AuthenticationError
+from scanner_common import warm_cache, preflight, rate_limit, timing
+from scanner_common.fingerprint import hardcodes_target
+from clients import get_async_client
+from prompts import MAX_TOKENS, build_messages, strip_code_fences
+import router
+import script_cache
+import semantic_cache
+
+# Milliseconds kept back from the invocation budget to serialize the response
+DEFAULT_TIME_RESERVE_MS = 5000
+
+# A single loop per container so the AsyncOpenAI connection pool (bound to
+# the loop it was created on) survives between warm invocations
+_loop = None
+
+
+def _get_loop():
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop
+
+
+def _time_budget_seconds(context):
+    """Seconds this batch may spend generating, or None when unbounded"""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    reserve_ms = int(os.environ.get('BATCH_TIME_RESERVE_MS', DEFAULT_TIME_RESERVE_MS))
+    return max(0, context.get_remaining_time_in_millis() - reserve_ms) / 1000.0
+
+
+async def _create(client, model, vulnerability, target_url):
+    messages = build_messages(vulnerability, target_url)
+    response = await rate_limit.get_limiter().call_async(
+        model, rate_limit.estimate_tokens(messages, MAX_TOKENS),
+        lambda: client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.1,
+            max_tokens=MAX_TOKENS
+        )
+    )
+    return strip_code_fences(response.choices[0].message.content)
+
+
+async def _generate_one(index, finding, secret_arn, semaphore, inflight):
+    result = {'index': index, 'id': finding.get('id', index)}
+    vulnerability = finding.get('vulnerability', '')
+    targets = router.finding_targets(finding)
+    target_url = targets[0] if targets else ''
+
+    if not vulnerability:
+        result.update(status='error', error='Missing vulnerability description')
+        return result
+
+    models = router.cache_model()
+    key = script_cache.cache_key(vulnerability, models)
+    cached = script_cache.lookup(key)
+    cache_type = 'exact'
+    if cached is None:
+        cached = semantic_cache.lookup(vulnerability, models)
+        cache_type = 'semantic'
+    if cached is not None:
+        result.update(status='ok', script=cached['script'], model=cached['model'], tier=cached['tier'],
+                      target_url=target_url, target_urls=targets, target_agnostic=True,
+                      cache_hit=True, cache_type=cache_type)
+        return result
+
+    async def generate(model):
+        started = time.monotonic()
+        script = await _create(get_async_client(secret_arn), model, vulnerability, target_url)
+        return script, {'mode': 'blocking', 'total_ms': int((time.monotonic() - started) * 1000)}
+
+    async def route():
+        async with semaphore:
+            try:
+                script, check, routing = await router.route_async(
+                    generate, vulnerability, finding.get('category'), targets)
+            except AuthenticationError:
+                warm_cache.refresh_secret(secret_arn)
+                script, check, routing = await router.route_async(
+                    generate, vulnerability, finding.get('category'), targets)
+        agnostic = not hardcodes_target(script, targets)
+        if agnostic and (check['ok'] or not preflight.enabled('PREFLIGHT_SCRIPTS')):
+            script_cache.store(key, script, routing['model'], routing['tier'])
+            semantic_cache.add(vulnerability, script, models, routing['model'], routing['tier'])
+        return script, check, routing, agnostic
+
+    # The same finding on another host in this batch: wait for its script
+    # instead of asking the LLM again. A script pinned to the first finding's
+    # host is no use here, so that one falls back to its own request.
+    # (Cancelling any waiter at the time budget cancels the shared task, too.)
+    shared = inflight.get(key)
+    coalesced = shared is not None
+    if coalesced:
+        script, check, routing, agnostic = await shared
+        coalesced = agnostic and not hardcodes_target(script, targets)
+    if not coalesced:
+        task = asyncio.ensure_future(route())
+        inflight.setdefault(key, task)
+        script, check, routing, agnostic = await task
+
+    result.update(status='ok', script=script, model=routing['model'], tier=routing['tier'],
+                  target_url=target_url, target_urls=targets, target_agnostic=agnostic,
+                  cache_hit=False, coalesced=coalesced, escalated=routing['escalated'] and not coalesced,
+                  preflight=check if preflight.enabled('PREFLIGHT_SCRIPTS') else None)
+    return result
+
+
+async def _run_batch(findings, secret_arn, concurrency, budget_seconds):
+    semaphore = asyncio.Semaphore(concurrency)
+    inflight = {}
+    # Only well-formed findings are fanned out; the rest get an error entry below
+    tasks = {
+        i: asyncio.ensure_future(_generate_one(i, f, secret_arn, semaphore, inflight))
+        for i, f in enumerate(findings) if isinstance(f, dict)
+    }
+    pending = set()
+    if tasks:
+        done, pending = await asyncio.wait(tasks.values(), timeout=budget_seconds)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results = []
+    for i, finding in enumerate(findings):
+        task = tasks.get(i)
+        if task is None:
+            results.append({'index': i, 'id': i, 'status': 'error',
+                            'error': 'Finding must be a JSON object'})
+            continue
+        finding_id = finding.get('id', i)
+        if task in pending:
+            results.append({'index': i, 'id': finding_id, 'status': 'skipped',
+                            'error': 'Time budget exhausted'})
+        elif isinstance(task.exception(), rate_limit.Overloaded):
+            results.append({'index': i, 'id': finding_id, 'status': 'throttled',
+                            'error': str(task.exception()), 'retry_after': task.exception().retry_after})
+        elif task.exception() is not None:
+            print(f"Error generating finding {finding_id}: {str(task.exception())}")
+            results.append({'index': i, 'id': finding_id, 'status': 'error',
+                            'error': str(task.exception())})
+        else:
+            results.append(task.result())
+    return results
+
+
+def handle_batch(body, context):
+    """Generate scripts for every finding in body['findings']"""
+    findings = body['findings']
+    max_findings = int(os.environ.get('BATCH_MAX_FINDINGS', 500))
+    if not isinstance(findings, list) or not findings or len(findings) > max_findings:
+        return {
+            'statusCode': 400,
+            'body': timing.dumps({'error': f'findings must contain 1-{max_findings} items'})
+        }
+
+    max_concurrency = int(os.environ.get('BATCH_MAX_CONCURRENCY', 16))
+    concurrency = max(1, min(int(body.get('max_concurrency', max_concurrency)), max_concurrency))
+    secret_arn = os.environ.get('OPENAI_SECRET_ARN')
+
+    started = time.monotonic()
+    results = _get_loop().run_until_complete(
+        _run_batch(findings, secret_arn, concurrency, _time_budget_seconds(context))
+    )
+
+    statuses = [r['status'] for r in results]
+    return {
+        'statusCode': 200,
+        'body': timing.dumps({
+            'scan_id': body.get('scan_id'),
+            'models': router.cache_model(),
+            'results': results,
+            'partial': 'skipped' in statuses or 'throttled' in statuses,
+            'summary': {
+                'total': len(results),
+                'succeeded': statuses.count('ok'),
+                'failed': statuses.count('error'),
+                'skipped': statuses.count('skipped'),
+                'throttled': statuses.count('throttled'),
+                'cache_hits': sum(1 for r in results if r.get('cache_hit')),
+                'coalesced': sum(1 for r in results if r.get('coalesced')),
+                'escalated': sum(1 for r in results if r.get('escalated')),
+                'concurrency': concurrency,
+                'elapsed_ms': int((time.monotonic() - started) * 1000)
+            }
+        })
+    }
@@ -0,0 +1,45 @@
+"""
+OpenAI clients for the generator, cached per warm container.
+
+Outside Lambda (local pipeline runs, benchmarks) OPENAI_SECRET_ARN can be
+left unset and the key read from OPENAI_API_KEY instead; OPENAI_BASE_URL
+points the SDK at a local stub endpoint.
+
+The SDK itself is imported by the factories, so importing this module (and
+the handler) stays cheap until a client is actually needed. The SDK's own
+retries are off: scanner_common.rate_limit retries instead, in step with
+the shared buckets and circuit breaker.
+"""
+
+import os
+
+from scanner_common import warm_cache, timing
+
+
+def get_openai_key(secret_arn):
+    """Retrieve OpenAI API key from Secrets Manager (cached per warm container)"""
+    if not secret_arn:
+        return os.environ.get('OPENAI_API_KEY')
+    try:
+        return warm_cache.get_secret(secret_arn, field='OPENAI_API_KEY')
+    except Exception as e:
+        print(f"Error retrieving secret: {str(e)}")
+        raise
+
+
+def get_openai_client(secret_arn):
+    """Return a warm OpenAI client; rebuilt only when the key is refreshed"""
+    def build():
+        from openai import OpenAI
+        api_key = get_openai_key(secret_arn)
+        with timing.span('client_construction'):
+            return OpenAI(api_key=api_key, max_retries=0)
+    return warm_cache.get_client('openai', build, depends_on=secret_arn)
+
+
+def get_async_client(secret_arn):
+    """Warm AsyncOpenAI client, rebuilt only when the key is refreshed"""
+    def build():
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=get_openai_key(secret_arn), max_retries=0)
+    return warm_cache.get_client('openai-async', build, depends_on=secret_arn)
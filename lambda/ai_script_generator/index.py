@@ -1,19 +1,78 @@
 import json
-import boto3
 import os
-from openai import OpenAI
+import time
+from scanner_common import warm_cache, preflight, rate_limit, timing
+from scanner_common.fingerprint import hardcodes_target
+from clients import get_openai_client
+from prompts import MAX_TOKENS, build_messages, strip_code_fences
+import router
+import script_cache
+import semantic_cache
+from streaming import stream_script
 
-secrets_client = boto3.client('secretsmanager')
+# Upper bound for speculative candidates per finding
+DEFAULT_MAX_CANDIDATES = 4
 
-def get_openai_key(secret_arn):
-    """Retrieve OpenAI API key from Secrets Manager"""
+# Speculative candidates need some diversity; 0.1 would return k near-copies
+CANDIDATE_TEMPERATURE = 0.7
+
+def create_completion(client, model, vulnerability, target_url, n=1):
+    """Ask the model for a validation script (n > 1: that many alternatives)"""
+    messages = build_messages(vulnerability, target_url)
+
+    def request():
+        with timing.span('llm_request'):
+            return client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.1 if n == 1 else CANDIDATE_TEMPERATURE,
+                max_tokens=MAX_TOKENS,
+                n=n
+            )
+    return rate_limit.get_limiter().call(model, rate_limit.estimate_tokens(messages, MAX_TOKENS, n), request)
+
+def generate_script(client, model, vulnerability, target_url, stream=False, on_chunk=None):
+    """
+    Return (script, generation stats).
+    stream=True consumes tokens as they arrive and stops at the closing fence;
+    on_chunk receives the partial script as it is produced.
+    """
+    if stream:
+        return stream_script(client, model, vulnerability, target_url, on_chunk=on_chunk)
+    
+    started = time.monotonic()
+    response = create_completion(client, model, vulnerability, target_url)
+    # Clean up markdown code blocks if present
+    with timing.span('fence_strip'):
+        script = strip_code_fences(response.choices[0].message.content)
+    return script, {'mode': 'blocking', 'total_ms': int((time.monotonic() - started) * 1000)}
+
+def generate_candidates(client, model, vulnerability, target_url, n):
+    """Return ([scripts], generation stats) for n alternatives from one request"""
+    started = time.monotonic()
+    response = create_completion(client, model, vulnerability, target_url, n=n)
+    with timing.span('fence_strip'):
+        scripts = [strip_code_fences(choice.message.content) for choice in response.choices]
+    return scripts, {'mode': 'candidates', 'n': n, 'total_ms': int((time.monotonic() - started) * 1000)}
+
+def candidate_count(body):
+    """
+    Requested speculative candidates (missing: 1). Raises ValueError unless
+    it is a whole number from 1 to MAX_CANDIDATES.
+    """
+    limit = int(os.environ.get('MAX_CANDIDATES', DEFAULT_MAX_CANDIDATES))
+    value = body.get('candidates', 1)
+    if value is None:
+        return 1
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"candidates must be a whole number from 1 to {limit}, got {value!r}")
     try:
-        response = secrets_client.get_secret_value(SecretId=secret_arn)
-        secret = json.loads(response['SecretString'])
-        return secret.get('OPENAI_API_KEY')
-    except Exception as e:
-        print(f"Error retrieving secret: {str(e)}")
-        raise
+        count = float(value)
+    except ValueError:
+        raise ValueError(f"candidates must be a whole number from 1 to {limit}, got {value!r}")
+    if not count.is_integer() or not 1 <= count <= limit:
+        raise ValueError(f"candidates must be a whole number from 1 to {limit}, got {value!r}")
+    return int(count)
 
 def lambda_handler(event, context):
     """
@@ -23,70 +82,180 @@ def lambda_handler(event, context):
     {
         "vulnerability": "SQL injection in login endpoint",
         "target_url": "http://example.com",
-        "scan_id": "12345"
+        "target_urls": [...],        # optional, every host the finding was reported on
+        "scan_id": "12345",
+        "category": "sqli",          # optional, see router.HARD_CATEGORIES
+        "bypass_cache": false,       # optional, force a fresh generation
+        "stream": false,             # optional, defaults to STREAM_GENERATION
+        "candidates": 1,             # optional, 1-MAX_CANDIDATES; k > 1 returns k fresh alternatives in "scripts"
+        "timings": false             # optional, add per-phase milliseconds to the response
     }
+    
+    Scripts read their target from TARGET_URL, so one script serves every
+    host in target_url/target_urls (the detonator fans it out); the response
+    says whether it came out target_agnostic. Events with a "findings" list
+    are handled as a batch (see batch_generation).
     """
+    return timing.finish(_handle(event, context))
+
+def _handle(event, context):
     try:
         # Parse input
         body = json.loads(event.get('body', '{}')) if isinstance(event.get('body'), str) else event
+        timing.start(body, context)
+        rate_limit.bind(context)
+        
+        if isinstance(body.get('findings'), list):
+            from batch_generation import handle_batch
+            return handle_batch(body, context)
+        
         vulnerability = body.get('vulnerability', '')
-        target_url = body.get('target_url', '')
+        targets = router.finding_targets(body)
+        # Only an example for the prompt: the script has to work on all of them
+        target_url = targets[0] if targets else ''
         
         if not vulnerability:
             return {
                 'statusCode': 400,
-                'body': json.dumps({'error': 'Missing vulnerability description'})
+                'body': timing.dumps({'error': 'Missing vulnerability description'})
             }
         
-        # Get OpenAI API key from Secrets Manager
-        secret_arn = os.environ.get('OPENAI_SECRET_ARN')
-        api_key = get_openai_key(secret_arn)
+        category = body.get('category')
+        try:
+            candidates = candidate_count(body)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'body': timing.dumps({'error': str(e)})
+            }
+        
+        # Serve repeat findings from the script cache, then from near-duplicate
+        # descriptions. Not in speculative mode: one cached script is not k
+        # alternatives to race.
+        models = router.cache_model()
+        key = script_cache.cache_key(vulnerability, models)
+        skip_cache = body.get('bypass_cache') or candidates > 1
+        with timing.span('cache_lookup'):
+            cached = None if skip_cache else script_cache.lookup(key)
+            cache_type = 'exact'
+            if cached is None and not skip_cache:
+                cached = semantic_cache.lookup(vulnerability, models)
+                cache_type = 'semantic'
+                if cached is not None:
+                    script_cache.store(key, cached['script'], cached['model'], cached['tier'])
+        timing.set_property('CacheHit', cached is not None)
+        if cached is not None:
+            timing.set_property('Model', cached['model'])
+            return {
+                'statusCode': 200,
+                'body': timing.dumps({
+                    'script': cached['script'],
+                    'scripts': [{'index': 0, 'script': cached['script'], 'preflight': None, 'valid': True}],
+                    'model': cached['model'],
+                    'tier': cached['tier'],
+                    'vulnerability': vulnerability,
+                    'target_url': target_url,
+                    'target_urls': targets,
+                    'target_agnostic': True,
+                    'cache_hit': True,
+                    'cache_type': cache_type,
+                    'similarity': cached.get('similarity'),
+                    'matched_vulnerability': cached.get('matched_vulnerability')
+                })
+            }
         
-        # Initialize OpenAI client
-        client = OpenAI(api_key=api_key)
+        # The SDK (pydantic, httpx) costs hundreds of milliseconds to import;
+        # rejected requests and cache hits never pay for it
+        from openai import AuthenticationError
+        
+        # Reuse the container's client; the key is fetched once per TTL
+        secret_arn = os.environ.get('OPENAI_SECRET_ARN')
+        client = get_openai_client(secret_arn)
         
         # Generate exploit script
-        model = os.environ.get('MODEL', 'gpt-4')
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "system", 
-                    "content": """You are a security testing assistant. Generate a Python script 
-                    to validate if a vulnerability exists. The script should:
-                    1. Be self-contained with minimal dependencies
-                    2. Return exit code 0 if vulnerable, 1 if not vulnerable
-                    3. Print detailed output about what was tested
-                    4. Be safe and non-destructive
-                    Output ONLY the Python code, no explanations."""
-                },
-                {
-                    "role": "user", 
-                    "content": f"Vulnerability: {vulnerability}\nTarget: {target_url}"
-                }
-            ],
-            temperature=0.1,
-            max_tokens=2000
-        )
+        stream = body.get('stream', os.environ.get('STREAM_GENERATION', 'false').lower() == 'true')
         
-        script = response.choices[0].message.content
+        # Speculative mode: k alternatives for the detonator to race; not cached,
+        # since only the detonation decides which of them was any good
+        if candidates > 1:
+            def generate_many(model):
+                return generate_candidates(client, model, vulnerability, target_url, candidates)
+            try:
+                scripts, routing = router.route_candidates(generate_many, vulnerability, category, targets)
+            except AuthenticationError:
+                warm_cache.refresh_secret(secret_arn)
+                client = get_openai_client(secret_arn)
+                scripts, routing = router.route_candidates(generate_many, vulnerability, category, targets)
+            best = next((c for c in scripts if c['valid']), scripts[0])
+            timing.set_property('Model', routing['model'])
+            return {
+                'statusCode': 200,
+                'body': timing.dumps({
+                    'script': best['script'],
+                    'scripts': scripts,
+                    'candidates_requested': candidates,
+                    'candidates_valid': sum(1 for c in scripts if c['valid']),
+                    'model': routing['model'],
+                    'tier': routing['tier'],
+                    'vulnerability': vulnerability,
+                    'target_url': target_url,
+                    'target_urls': targets,
+                    'target_agnostic': not hardcodes_target(best['script'], targets),
+                    'cache_hit': False,
+                    'generation': routing['attempts'][-1]['generation'],
+                    'routing': routing,
+                    'preflight': best['preflight']
+                })
+            }
+        
+        def generate(model):
+            return generate_script(client, model, vulnerability, target_url, stream)
+        
+        # Cheap tier first; escalates when its script would not survive the detonator
+        try:
+            script, check, routing = router.route(generate, vulnerability, category, targets)
+        except AuthenticationError:
+            # Key was probably rotated - drop the cached secret/client and retry once
+            warm_cache.refresh_secret(secret_arn)
+            client = get_openai_client(secret_arn)
+            script, check, routing = router.route(generate, vulnerability, category, targets)
         
-        # Clean up markdown code blocks if present
-        script = script.replace('```python', '').replace('```', '').strip()
+        timing.set_property('Model', routing['model'])
+        # The cache key has no target: a script pinned to one must not be served for others
+        agnostic = not hardcodes_target(script, targets)
+        if agnostic and (check['ok'] or not preflight.enabled('PREFLIGHT_SCRIPTS')):
+            with timing.span('cache_store'):
+                script_cache.store(key, script, routing['model'], routing['tier'])
+                semantic_cache.add(vulnerability, script, models, routing['model'], routing['tier'])
         
         return {
             'statusCode': 200,
-            'body': json.dumps({
+            'body': timing.dumps({
                 'script': script,
-                'model': model,
+                'model': routing['model'],
+                'tier': routing['tier'],
                 'vulnerability': vulnerability,
-                'target_url': target_url
+                'target_url': target_url,
+                'target_urls': targets,
+                'target_agnostic': agnostic,
+                'cache_hit': False,
+                'generation': routing['attempts'][-1]['generation'],
+                'routing': routing,
+                'preflight': check if preflight.enabled('PREFLIGHT_SCRIPTS') else None
             })
         }
         
+    except rate_limit.Overloaded as e:
+        # Shed or throttled upstream: tell the caller to come back later
+        # instead of failing the finding
+        print(f"Error: {str(e)}")
+        return {
+            'statusCode': 503,
+            'body': timing.dumps({'error': str(e), 'reason': e.reason, 'retry_after': e.retry_after})
+        }
     except Exception as e:
         print(f"Error: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
+            'body': timing.dumps({'error': str(e)})
         }
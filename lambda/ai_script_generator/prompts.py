@@ -0,0 +1,46 @@
+"""
+Prompt text for the script generator.
+Bump SYSTEM_PROMPT_VERSION whenever SYSTEM_PROMPT changes so cached scripts
+generated from the old prompt are no longer served.
+"""
+
+SYSTEM_PROMPT_VERSION = "3"
+
+# Completion cap per script; also what a request counts against the token limit
+MAX_TOKENS = 2000
+
+SYSTEM_PROMPT = """You are a security testing assistant. Generate a Python script
+                to validate if a vulnerability exists. The script should:
+                1. Be self-contained with minimal dependencies
+                2. Return exit code 0 if vulnerable, 1 if not vulnerable
+                3. Print detailed output about what was tested
+                4. Be safe and non-destructive
+                5. Use the preinstalled scanner_probe module for all HTTP:
+                   import scanner_probe as probe
+                   probe.get(path, params=...), probe.post(path, data=..., json=...) and
+                   probe.request(method, path, headers=...) send to TARGET_URL over pooled
+                   keep-alive connections with bounded timeouts; responses have .status,
+                   .headers, .text, .json(), .elapsed_ms and .error (set instead of raising)
+                   probe.many([(method, path, {kwargs}), ...]) sends probes concurrently
+                   probe.evidence(kind, detail, response) records each observation
+                   probe.verdict(vulnerable, reason) prints the summary and exits 0/1
+                6. Work against any host: the same script is run against every host the
+                   finding was reported on, each with its own TARGET_URL. Never hardcode
+                   the target's host, port or address
+                Output ONLY the Python code, no explanations."""
+
+
+def build_messages(vulnerability, target_url):
+    """Chat messages for one finding; target_url is only an example of the hosts it runs against"""
+    content = f"Vulnerability: {vulnerability}"
+    if target_url:
+        content += f"\nTarget: {target_url} (example; read the real one from TARGET_URL)"
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": content}
+    ]
+
+
+def strip_code_fences(text):
+    """Clean up markdown code blocks if present"""
+    return (text or '').replace('```python', '').replace('```', '').strip()
@@ -0,0 +1,167 @@
+"""
+Tiered model routing.
+
+Findings go to the fast tier (MODEL_FAST) first and are escalated to the
+large tier (MODEL) only when:
+- the fast script fails pre-flight (does not parse, unknown imports, ...)
+- the fast script never sets an exit code, so the detonator could not read
+  a verdict from it
+- the fast script hardcodes one of the finding's targets, so it could not
+  be fanned out to the finding's other hosts
+- the finding's category is listed in HARD_CATEGORIES, in which case the
+  fast tier is skipped altogether
+
+Every response records the tier that served it. With MODEL_FAST unset (or
+equal to MODEL) there is a single tier and nothing is ever escalated.
+"""
+
+import os
+
+from scanner_common import preflight, timing
+from scanner_common.fingerprint import hardcodes_target
+
+DEFAULT_FAST_MODEL = 'gpt-4o-mini'
+DEFAULT_LARGE_MODEL = 'gpt-4'
+
+# Categories the fast tier gets wrong often enough that trying it first
+# only adds latency
+DEFAULT_HARD_CATEGORIES = (
+    'deserialization', 'request smuggling', 'race condition', 'prototype pollution',
+    'xxe', 'ssti', 'template injection', 'cache poisoning',
+)
+
+
+def tiers():
+    """[(tier name, model)] in the order they are tried"""
+    large = os.environ.get('MODEL', DEFAULT_LARGE_MODEL)
+    fast = os.environ.get('MODEL_FAST', DEFAULT_FAST_MODEL)
+    if not fast or fast == large:
+        return [('large', large)]
+    return [('fast', fast), ('large', large)]
+
+
+def cache_model():
+    """Model component of the script cache key: the whole routing chain"""
+    return '>'.join(model for _, model in tiers())
+
+
+def hard_categories():
+    value = os.environ.get('HARD_CATEGORIES')
+    if value is None:
+        return DEFAULT_HARD_CATEGORIES
+    return tuple(c.strip().lower() for c in value.split(',') if c.strip())
+
+
+def is_hard(vulnerability, category=None):
+    """
+    True when the finding should skip the fast tier. An explicit category is
+    matched exactly; without one the description is searched for the names.
+    """
+    hard = hard_categories()
+    if category:
+        return category.strip().lower() in hard
+    text = (vulnerability or '').lower()
+    return any(name in text for name in hard)
+
+
+def plan(vulnerability, category=None):
+    """Tiers to try for one finding, and why the fast tier was skipped (if it was)"""
+    chain = tiers()
+    if len(chain) > 1 and is_hard(vulnerability, category):
+        return chain[1:], 'hard_category'
+    return chain, None
+
+
+def finding_targets(finding):
+    """Every host a finding names: target_url first, then target_urls, without repeats"""
+    targets = [finding.get('target_url') or ''] + list(finding.get('target_urls') or [])
+    return list(dict.fromkeys(t for t in targets if t))
+
+
+def validate(script, targets=()):
+    """
+    Pre-flight plus the exit-code contract. Returns (check, escalation reason);
+    the reason is None when the script is good enough to ship. A script that
+    hardcodes one of `targets` passes pre-flight but is still escalated.
+    """
+    with timing.span('preflight'):
+        check = preflight.preflight(script, require_exit=True)
+    if check['ok']:
+        if hardcodes_target(script, targets):
+            return check, 'hardcoded_target'
+        return check, None
+    codes = [r['code'] for r in check['reasons']]
+    if 'syntax_error' in codes or 'empty_script' in codes:
+        return check, 'invalid_script'
+    if 'missing_exit' in codes:
+        return check, 'missing_exit'
+    return check, 'preflight_failed'
+
+
+def _finish(script, check, attempts, skipped_reason):
+    served = attempts[-1]
+    reason = skipped_reason
+    if len(attempts) > 1:
+        reason = attempts[0]['escalation_reason']
+    return script, check, {
+        'tier': served['tier'],
+        'model': served['model'],
+        'escalated': reason is not None,
+        'escalation_reason': reason,
+        'attempts': attempts
+    }
+
+
+def route(generate, vulnerability, category=None, targets=()):
+    """
+    Run generate(model) -> (script, generation) up the tier chain.
+    Returns (script, preflight check, routing info) for the tier that served
+    the finding - the last one tried, even if its script is still invalid.
+    """
+    chain, skipped_reason = plan(vulnerability, category)
+    attempts = []
+    for tier, model in chain:
+        script, generation = generate(model)
+        check, reason = validate(script, targets)
+        attempts.append({'tier': tier, 'model': model, 'generation': generation,
+                         'escalation_reason': reason})
+        if reason is None:
+            break
+    return _finish(script, check, attempts, skipped_reason)
+
+
+def route_candidates(generate_many, vulnerability, category=None, targets=()):
+    """
+    Speculative variant: generate_many(model) -> ([scripts], generation).
+    Moves up the chain only when no candidate of a tier passes validation.
+    Returns ([{"index", "script", "preflight", "valid"}], routing info).
+    """
+    chain, skipped_reason = plan(vulnerability, category)
+    attempts = []
+    for tier, model in chain:
+        scripts, generation = generate_many(model)
+        candidates = []
+        for index, script in enumerate(scripts):
+            check, reason = validate(script, targets)
+            candidates.append({'index': index, 'script': script, 'preflight': check, 'valid': reason is None})
+        valid = sum(1 for c in candidates if c['valid'])
+        attempts.append({'tier': tier, 'model': model, 'generation': generation, 'valid': valid,
+                         'escalation_reason': None if valid else 'no_valid_candidate'})
+        if valid:
+            break
+    _, _, routing = _finish(None, None, attempts, skipped_reason)
+    return candidates, routing
+
+
+async def route_async(generate, vulnerability, category=None, targets=()):
+    """route() for coroutine generators (batch mode)"""
+    chain, skipped_reason = plan(vulnerability, category)
+    attempts = []
+    for tier, model in chain:
+        script, generation = await generate(model)
+        check, reason = validate(script, targets)
+        attempts.append({'tier': tier, 'model': model, 'generation': generation,
+                         'escalation_reason': reason})
+        if reason is None:
+            break
+    return _finish(script, check, attempts, skipped_reason)
@@ -0,0 +1,75 @@
+"""
+Content-addressed cache for generated validation scripts.
+
+Key = sha256 of the normalized (vulnerability, model, prompt version) tuple,
+so repeat findings from the scanners skip the LLM entirely. Scripts read
+their target from TARGET_URL, so the target is not part of the key: the same
+finding on another host is a hit. Scripts that hardcode a target are never
+stored. "model" is the router's whole tier chain; the entry remembers which
+tier produced it.
+Backend is chosen by SCRIPT_CACHE_BACKEND (memory | redis | none).
+"""
+
+import hashlib
+import json
+import os
+
+from prompts import SYSTEM_PROMPT_VERSION
+from scanner_common.cache_backends import backend_from_env
+from scanner_common.fingerprint import normalize_text
+
+KEY_PREFIX = "script:v3:"
+
+_backend = None
+_backend_loaded = False
+
+
+def cache_key(vulnerability, model):
+    """Stable key for one finding, whichever host it was reported on"""
+    material = json.dumps([
+        normalize_text(vulnerability),
+        model,
+        SYSTEM_PROMPT_VERSION
+    ])
+    return KEY_PREFIX + hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def get_backend():
+    """Backend for this container, built on first use"""
+    global _backend, _backend_loaded
+    if not _backend_loaded:
+        _backend = backend_from_env('SCRIPT_CACHE')
+        _backend_loaded = True
+    return _backend
+
+
+def ttl_seconds():
+    return float(os.environ.get('SCRIPT_CACHE_TTL_SECONDS', 3600))
+
+
+def lookup(key):
+    """
+    Cached entry {"script", "model", "tier"} for key, or None.
+    Backend errors count as a miss.
+    """
+    backend = get_backend()
+    if backend is None:
+        return None
+    try:
+        value = backend.get(key)
+    except Exception as e:
+        print(f"Script cache read failed: {str(e)}")
+        return None
+    return json.loads(value) if value else None
+
+
+def store(key, script, model=None, tier=None):
+    """Remember a freshly generated script; failures are logged, never raised"""
+    backend = get_backend()
+    if backend is None or not script:
+        return
+    entry = {'script': script, 'model': model, 'tier': tier}
+    try:
+        backend.set(key, json.dumps(entry), ttl_seconds())
+    except Exception as e:
+        print(f"Script cache write failed: {str(e)}")
@@ -0,0 +1,234 @@
+"""
+Near-duplicate cache for vulnerability descriptions.
+
+Scanners word the same issue many ways ("SQL injection in /login username
+parameter", "SQLi on /login, param username"), so the exact-match script
+cache misses most repeats. Descriptions are turned into hashed word +
+character-trigram vectors (after expanding common abbreviations), kept
+sparse and L2-normalized per warm container; lookup scores only the rows
+that share a feature with the query through an inverted index. A
+description at or above SEMANTIC_CACHE_THRESHOLD cosine similarity reuses
+the earlier script as is: scripts read their target from TARGET_URL, so one
+fits every host. When the index is full the least recently used row is
+reused.
+
+Similar wording is not enough on its own: "XSS in search parameter q" and
+"XSS in search parameter name" score well above the threshold but need
+different scripts. The paths ("/login") and parameter names ("q", "?id=")
+a description mentions must match exactly before a row is considered.
+
+Settings: SEMANTIC_CACHE (true | false), SEMANTIC_CACHE_THRESHOLD (0.85),
+SEMANTIC_CACHE_CAPACITY (1000 entries). Standard library only.
+"""
+
+import math
+import os
+import re
+import threading
+import zlib
+
+DIMENSIONS = 1024
+DEFAULT_THRESHOLD = 0.85
+DEFAULT_CAPACITY = 1000
+
+# Scanner shorthand -> the words the long form would produce
+ABBREVIATIONS = {
+    'sqli': 'sql injection',
+    'xss': 'cross site scripting',
+    'csrf': 'cross site request forgery',
+    'xsrf': 'cross site request forgery',
+    'ssrf': 'server side request forgery',
+    'rce': 'remote code execution',
+    'lfi': 'local file inclusion',
+    'rfi': 'remote file inclusion',
+    'idor': 'insecure direct object reference',
+    'ssti': 'server side template injection',
+    'xxe': 'xml external entity',
+    'cmdi': 'command injection',
+    'dos': 'denial of service',
+}
+
+# Words that carry no signal about *what* the vulnerability is
+STOPWORDS = {
+    'a', 'an', 'the', 'in', 'on', 'at', 'of', 'for', 'to', 'via', 'with', 'and', 'or',
+    'is', 'found', 'possible', 'potential', 'vulnerability', 'endpoint', 'page', 'parameter',
+}
+
+# Words that introduce (or follow) a parameter name
+PARAMETER_WORDS = {'parameter', 'parameters', 'param', 'params', 'field', 'argument', 'arg', 'header', 'cookie'}
+
+_WORD = re.compile(r'[a-z0-9_]+')
+_PATH = re.compile(r'(?<![\w.:/])/[a-z0-9_\-./{}:%~]*')
+_QUERY = re.compile(r'[?&]([a-z0-9_\-\[\]]+)=')
+_NAMED = re.compile(r'[a-z0-9_\-\[\]]+')
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def enabled():
+    return os.environ.get('SEMANTIC_CACHE', 'true').lower() == 'true'
+
+
+def threshold():
+    return float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', DEFAULT_THRESHOLD))
+
+
+def tokens(text):
+    """Words of a description with abbreviations expanded and stopwords dropped"""
+    words = []
+    for word in _WORD.findall((text or '').lower()):
+        words.extend(ABBREVIATIONS.get(word, word).split())
+    return [w for w in words if w not in STOPWORDS]
+
+
+def _features(words):
+    for word in words:
+        yield 'w:' + word
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            yield 'c:' + padded[i:i + 3]
+
+
+def anchors(text):
+    """
+    Paths and parameter names a description mentions, as a frozenset of
+    ('path', '/login') / ('param', 'q'). Parameter names are read from query
+    strings ("?id=1") and from the word after (else before) "parameter",
+    "param", "field", ... ("search parameter q" -> q, "id parameter" -> id).
+    """
+    text = (text or '').lower()
+    found = {('path', path.rstrip('/.,:') or '/') for path in _PATH.findall(text)}
+    found.update(('param', name) for name in _QUERY.findall(text))
+    words = _NAMED.findall(_PATH.sub(' ', text))
+    for i, word in enumerate(words):
+        if word not in PARAMETER_WORDS:
+            continue
+        following = words[i + 1] if i + 1 < len(words) else None
+        preceding = words[i - 1] if i > 0 else None
+        for name in (following, preceding):
+            if name and name not in STOPWORDS and name not in PARAMETER_WORDS:
+                found.add(('param', name))
+                break
+    return frozenset(found)
+
+
+def vectorize(text):
+    """Unit-length hashed feature vector {bucket: weight} for a description (None if it has no features)"""
+    vector = {}
+    for feature in _features(tokens(text)):
+        bucket = zlib.crc32(feature.encode('utf-8')) % DIMENSIONS
+        # Whole words weigh as much as all of their trigrams together
+        vector[bucket] = vector.get(bucket, 0.0) + (3.0 if feature[0] == 'w' else 1.0)
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    if norm == 0.0:
+        return None
+    return {bucket: weight / norm for bucket, weight in vector.items()}
+
+
+class VectorIndex:
+    """Fixed-capacity sparse cosine index; rows are reused least-recently-used first"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.vectors = [None] * capacity
+        self.anchors = [None] * capacity
+        self.last_used = [0] * capacity
+        self.entries = [None] * capacity
+        self.postings = {}  # (anchors, bucket) -> {row}
+        self.size = 0
+        self._tick = 0
+
+    def _touch(self, row):
+        self._tick += 1
+        self.last_used[row] = self._tick
+
+    def search(self, vector, anchors=frozenset()):
+        """(best row with the same anchors, similarity), or (None, 0.0) when there is none"""
+        scores = {}
+        for bucket, weight in vector.items():
+            for row in self.postings.get((anchors, bucket), ()):
+                scores[row] = scores.get(row, 0.0) + weight * self.vectors[row][bucket]
+        if not scores:
+            return None, 0.0
+        row = max(scores, key=scores.__getitem__)
+        return row, scores[row]
+
+    def _clear(self, row):
+        for bucket in self.vectors[row]:
+            key = (self.anchors[row], bucket)
+            rows = self.postings[key]
+            rows.discard(row)
+            if not rows:
+                del self.postings[key]
+
+    def add(self, vector, entry, anchors=frozenset()):
+        if self.size < self.capacity:
+            row = self.size
+            self.size += 1
+        else:
+            row = min(range(self.capacity), key=self.last_used.__getitem__)
+            self._clear(row)
+        self.vectors[row] = vector
+        self.anchors[row] = anchors
+        self.entries[row] = entry
+        for bucket in vector:
+            self.postings.setdefault((anchors, bucket), set()).add(row)
+        self._touch(row)
+        return row
+
+
+def _index(namespace):
+    index = _indexes.get(namespace)
+    if index is None:
+        capacity = int(os.environ.get('SEMANTIC_CACHE_CAPACITY', DEFAULT_CAPACITY))
+        index = _indexes[namespace] = VectorIndex(max(1, capacity))
+    return index
+
+
+def lookup(vulnerability, namespace):
+    """
+    Script for the closest earlier description within the threshold that
+    names the same paths and parameters, or None. Returns the cache entry
+    plus "similarity" and "matched_vulnerability".
+    """
+    if not enabled():
+        return None
+    vector = vectorize(vulnerability)
+    if vector is None:
+        return None
+    with _lock:
+        index = _index(namespace)
+        row, similarity = index.search(vector, anchors(vulnerability))
+        if row is None or similarity < threshold():
+            return None
+        entry = index.entries[row]
+        index._touch(row)
+
+    return {
+        'script': entry['script'],
+        'model': entry['model'],
+        'tier': entry['tier'],
+        'similarity': round(similarity, 4),
+        'matched_vulnerability': entry['vulnerability'],
+    }
+
+
+def add(vulnerability, script, namespace, model=None, tier=None):
+    """Index a freshly generated (and validated) script"""
+    if not enabled() or not script:
+        return
+    vector = vectorize(vulnerability)
+    if vector is None:
+        return
+    entry_anchors = anchors(vulnerability)
+    entry = {'vulnerability': vulnerability, 'script': script, 'model': model, 'tier': tier}
+    with _lock:
+        index = _index(namespace)
+        row, similarity = index.search(vector, entry_anchors)
+        # Same wording again: refresh the row instead of filling the index with copies
+        if row is not None and similarity >= 0.9999:
+            index.entries[row] = entry
+            index._touch(row)
+        else:
+            index.add(vector, entry, entry_anchors)
@@ -0,0 +1,143 @@
+"""
+Streaming generation: consume tokens as they arrive, strip the markdown
+fences incrementally and hang up as soon as the closing fence shows up,
+so we stop paying for the explanation the model tends to add afterwards.
+
+The managed Python runtime cannot use Lambda response streaming, so partial
+output is handed to an optional on_chunk callback; in-process callers (the
+pipeline, benchmarks) can forward it wherever they like.
+"""
+
+import time
+
+from prompts import MAX_TOKENS, build_messages
+from scanner_common import rate_limit, timing
+
+# Non-fence lines held back while waiting for an opening fence; past this
+# the output is treated as unfenced code and released
+PREAMBLE_MAX_LINES = 5
+
+
+class FenceStripper:
+    """
+    Incremental equivalent of prompts.strip_code_fences.
+
+    Lines before an opening ``` fence are prose and dropped; everything up to
+    the closing fence is script. Once the closing fence is seen, done is True.
+    """
+
+    def __init__(self):
+        self.done = False
+        self._state = 'preamble'  # preamble -> fenced | plain
+        self._pending = ''
+        self._held = []
+        self._parts = []
+
+    def feed(self, text):
+        """Consume a token delta, return the script text it completed"""
+        if self.done:
+            return ''
+        self._pending += text
+        out = []
+        while '\n' in self._pending and not self.done:
+            line, self._pending = self._pending.split('\n', 1)
+            out.append(self._line(line + '\n'))
+        emitted = ''.join(out)
+        self._parts.append(emitted)
+        return emitted
+
+    def finish(self):
+        """Flush whatever is left once the stream ends"""
+        tail = ''
+        if not self.done and self._pending:
+            tail = self._line(self._pending)
+        self._pending = ''
+        if self._state == 'preamble':
+            # Never saw a fence - the whole response was the script
+            tail = ''.join(self._held)
+            self._held = []
+        self._parts.append(tail)
+        return tail
+
+    @property
+    def script(self):
+        return ''.join(self._parts).strip()
+
+    def _line(self, line):
+        is_fence = line.lstrip().startswith('```')
+        if self._state == 'preamble':
+            if is_fence:
+                self._held = []
+                self._state = 'fenced'
+                return ''
+            if not self._held and not line.strip():
+                return ''
+            self._held.append(line)
+            if len(self._held) > PREAMBLE_MAX_LINES:
+                self._state = 'plain'
+                held, self._held = ''.join(self._held), []
+                return held
+            return ''
+        if is_fence:
+            if self._state == 'fenced':
+                self.done = True
+            return ''
+        return line
+
+
+def stream_script(client, model, vulnerability, target_url, on_chunk=None):
+    """
+    Generate a script with stream=True.
+    Returns (script, stats) where stats holds time-to-first-token and total latency.
+    """
+    started = time.monotonic()
+    first_token_at = None
+    stripper = FenceStripper()
+
+    # Only opening the stream is limited and retried; a stream that breaks
+    # halfway surfaces as an error
+    messages = build_messages(vulnerability, target_url)
+    stream = rate_limit.get_limiter().call(
+        model, rate_limit.estimate_tokens(messages, MAX_TOKENS),
+        lambda: client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.1,
+            max_tokens=MAX_TOKENS,
+            stream=True
+        )
+    )
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            emitted = stripper.feed(delta)
+            if emitted and on_chunk:
+                on_chunk(emitted)
+            if stripper.done:
+                break
+    finally:
+        # Closing the response aborts generation server-side
+        stream.close()
+
+    tail = stripper.finish()
+    if tail and on_chunk:
+        on_chunk(tail)
+
+    finished = time.monotonic()
+    timings = timing.current()
+    if timings is not None:
+        timings.record('llm_request', (finished - started) * 1000)
+        if first_token_at is not None:
+            timings.record('llm_first_token', (first_token_at - started) * 1000)
+    return stripper.script, {
+        'mode': 'stream',
+        'ttft_ms': None if first_token_at is None else int((first_token_at - started) * 1000),
+        'total_ms': int((finished - started) * 1000),
+        'stopped_early': stripper.done
+    }
@@ -0,0 +1,4 @@
+"""
+Shared runtime helpers for the scanner Lambda functions.
+Shipped as a Lambda layer (lambda/common) so every handler imports the same code.
+"""
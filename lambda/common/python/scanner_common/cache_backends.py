@@ -0,0 +1,136 @@
+"""
+Pluggable key/value backends for the scanner caches.
+
+Every backend stores strings under string keys with a per-entry TTL:
+- MemoryBackend: in-process LRU dict, lives as long as the warm container
+- SQLiteBackend: file-backed, survives handler reloads; handy locally and in /tmp
+- RedisBackend:  ElastiCache/Redis, shared by every container (needs `redis`)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    """In-process LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries=1024, clock=time.monotonic):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        expires_at = None if ttl_seconds is None else self._clock() + ttl_seconds
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Single-table SQLite cache with per-entry expiry"""
+
+    def __init__(self, path, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)'
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] <= self._clock():
+                self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                return None
+            return row[0]
+
+    def set(self, key, value, ttl_seconds=None):
+        expires_at = None if ttl_seconds is None else self._clock() + ttl_seconds
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, value, expires_at)
+            )
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+
+class RedisBackend:
+    """Redis/ElastiCache backend; eviction is left to the server's maxmemory-policy"""
+
+    def __init__(self, url, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("RedisBackend requires the 'redis' package") from e
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._client = client
+
+    def get(self, key):
+        value = self._client.get(key)
+        if isinstance(value, bytes):
+            return value.decode('utf-8')
+        return value
+
+    def set(self, key, value, ttl_seconds=None):
+        if ttl_seconds is None:
+            self._client.set(key, value)
+        else:
+            self._client.set(key, value, ex=max(1, int(ttl_seconds)))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+
+def backend_from_env(prefix, default='memory'):
+    """
+    Build a backend from <PREFIX>_BACKEND (memory | sqlite | redis | none).
+    Redis reads <PREFIX>_REDIS_URL, SQLite <PREFIX>_SQLITE_PATH and memory
+    <PREFIX>_MAX_ENTRIES.
+    Returns None when the cache is disabled.
+    """
+    kind = os.environ.get(f'{prefix}_BACKEND', default).lower()
+    if kind == 'none':
+        return None
+    if kind == 'redis':
+        return RedisBackend(os.environ[f'{prefix}_REDIS_URL'])
+    if kind == 'sqlite':
+        default_path = os.path.join('/tmp', f'{prefix.lower()}.sqlite3')
+        return SQLiteBackend(os.environ.get(f'{prefix}_SQLITE_PATH', default_path))
+    if kind == 'memory':
+        return MemoryBackend(max_entries=int(os.environ.get(f'{prefix}_MAX_ENTRIES', 1024)))
+    raise ValueError(f"Unknown {prefix}_BACKEND: {kind}")
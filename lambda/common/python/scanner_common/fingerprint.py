@@ -0,0 +1,74 @@
+"""
+Normalization and hashing helpers shared by the scanner caches.
+"""
+
+import ast
+import hashlib
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+
+def normalize_text(text):
+    """Case/whitespace-insensitive form of a free-text description"""
+    return re.sub(r'\s+', ' ', (text or '')).strip().lower()
+
+
+def normalize_target(target_url):
+    """Lowercase scheme/host and drop a trailing slash"""
+    target_url = (target_url or '').strip()
+    if not target_url:
+        return ''
+    parts = urlsplit(target_url)
+    path = parts.path.rstrip('/')
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+
+def script_fingerprint(script):
+    """
+    sha256 of the script's AST dump, so comments, blank lines and formatting
+    do not change it. Unparseable scripts fall back to whitespace-normalized text.
+    """
+    try:
+        material = ast.dump(ast.parse(script or ''))
+    except SyntaxError:
+        material = re.sub(r'\s+', ' ', script or '').strip()
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def _target_hosts(target_urls):
+    hosts = set()
+    for target_url in target_urls:
+        netloc = urlsplit(normalize_target(target_url)).netloc
+        if netloc:
+            hosts.add(netloc)
+            hosts.add(netloc.rsplit('@', 1)[-1])
+    return hosts
+
+
+def hardcodes_target(script, target_urls):
+    """
+    True when a string literal in the script names one of the target hosts,
+    i.e. it would not run unchanged against another host. A fallback in
+    os.environ.get('TARGET_URL', ...) / os.getenv(...) does not count.
+    Unparseable scripts fall back to a plain substring search.
+    """
+    hosts = _target_hosts(target_urls)
+    if not hosts:
+        return False
+    try:
+        tree = ast.parse(script or '')
+    except SyntaxError:
+        text = (script or '').lower()
+        return any(host in text for host in hosts)
+
+    fallbacks = set()
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr in ('get', 'getenv') and len(node.args) > 1
+                and isinstance(node.args[0], ast.Constant) and node.args[0].value == 'TARGET_URL'):
+            fallbacks.add(id(node.args[1]))
+    return any(
+        isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in fallbacks
+        and any(host in node.value.lower() for host in hosts)
+        for node in ast.walk(tree)
+    )
@@ -0,0 +1,174 @@
+"""
+Static pre-flight checks for generated scripts.
+
+Cheap enough to run in the generator before returning a script and in the
+detonator before forking anything: parse the script, make sure every import
+resolves in the detonator runtime, and flag obviously destructive calls.
+Results are plain dicts so they can go straight into a response body:
+
+    {"ok": false,
+     "reasons": [{"code": "missing_module", "message": "...", "line": 3, "module": "requests"}],
+     "imports": ["json", "requests"]}
+"""
+
+import ast
+import functools
+import importlib.util
+import os
+import sys
+
+# Calls that have no business in a non-destructive validation script
+DESTRUCTIVE_CALLS = {
+    'os.system', 'os.popen', 'os.remove', 'os.unlink', 'os.rmdir', 'os.removedirs',
+    'os.kill', 'os.killpg', 'os.fork', 'os.execv', 'os.execve', 'os.execvp',
+    'shutil.rmtree', 'shutil.move',
+    'subprocess.run', 'subprocess.call', 'subprocess.check_call',
+    'subprocess.check_output', 'subprocess.Popen',
+    'ctypes.CDLL',
+}
+
+# Builtins that only ever appear in generated scripts to smuggle code in
+DESTRUCTIVE_BUILTINS = {'eval', 'exec', '__import__'}
+
+# Modules the detonator ships on top of the stdlib
+DEFAULT_EXTRA_MODULES = ('scanner_probe',)
+
+# Ways a script can report its verdict through the exit code
+EXIT_CALLS = {'sys.exit', 'exit', 'quit', 'os._exit', 'scanner_probe.verdict'}
+
+
+def _reason(code, message, node=None, **extra):
+    reason = {'code': code, 'message': message, 'line': getattr(node, 'lineno', None)}
+    reason.update(extra)
+    return reason
+
+
+def detonator_modules():
+    """
+    Top-level modules known to exist in the detonator runtime: the stdlib of
+    this Python version plus DETONATOR_EXTRA_MODULES (comma separated).
+    Both Lambdas run the same Python version, so the generator can use this too.
+    """
+    extra = os.environ.get('DETONATOR_EXTRA_MODULES')
+    names = set(sys.stdlib_module_names)
+    names.update(DEFAULT_EXTRA_MODULES)
+    if extra:
+        names.update(name.strip() for name in extra.split(',') if name.strip())
+    return names
+
+
+@functools.lru_cache(maxsize=1024)
+def module_resolvable(name):
+    """True when `import name` would succeed in *this* process"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _dotted_name(node):
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return '.'.join(reversed(parts))
+    return None
+
+
+class _Visitor(ast.NodeVisitor):
+
+    def __init__(self):
+        self.imports = []      # (top-level module, node)
+        self.aliases = {}      # local name -> dotted origin, for `from os import system`
+        self.calls = []        # (dotted name, node)
+        self.raises_exit = False
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.imports.append((alias.name.split('.')[0], node))
+            self.aliases[alias.asname or alias.name.split('.')[0]] = (
+                alias.name if alias.asname else alias.name.split('.')[0]
+            )
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        if node.level == 0 and node.module:
+            self.imports.append((node.module.split('.')[0], node))
+            for alias in node.names:
+                self.aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        name = _dotted_name(node.func)
+        if name:
+            head, _, rest = name.partition('.')
+            origin = self.aliases.get(head, head)
+            self.calls.append((f"{origin}.{rest}" if rest else origin, node))
+        self.generic_visit(node)
+
+    def visit_Raise(self, node):
+        exc = node.exc.func if isinstance(node.exc, ast.Call) else node.exc
+        if _dotted_name(exc) == 'SystemExit':
+            self.raises_exit = True
+        self.generic_visit(node)
+
+
+def preflight(script, available_modules=None, module_check=None, require_exit=False):
+    """
+    Check a script without running it.
+
+    available_modules: set of importable top-level names (default detonator_modules())
+    module_check: callable(name) -> bool used instead of the set, e.g.
+                  module_resolvable inside the detonator itself
+    require_exit: also insist on an explicit sys.exit()/SystemExit, since the
+                  detonator reads the verdict from the exit code
+    """
+    reasons = []
+    try:
+        tree = ast.parse(script or '')
+    except SyntaxError as e:
+        return {
+            'ok': False,
+            'reasons': [{'code': 'syntax_error', 'message': e.msg, 'line': e.lineno}],
+            'imports': []
+        }
+
+    if not tree.body:
+        reasons.append(_reason('empty_script', 'Script has no statements'))
+
+    visitor = _Visitor()
+    visitor.visit(tree)
+
+    if module_check is None:
+        known = available_modules if available_modules is not None else detonator_modules()
+        module_check = known.__contains__
+
+    seen = set()
+    for module, node in visitor.imports:
+        if module in seen:
+            continue
+        seen.add(module)
+        if not module_check(module):
+            reasons.append(_reason('missing_module', f"Module '{module}' is not available in the detonator",
+                                   node, module=module))
+
+    for name, node in visitor.calls:
+        if name in DESTRUCTIVE_CALLS or name in DESTRUCTIVE_BUILTINS:
+            reasons.append(_reason('destructive_call', f"Call to {name} is not allowed", node, call=name))
+
+    if require_exit and tree.body and not visitor.raises_exit and not any(
+            name in EXIT_CALLS for name, _ in visitor.calls):
+        reasons.append(_reason('missing_exit', 'Script never sets an exit code (0 = vulnerable, 1 = not)'))
+
+    return {
+        'ok': not reasons,
+        'reasons': reasons,
+        'imports': sorted(seen)
+    }
+
+
+def enabled(variable):
+    """Pre-flight is on unless the given env variable says otherwise"""
+    return os.environ.get(variable, 'true').lower() == 'true'
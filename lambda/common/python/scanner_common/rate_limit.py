@@ -0,0 +1,527 @@
+"""
+Client-side rate limiting for LLM calls: token buckets, adaptive retry and
+a circuit breaker.
+
+    limiter = rate_limit.get_limiter()
+    response = limiter.call(model, tokens, lambda: client.chat.completions.create(...))
+    response = await limiter.call_async(model, tokens, lambda: async_client.chat.completions.create(...))
+
+Every call first reserves one request and `tokens` tokens (prompt estimate
+plus max_tokens, which is what the provider counts against the limit) from
+the model's two buckets and sleeps until the reservation is due; a bucket
+can go negative, so concurrent callers queue up in order instead of polling
+for the next free token. The token bucket holds at least
+LLM_MAX_REQUEST_TOKENS, so a request is always charged its full estimate,
+even when the per-container limit is smaller than one request. Buckets live in a store every invocation shares:
+
+- memory: per container (the local stand-in; also what tests and the
+          pipeline use)
+- redis:  one atomic Lua script per take, shared by every container
+          (needs `redis`; falls back to memory when Redis is unreachable)
+- none:   no buckets, only retry and the circuit breaker
+
+A 429 or 5xx is retried with jittered exponential backoff. A Retry-After
+header is honored and also pauses the model's buckets, so the other callers
+back off with us instead of walking into the same 429. Once a model fails
+LLM_BREAKER_THRESHOLD times in a row its circuit opens and calls fail fast
+with Overloaded (the handler answers 503) until a trial call succeeds.
+Overloaded is also raised straight away, instead of waiting, when the
+reservation would not be due before LLM_RATE_LIMIT_MAX_WAIT_SECONDS or the
+invocation's deadline (see bind()).
+
+Metrics go through timing: rate_limit_wait and retry_backoff phases, and
+llm_calls / llm_rate_limited / llm_throttled / llm_retries / llm_shed counts
+(throttle rate is llm_throttled / llm_calls).
+"""
+
+import asyncio
+import contextvars
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+
+from scanner_common import timing
+
+DEFAULT_BURST_SECONDS = 10
+DEFAULT_MAX_REQUEST_TOKENS = 4096
+DEFAULT_MAX_WAIT_SECONDS = 20
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_RETRY_BASE_SECONDS = 0.5
+DEFAULT_RETRY_MAX_SECONDS = 20
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET_SECONDS = 30
+
+# Milliseconds of the invocation kept back for the response after giving up
+DEFAULT_DEADLINE_RESERVE_MS = 3000
+
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+RETRYABLE_ERRORS = ('APIConnectionError', 'APITimeoutError')
+
+_deadline = contextvars.ContextVar('rate_limit_deadline', default=None)
+
+
+class Overloaded(Exception):
+    """The call was shed (or gave up retrying); retry_after is a hint in seconds"""
+
+    def __init__(self, message, retry_after=None, reason=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return float(default)
+
+
+# ============================================================================
+# Bucket stores
+# ============================================================================
+
+class MemoryBuckets:
+    """In-process buckets, shared by the threads and tasks of one container"""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._levels = {}
+        self._paused = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, limits, amounts, max_wait):
+        """
+        Reserve amounts[name] from every bucket in limits {name: (capacity,
+        refill per second, level of a new bucket)}, all or nothing. Returns
+        (seconds until the reservation is due, reserved); nothing is reserved
+        when that would be later than max_wait or the buckets are paused.
+        """
+        with self._lock:
+            now = self._clock()
+            paused = self._paused.get(key, 0) - now
+            if paused > 0:
+                return paused, False
+            levels = {}
+            wait = 0.0
+            for name, (capacity, rate, initial) in limits.items():
+                level, updated = self._levels.get((key, name), (initial, now))
+                level = min(capacity, level + max(0.0, now - updated) * rate)
+                levels[name] = level
+                amount = amounts.get(name, 0)
+                if amount > level:
+                    wait = max(wait, (amount - level) / rate)
+            reserved = wait <= max_wait
+            for name, level in levels.items():
+                if reserved:
+                    level -= amounts.get(name, 0)
+                self._levels[(key, name)] = (level, now)
+            return wait, reserved
+
+    def pause(self, key, seconds):
+        """Nobody takes from key's buckets for the next `seconds`"""
+        with self._lock:
+            until = self._clock() + seconds
+            self._paused[key] = max(self._paused.get(key, 0), until)
+
+
+# MemoryBuckets.take in Lua. KEYS[1] is the pause key, KEYS[2..] the buckets;
+# ARGV[1] is max_wait, then capacity, rate, initial level and amount per
+# bucket. Redis' own
+# clock keeps every container consistent.
+_TAKE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local paused = tonumber(redis.call('GET', KEYS[1]) or '0') - now
+if paused > 0 then return {tostring(paused), 0} end
+local wait = 0
+local levels = {}
+for i = 2, #KEYS do
+    local j = (i - 2) * 4 + 1
+    local capacity = tonumber(ARGV[j + 1])
+    local rate = tonumber(ARGV[j + 2])
+    local amount = tonumber(ARGV[j + 4])
+    local state = redis.call('HMGET', KEYS[i], 'level', 'updated')
+    local level = tonumber(state[1]) or tonumber(ARGV[j + 3])
+    local updated = tonumber(state[2]) or now
+    level = math.min(capacity, level + math.max(0, now - updated) * rate)
+    levels[i] = level
+    if amount > level then wait = math.max(wait, (amount - level) / rate) end
+end
+local reserved = wait <= tonumber(ARGV[1])
+for i = 2, #KEYS do
+    local j = (i - 2) * 4 + 1
+    local level = levels[i]
+    if reserved then level = level - tonumber(ARGV[j + 4]) end
+    redis.call('HSET', KEYS[i], 'level', tostring(level), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[i], math.ceil(tonumber(ARGV[j + 1]) / tonumber(ARGV[j + 2])) + 60)
+end
+return {tostring(wait), reserved and 1 or 0}
+"""
+
+_PAUSE_SCRIPT = """
+local t = redis.call('TIME')
+local until_ = tonumber(t[1]) + tonumber(t[2]) / 1000000 + tonumber(ARGV[1])
+if until_ > tonumber(redis.call('GET', KEYS[1]) or '0') then
+    redis.call('SET', KEYS[1], tostring(until_), 'PX', math.ceil(tonumber(ARGV[1]) * 1000))
+end
+return 1
+"""
+
+
+class RedisBuckets:
+    """Buckets in Redis, shared by every container; memory while Redis is down"""
+
+    def __init__(self, url=None, client=None, prefix='ratelimit'):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("RedisBuckets requires the 'redis' package") from e
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._client = client
+        self._prefix = prefix
+        self._take = client.register_script(_TAKE_SCRIPT)
+        self._pause = client.register_script(_PAUSE_SCRIPT)
+        self._fallback = MemoryBuckets()
+
+    def take(self, key, limits, amounts, max_wait):
+        keys = [f"{self._prefix}:{key}:paused"]
+        args = [max_wait]
+        for name, (capacity, rate, initial) in limits.items():
+            keys.append(f"{self._prefix}:{key}:{name}")
+            args.extend((capacity, rate, initial, amounts.get(name, 0)))
+        try:
+            wait, reserved = self._take(keys=keys, args=args)
+            return float(wait), bool(reserved)
+        except Exception as e:
+            print(f"Error: rate limit store unavailable, limiting locally: {str(e)}")
+            return self._fallback.take(key, limits, amounts, max_wait)
+
+    def pause(self, key, seconds):
+        self._fallback.pause(key, seconds)
+        try:
+            self._pause(keys=[f"{self._prefix}:{key}:paused"], args=[seconds])
+        except Exception as e:
+            print(f"Error: rate limit store unavailable: {str(e)}")
+
+
+# ============================================================================
+# Circuit breaker
+# ============================================================================
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures. While open every call is
+    rejected; after reset_seconds one trial call goes through (half-open)
+    and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold=DEFAULT_BREAKER_THRESHOLD, reset_seconds=DEFAULT_BREAKER_RESET_SECONDS,
+                 clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        return 'open' if self._trial_at is None else 'half_open'
+
+    def check(self):
+        """Seconds until a call may go through; 0 means go ahead"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            now = self._clock()
+            # A trial that never reported back (shed, cancelled) expires too
+            since = self._opened_at if self._trial_at is None else self._trial_at
+            remaining = since + self.reset_seconds - now
+            if remaining > 0:
+                return remaining
+            self._trial_at = now
+            return 0
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_at is not None or self._failures >= self.threshold:
+                self._opened_at = self._clock()
+                self._trial_at = None
+
+
+# ============================================================================
+# Errors
+# ============================================================================
+
+def status_code(error):
+    return getattr(error, 'status_code', None)
+
+
+def is_retryable(error):
+    if getattr(error, 'code', None) == 'insufficient_quota':
+        # A 429 that no amount of waiting fixes
+        return False
+    status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(error):
+    """Seconds from the response's retry-after-ms / Retry-After headers, or None"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        value = headers.get('retry-after-ms')
+        if value is not None:
+            return max(0.0, float(value) / 1000)
+        value = headers.get('retry-after')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(messages, max_tokens, n=1):
+    """What a request counts against the token limit: ~4 characters per prompt token plus max_tokens per choice"""
+    prompt = sum(len(str(message.get('content') or '')) for message in messages)
+    return prompt // 4 + max_tokens * n
+
+
+# ============================================================================
+# Limiter
+# ============================================================================
+
+def bind(context, reserve_ms=None):
+    """Give up waiting before the invocation runs out of time (call at the top of the handler)"""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        _deadline.set(None)
+        return
+    if reserve_ms is None:
+        reserve_ms = int(os.environ.get('LLM_DEADLINE_RESERVE_MS', DEFAULT_DEADLINE_RESERVE_MS))
+    _deadline.set(time.monotonic() + max(0, context.get_remaining_time_in_millis() - reserve_ms) / 1000.0)
+
+
+class RateLimiter:
+    """
+    limits maps model -> {"rpm": ..., "tpm": ...} ("*" for any other model);
+    a model with no limits skips the buckets but still gets retry and a
+    circuit breaker.
+    """
+
+    def __init__(self, buckets=None, limits=None, burst_seconds=DEFAULT_BURST_SECONDS,
+                 max_request_tokens=DEFAULT_MAX_REQUEST_TOKENS, max_wait=DEFAULT_MAX_WAIT_SECONDS, max_retries=DEFAULT_MAX_RETRIES,
+                 retry_base=DEFAULT_RETRY_BASE_SECONDS, retry_max=DEFAULT_RETRY_MAX_SECONDS,
+                 breaker_threshold=DEFAULT_BREAKER_THRESHOLD, breaker_reset=DEFAULT_BREAKER_RESET_SECONDS,
+                 rng=random.random):
+        self.buckets = buckets
+        self.limits = dict(limits or {})
+        self.burst_seconds = burst_seconds
+        self.max_request_tokens = max_request_tokens
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self._rng = rng
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, model):
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+            return self._breakers[model]
+
+    def bucket_limits(self, model):
+        """
+        {bucket: (capacity, refill per second, level of a new bucket)} for the
+        model. The capacity holds at least one whole request (max_request_tokens
+        for the token bucket), so a slow bucket can save up for it; a new
+        bucket starts with the plain burst only, so a fresh container gets no
+        head start.
+        """
+        limits = self.limits.get(model, self.limits.get('*')) or {}
+        buckets = {}
+        for name, key, largest in (('requests', 'rpm', 1.0), ('tokens', 'tpm', self.max_request_tokens)):
+            if limits.get(key):
+                rate = float(limits[key]) / 60
+                burst = rate * self.burst_seconds
+                buckets[name] = (max(burst, largest), rate, max(burst, 1.0))
+        return buckets
+
+    def _shed(self, model, seconds, reason):
+        timing.count('llm_shed')
+        return Overloaded(f"{model} is overloaded ({reason}), retry in {seconds:.1f}s",
+                          retry_after=round(seconds, 3), reason=reason)
+
+    def _budget(self, started):
+        """Seconds this call may still spend waiting"""
+        budget = self.max_wait - (time.monotonic() - started)
+        deadline = _deadline.get()
+        if deadline is not None:
+            budget = min(budget, deadline - time.monotonic())
+        return budget
+
+    def _reserve(self, model, tokens, started):
+        """
+        (seconds to sleep, reserved) before the next attempt; once reserved the
+        attempt goes ahead after the sleep. Raises Overloaded when shedding.
+        """
+        blocked = self.breaker(model).check()
+        if blocked:
+            raise self._shed(model, blocked, 'circuit_open')
+        limits = self.bucket_limits(model)
+        if not limits or self.buckets is None:
+            return 0, True
+        # Charged in full: a request that does not fit yet waits (or is shed)
+        # until the bucket has refilled that far, however small the limit
+        amounts = {'requests': 1, 'tokens': tokens}
+        budget = self._budget(started)
+        wait, reserved = self.buckets.take(model, limits, amounts, max(0.0, budget))
+        if not reserved and wait > budget:
+            raise self._shed(model, wait, 'rate_limited')
+        return wait, reserved
+
+    def _backoff(self, model, error, attempt, started):
+        """Delay before retrying after `error`; re-raises it (or Overloaded) when giving up"""
+        if not is_retryable(error):
+            raise error
+        self.breaker(model).record_failure()
+        hinted = retry_after(error)
+        if status_code(error) == 429:
+            timing.count('llm_throttled')
+            if hinted and self.buckets is not None:
+                self.buckets.pause(model, hinted)
+        backoff = self._rng() * min(self.retry_max, self.retry_base * 2 ** attempt)
+        delay = hinted + self._rng() * self.retry_base if hinted is not None else backoff
+        if attempt >= self.max_retries or delay > self._budget(started):
+            raise self._shed(model, delay, 'throttled' if status_code(error) == 429 else 'upstream_error') from error
+        timing.count('llm_retries')
+        print(f"{model} returned {status_code(error) or type(error).__name__}, "
+              f"retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        return delay
+
+    def call(self, model, tokens, fn):
+        """fn() under the model's limits, retried on throttling and transient errors"""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            reserved = False
+            while not reserved:
+                wait, reserved = self._reserve(model, tokens, started)
+                if wait:
+                    timing.count('llm_rate_limited')
+                    with timing.span('rate_limit_wait'):
+                        time.sleep(wait)
+            timing.count('llm_calls')
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._backoff(model, e, attempt, started)
+                with timing.span('retry_backoff'):
+                    time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker(model).record_success()
+            return result
+
+    async def call_async(self, model, tokens, fn):
+        """call() for coroutine functions; fn() must return a fresh awaitable each time"""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            reserved = False
+            while not reserved:
+                wait, reserved = self._reserve(model, tokens, started)
+                if wait:
+                    timing.count('llm_rate_limited')
+                    with timing.span('rate_limit_wait'):
+                        await asyncio.sleep(wait)
+            timing.count('llm_calls')
+            try:
+                result = await fn()
+            except Exception as e:
+                delay = self._backoff(model, e, attempt, started)
+                with timing.span('retry_backoff'):
+                    await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker(model).record_success()
+            return result
+
+
+def limits_from_env():
+    """LLM_RATE_LIMITS: JSON {"<model>" | "*": {"rpm": ..., "tpm": ...}}"""
+    value = os.environ.get('LLM_RATE_LIMITS')
+    if not value:
+        return {}
+    try:
+        limits = json.loads(value)
+        if not isinstance(limits, dict):
+            raise ValueError('expected a JSON object')
+        return limits
+    except ValueError as e:
+        print(f"Error: ignoring LLM_RATE_LIMITS: {str(e)}")
+        return {}
+
+
+def limiter_from_env():
+    """
+    RateLimiter from LLM_RATE_LIMIT_BACKEND (memory | redis | none, Redis at
+    LLM_RATE_LIMIT_REDIS_URL), LLM_RATE_LIMITS and the LLM_* tuning knobs.
+    """
+    kind = os.environ.get('LLM_RATE_LIMIT_BACKEND', 'memory').lower()
+    buckets = None
+    if kind == 'redis':
+        buckets = RedisBuckets(os.environ['LLM_RATE_LIMIT_REDIS_URL'])
+    elif kind == 'memory':
+        buckets = MemoryBuckets()
+    elif kind != 'none':
+        print(f"Unknown LLM_RATE_LIMIT_BACKEND {kind!r}, using memory")
+        buckets = MemoryBuckets()
+    return RateLimiter(
+        buckets,
+        limits_from_env(),
+        burst_seconds=_env_float('LLM_RATE_LIMIT_BURST_SECONDS', DEFAULT_BURST_SECONDS),
+        max_request_tokens=_env_float('LLM_MAX_REQUEST_TOKENS', DEFAULT_MAX_REQUEST_TOKENS),
+        max_wait=_env_float('LLM_RATE_LIMIT_MAX_WAIT_SECONDS', DEFAULT_MAX_WAIT_SECONDS),
+        max_retries=int(os.environ.get('LLM_MAX_RETRIES', DEFAULT_MAX_RETRIES)),
+        retry_base=_env_float('LLM_RETRY_BASE_SECONDS', DEFAULT_RETRY_BASE_SECONDS),
+        retry_max=_env_float('LLM_RETRY_MAX_SECONDS', DEFAULT_RETRY_MAX_SECONDS),
+        breaker_threshold=int(os.environ.get('LLM_BREAKER_THRESHOLD', DEFAULT_BREAKER_THRESHOLD)),
+        breaker_reset=_env_float('LLM_BREAKER_RESET_SECONDS', DEFAULT_BREAKER_RESET_SECONDS),
+    )
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """The container's limiter (breaker state and memory buckets survive warm invocations)"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = limiter_from_env()
+        return _limiter
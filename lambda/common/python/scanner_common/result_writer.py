@@ -0,0 +1,292 @@
+"""
+Buffered writer for detonation verdicts into PostgreSQL (through RDS Proxy
+in AWS, any PostgreSQL locally).
+
+    writer = result_writer.get_writer()      # None when no database is configured
+    writer.add(scan_id, entry)               # cheap; buffers one row
+    writer.flush()                           # batch_size rows per transaction
+
+Rows are written in batches - multi-row INSERTs (RESULT_WRITER_METHOD=insert,
+the default) or COPY (=copy) - over one long-lived connection per process;
+RDS Proxy multiplexes those onto a small pool of database connections.
+Connection errors, admin shutdowns and writes that land on a demoted primary
+after a failover close the connection and retry the batch on a fresh one
+with jittered backoff. Every row carries a client-generated result_id, so a batch whose
+commit was lost in flight is detected on retry and not written twice.
+
+Connection settings, first match wins:
+- RESULTS_DATABASE_URL: a libpq conninfo/URL (local PostgreSQL, tests)
+- RESULTS_DB_HOST (+ _PORT, _NAME, _USER): IAM authentication against the
+  proxy; the token is signed locally, so no AWS endpoint is needed
+
+Needs the `psycopg` (v3) package, imported on first flush.
+"""
+
+import datetime
+import os
+import random
+import threading
+import time
+import uuid
+
+from scanner_common import warm_cache
+
+DEFAULT_TABLE = 'scan_results'
+
+COLUMNS = (
+    'result_id', 'scan_id', 'item_id', 'target_url', 'status', 'vulnerable', 'exit_code',
+    'timed_out', 'elapsed_ms', 'output_digest', 'result_cache_hit', 'created_at',
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    result_id        uuid PRIMARY KEY,
+    scan_id          text NOT NULL,
+    item_id          text,
+    target_url       text,
+    status           text NOT NULL,
+    vulnerable       boolean NOT NULL,
+    exit_code        integer,
+    timed_out        boolean NOT NULL DEFAULT false,
+    elapsed_ms       integer,
+    output_digest    text,
+    result_cache_hit boolean NOT NULL DEFAULT false,
+    created_at       timestamptz NOT NULL
+)
+"""
+
+# PostgreSQL caps a statement at 65535 bind parameters
+MAX_ROWS_PER_INSERT = 65535 // len(COLUMNS)
+
+# SQLSTATE classes/codes worth a reconnect: connection exceptions (08),
+# operator intervention - admin shutdown, crash, cannot connect now (57P),
+# and read_only_sql_transaction, which is what a demoted primary answers
+RETRYABLE_SQLSTATES = ('08', '57P', '25006')
+
+
+def _is_retryable(error):
+    import psycopg
+    if isinstance(error, (psycopg.OperationalError, psycopg.InterfaceError)):
+        return True
+    sqlstate = getattr(error, 'sqlstate', None) or ''
+    return any(sqlstate.startswith(code) for code in RETRYABLE_SQLSTATES)
+
+
+def row_from_entry(scan_id, entry):
+    """Column values for one verdict (a detonation response or batch entry)"""
+    timed_out = bool(entry.get('timed_out'))
+    item_id = entry.get('id')
+    return (
+        uuid.uuid4(),
+        str(scan_id),
+        None if item_id is None else str(item_id),
+        entry.get('target_url', ''),
+        entry.get('status') or ('timeout' if timed_out else 'ok'),
+        bool(entry.get('vulnerable')),
+        entry.get('exit_code'),
+        timed_out,
+        entry.get('elapsed_ms'),
+        entry.get('output_digest'),
+        bool(entry.get('result_cache_hit')),
+        datetime.datetime.now(datetime.timezone.utc),
+    )
+
+
+def conninfo_from_env():
+    """libpq connection string for the results database, or None if unconfigured"""
+    url = os.environ.get('RESULTS_DATABASE_URL')
+    if url:
+        return url
+    host = os.environ.get('RESULTS_DB_HOST')
+    if not host:
+        return None
+    from psycopg.conninfo import make_conninfo
+    port = int(os.environ.get('RESULTS_DB_PORT', 5432))
+    user = os.environ.get('RESULTS_DB_USER', 'postgres')
+    token = warm_cache.get_boto3_client('rds').generate_db_auth_token(
+        DBHostname=host, Port=port, DBUsername=user
+    )
+    return make_conninfo(host=host, port=port, user=user, password=token, sslmode='require',
+                         dbname=os.environ.get('RESULTS_DB_NAME', 'scannerdb'))
+
+
+class ResultWriter:
+    """
+    Thread-safe buffer of verdict rows with batched, retried flushes.
+
+    conninfo may be a string or a callable returning one (IAM tokens expire,
+    so they are minted per connection). Rows that still fail after
+    max_retries stay buffered for the next flush, up to max_buffer rows
+    (the oldest are dropped beyond that).
+    """
+
+    def __init__(self, conninfo, table=DEFAULT_TABLE, method='insert', batch_size=500,
+                 max_retries=3, backoff_seconds=0.2, max_buffer=10000, connect_timeout=5):
+        if method not in ('insert', 'copy'):
+            raise ValueError(f"Unknown result writer method: {method}")
+        self._conninfo = conninfo
+        self.table = table
+        self.method = method
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_buffer = max_buffer
+        self.connect_timeout = connect_timeout
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._conn = None
+        self.stats = {'rows_written': 0, 'batches': 0, 'retries': 0, 'reconnects': 0, 'dropped': 0}
+
+    def add(self, scan_id, entry):
+        """Buffer one verdict; flushes once batch_size rows are waiting"""
+        with self._lock:
+            self._buffer.append(row_from_entry(scan_id, entry))
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def pending(self):
+        return len(self._buffer)
+
+    def flush(self):
+        """
+        Write everything buffered, batch_size rows per transaction. Returns
+        the number of rows written; failures are logged, never raised.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._buffer[:self.batch_size]
+                    del self._buffer[:self.batch_size]
+                if not batch:
+                    return written
+                try:
+                    self._write_with_retry(batch)
+                except Exception as e:
+                    print(f"Error: result write failed, {len(batch)} rows kept for the next flush: {str(e)}")
+                    self._requeue(batch)
+                    return written
+                written += len(batch)
+
+    def _requeue(self, batch):
+        with self._lock:
+            self._buffer[:0] = batch
+            overflow = len(self._buffer) - self.max_buffer
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self.stats['dropped'] += overflow
+
+    def _connect(self):
+        import psycopg
+        conninfo = self._conninfo() if callable(self._conninfo) else self._conninfo
+        # No server-side prepared statements: RDS Proxy pins the session on them
+        return psycopg.connect(conninfo, connect_timeout=self.connect_timeout, prepare_threshold=None)
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = self._connect()
+        return self._conn
+
+    def _discard_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+        self.stats['reconnects'] += 1
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def ensure_schema(self):
+        from psycopg import sql
+        conn = self._connection()
+        with conn.transaction():
+            conn.execute(sql.SQL(SCHEMA).format(table=sql.Identifier(self.table)))
+
+    def _write_with_retry(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                conn = self._connection()
+                # The previous attempt may have committed before the connection
+                # dropped; the batch is one transaction, so one id tells
+                if attempt and self._already_written(conn, batch[0][0]):
+                    break
+                with conn.transaction():
+                    if self.method == 'copy':
+                        self._copy(conn, batch)
+                    else:
+                        self._insert(conn, batch)
+                break
+            except Exception as e:
+                if not _is_retryable(e) or attempt == self.max_retries:
+                    self._discard_connection()
+                    raise
+                self._discard_connection()
+                self.stats['retries'] += 1
+                delay = self.backoff_seconds * (2 ** attempt)
+                time.sleep(random.uniform(delay / 2, delay))
+        self.stats['batches'] += 1
+        self.stats['rows_written'] += len(batch)
+
+    def _already_written(self, conn, result_id):
+        from psycopg import sql
+        with conn.transaction():
+            row = conn.execute(
+                sql.SQL('SELECT 1 FROM {table} WHERE result_id = %s').format(table=sql.Identifier(self.table)),
+                (result_id,)
+            ).fetchone()
+        return row is not None
+
+    def _insert(self, conn, batch):
+        from psycopg import sql
+        columns = sql.SQL(', ').join(map(sql.Identifier, COLUMNS))
+        placeholders = sql.SQL('({})').format(sql.SQL(', ').join(sql.Placeholder() * len(COLUMNS)))
+        for start in range(0, len(batch), MAX_ROWS_PER_INSERT):
+            rows = batch[start:start + MAX_ROWS_PER_INSERT]
+            statement = sql.SQL('INSERT INTO {table} ({columns}) VALUES {values} ON CONFLICT DO NOTHING').format(
+                table=sql.Identifier(self.table),
+                columns=columns,
+                values=sql.SQL(', ').join([placeholders] * len(rows))
+            )
+            conn.execute(statement, [value for row in rows for value in row])
+
+    def _copy(self, conn, batch):
+        from psycopg import sql
+        statement = sql.SQL('COPY {table} ({columns}) FROM STDIN').format(
+            table=sql.Identifier(self.table),
+            columns=sql.SQL(', ').join(map(sql.Identifier, COLUMNS))
+        )
+        with conn.cursor() as cursor:
+            with cursor.copy(statement) as copy:
+                for row in batch:
+                    copy.write_row(row)
+
+
+_writer = None
+_writer_loaded = False
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """This process's writer (Celery worker, warm container), or None when unconfigured"""
+    global _writer, _writer_loaded
+    if not _writer_loaded:
+        with _writer_lock:
+            if not _writer_loaded:
+                if os.environ.get('RESULTS_DATABASE_URL') or os.environ.get('RESULTS_DB_HOST'):
+                    _writer = ResultWriter(
+                        conninfo_from_env,
+                        table=os.environ.get('RESULTS_TABLE', DEFAULT_TABLE),
+                        method=os.environ.get('RESULT_WRITER_METHOD', 'insert'),
+                        batch_size=int(os.environ.get('RESULT_WRITER_BATCH_SIZE', 500)),
+                        max_retries=int(os.environ.get('RESULT_WRITER_MAX_RETRIES', 3))
+                    )
+                _writer_loaded = True
+    return _writer
+
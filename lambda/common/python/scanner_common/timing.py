@@ -0,0 +1,201 @@
+"""
+Per-phase timings for the handlers, emitted as CloudWatch Embedded Metric
+Format (EMF) log lines.
+
+    timings = timing.start(body, context)       # top of the handler
+    with timing.span('llm_request'):             # anywhere below it
+        ...
+    timing.count('llm_throttled')                # event counters, same lifetime
+    return timing.finish(response)               # adds total, emits, clears
+
+Spans find the invocation's Timings through a context variable, so helpers
+deep in the call stack need no extra parameters. Collection is on when
+TIMING_METRICS=true (one EMF line per invocation) or the event asks for
+"timings": true (returned in the response body). Otherwise span() hands back
+a shared no-op context manager and nothing else happens.
+
+Every metric carries the same fixed dimension set, Function, Environment,
+Model and CacheHit, so each line lands in exactly one series of a single
+dimension set. Model and CacheHit are filled in with set_property() and
+default to "none" and "false" when an invocation never sets them (a
+rejected request, a detonation). Anything else set_property() is given
+(e.g. Mode) is a plain property of the log line, for Logs Insights.
+
+Worker threads (batch and race modes) start with an empty context, so their
+spans are no-ops; the invocation total is still recorded.
+"""
+
+import contextvars
+import json
+import os
+import time
+
+DEFAULT_NAMESPACE = 'VulnScanner'
+
+DIMENSIONS = ('Function', 'Environment', 'Model', 'CacheHit')
+
+# Values of the per-invocation dimensions until set_property() sets them
+DIMENSION_DEFAULTS = {'Model': 'none', 'CacheHit': 'false'}
+
+_current = contextvars.ContextVar('scanner_timings', default=None)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('_timings', '_name', '_started')
+
+    def __init__(self, timings, name):
+        self._timings = timings
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._timings.record(self._name, (time.perf_counter() - self._started) * 1000)
+        return False
+
+
+class Timings:
+    """Milliseconds per phase (and event counts) for one invocation; repeats accumulate"""
+
+    def __init__(self, emit_metrics=False, include_in_response=False, dimensions=None, properties=None):
+        self.emit_metrics = emit_metrics
+        self.include_in_response = include_in_response
+        values = dict(DIMENSION_DEFAULTS, **(dimensions or {}))
+        self.dimensions = {name: str(values.get(name, '')) for name in DIMENSIONS}
+        self.properties = {}
+        for name, value in (properties or {}).items():
+            self.set_property(name, value)
+        self.phases = {}
+        self.counts = {}
+        self.started = time.perf_counter()
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def record(self, name, milliseconds):
+        self.phases[name] = self.phases.get(name, 0.0) + milliseconds
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def set_property(self, name, value):
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        if name in DIMENSION_DEFAULTS:
+            self.dimensions[name] = str(value) if value not in (None, '') else DIMENSION_DEFAULTS[name]
+        else:
+            self.properties[name] = str(value)
+
+    def to_dict(self):
+        values = {name: round(ms, 2) for name, ms in self.phases.items()}
+        values.update(self.counts)
+        return values
+
+    def emf(self, namespace=None):
+        """The invocation's EMF document (one metric per phase, *_ms, and per count)"""
+        metrics = {f"{name}_ms": round(ms, 2) for name, ms in self.phases.items()}
+        units = {name: 'Milliseconds' for name in metrics}
+        for name, value in self.counts.items():
+            metrics[name] = value
+            units[name] = 'Count'
+        document = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': namespace or os.environ.get('METRICS_NAMESPACE', DEFAULT_NAMESPACE),
+                    'Dimensions': [list(DIMENSIONS)],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, unit in units.items()],
+                }],
+            },
+        }
+        document.update(self.properties)
+        document.update(self.dimensions)
+        document.update(metrics)
+        return document
+
+
+def metrics_enabled():
+    return os.environ.get('TIMING_METRICS', 'false').lower() == 'true'
+
+
+def start(body=None, context=None, **properties):
+    """
+    Begin timing an invocation. Returns the Timings, or None when neither
+    metrics nor response timings are wanted (every span is then a no-op).
+    """
+    include = bool(body and body.get('timings'))
+    emit_metrics = metrics_enabled()
+    if not (include or emit_metrics):
+        _current.set(None)
+        return None
+    function = getattr(context, 'function_name', None) or os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+    dimensions = {'Function': function, 'Environment': os.environ.get('ENVIRONMENT', 'dev')}
+    timings = Timings(emit_metrics, include, dimensions, properties)
+    _current.set(timings)
+    return timings
+
+
+def current():
+    return _current.get()
+
+
+def span(name):
+    """Time a block as phase `name` of the current invocation (no-op when off)"""
+    timings = _current.get()
+    if timings is None:
+        return _NULL_SPAN
+    return timings.span(name)
+
+
+def count(name, n=1):
+    """Add n to counter `name` of the current invocation (no-op when off)"""
+    timings = _current.get()
+    if timings is not None:
+        timings.count(name, n)
+
+
+def set_property(name, value):
+    """Tag the current invocation: Model and CacheHit are dimensions, anything else a property"""
+    timings = _current.get()
+    if timings is not None:
+        timings.set_property(name, value)
+
+
+def dumps(value):
+    """json.dumps, timed as the serialization phase"""
+    with span('serialization'):
+        return json.dumps(value)
+
+
+def finish(response):
+    """
+    Record the total, print the EMF line and, when the event asked for it,
+    splice {"timings": ...} into the response body without re-serializing it.
+    """
+    timings = _current.get()
+    if timings is None:
+        return response
+    _current.set(None)
+    timings.record('total', (time.perf_counter() - timings.started) * 1000)
+    if timings.emit_metrics:
+        print(json.dumps(timings.emf()))
+    body = response.get('body')
+    if timings.include_in_response and isinstance(body, str) and body.endswith('}'):
+        separator = ', ' if body.rstrip('}').strip() != '{' else ''
+        response['body'] = f'{body[:-1]}{separator}"timings": {json.dumps(timings.to_dict())}}}'
+    return response
@@ -0,0 +1,136 @@
+"""
+Warm-container cache for secrets and SDK clients.
+
+Module globals survive between invocations of the same Lambda execution
+environment, so secrets and clients stored here are fetched/built once per
+container instead of once per request.
+"""
+
+import json
+import os
+import threading
+import time
+
+from scanner_common import timing
+
+
+def _env_seconds(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return float(default)
+
+
+class WarmCache:
+    """
+    Thread-safe TTL cache with single-flight loading.
+
+    Concurrent callers asking for the same missing key wait on a per-key lock,
+    so only one of them runs the loader; the others reuse its result.
+    A ttl of None means the entry never expires (only explicit invalidation).
+    """
+
+    def __init__(self, ttl_seconds=None, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= self._clock():
+            return None
+        return entry
+
+    def get(self, key, loader, ttl_seconds=None):
+        """Return the cached value for key, calling loader() once on a miss"""
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                return entry[0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another caller may have loaded the value while we waited
+            with self._lock:
+                entry = self._fresh(key)
+                if entry is not None:
+                    return entry[0]
+
+            value = loader()
+
+            ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+            expires_at = None if ttl is None else self._clock() + ttl
+            with self._lock:
+                self._entries[key] = (value, expires_at)
+            return value
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Drop every key for which predicate(key) is true"""
+        with self._lock:
+            for key in [k for k in self._entries if predicate(k)]:
+                del self._entries[key]
+
+
+# Secrets rotate, so they expire; clients only go away when their secret does
+_secrets = WarmCache(ttl_seconds=_env_seconds('SECRET_CACHE_TTL_SECONDS', 300))
+_clients = WarmCache(ttl_seconds=_env_seconds('CLIENT_CACHE_TTL_SECONDS', 3600))
+
+
+def get_boto3_client(service_name):
+    """Return a boto3 client that lives for the whole container"""
+    def _build():
+        import boto3
+        return boto3.client(service_name)
+    return _clients.get(('boto3', service_name), _build, ttl_seconds=float('inf'))
+
+
+def get_secret(secret_arn, field=None):
+    """
+    Return a Secrets Manager secret, parsed as JSON when possible.
+    With field set, return only that key of the JSON secret; a secret that
+    is not a JSON object raises ValueError.
+    """
+    def _load():
+        with timing.span('secret_fetch'):
+            response = get_boto3_client('secretsmanager').get_secret_value(SecretId=secret_arn)
+        raw = response['SecretString']
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return raw
+
+    secret = _secrets.get(secret_arn, _load)
+    if field is None:
+        return secret
+    if not isinstance(secret, dict):
+        raise ValueError(f"Secret {secret_arn} is not a JSON object, cannot read field {field!r}")
+    return secret.get(field)
+
+
+def get_client(name, factory, depends_on=None):
+    """
+    Return a cached client built by factory().
+
+    depends_on names the secret the client was built from; refresh_secret()
+    on that secret also throws the client away so it is rebuilt with the new key.
+    """
+    return _clients.get((name, depends_on), factory)
+
+
+def refresh_secret(secret_arn):
+    """Forget a secret and every client built from it (e.g. after an auth error)"""
+    _secrets.invalidate(secret_arn)
+    _clients.invalidate_where(lambda key: key[-1] == secret_arn)
@@ -0,0 +1,305 @@
+"""
+Batch detonation: many scripts (or one script against many targets) in one
+invocation, run in parallel across the container's vCPUs.
+
+Expected event format, either
+{
+    "scan_id": "12345",
+    "scripts": [
+        {"id": "a", "script": "print('testing...')", "target_url": "http://10.0.1.45:8080", "timeout": 60},
+        ...
+    ]
+}
+or
+{
+    "scan_id": "12345",
+    "script": "print('testing...')",
+    "target_urls": ["http://10.0.1.45:8080", "http://10.0.1.46:8080"]
+}
+plus optional "timeout" (per-item default), "max_workers" (1 up to the
+worker cap, larger values are clamped) and "force_rerun".
+
+Every item is a separate child with its own rlimits and timeout. The
+response comes back once every item has finished, with the results listed
+in completion order; run_batch's on_result callback is where a caller can
+see each entry as soon as it finishes.
+The target_urls form fans one target-agnostic script out to every host (each
+child gets its own TARGET_URL): duplicate targets run once, the script is
+pre-flighted once for all of them, and the response adds a "verdicts" map
+keyed by target. Those children mostly wait on the network, so they are
+capped by DETONATOR_FANOUT_WORKERS rather than by the vCPU count.
+Item timeouts are clipped to the invocation's remaining budget; items that
+never got to start before it ran out are reported as skipped.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import capture
+import execution
+import result_cache
+from scanner_common import preflight, timing
+from scanner_common.fingerprint import normalize_target
+
+DEFAULT_TIMEOUT_SECONDS = execution.MAX_SCRIPT_SECONDS
+
+# Inline output per item never drops below this, however large the batch
+MIN_ITEM_OUTPUT_BYTES = 4 * 1024
+
+
+def expand_items(body):
+    """Normalize both event shapes into a list of item dicts"""
+    if isinstance(body.get('scripts'), list):
+        items = [dict(item) for item in body['scripts']]
+    else:
+        # One run per host, however the scanner spelled its URL
+        targets = {}
+        for target_url in body.get('target_urls', []):
+            targets.setdefault(normalize_target(target_url), target_url)
+        items = [
+            {'script': body.get('script', ''), 'target_url': target_url}
+            for target_url in targets.values()
+        ]
+    for index, item in enumerate(items):
+        item['index'] = index
+        item.setdefault('id', index)
+        item.setdefault('target_url', '')
+    return items
+
+
+def parse_timeout(value, default=DEFAULT_TIMEOUT_SECONDS):
+    """
+    Seconds from an event's "timeout" (missing or null: default). Raises
+    ValueError for anything but a positive number.
+    """
+    if value is None:
+        return float(default)
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"timeout must be a number of seconds, got {value!r}")
+    try:
+        seconds = float(value)
+    except ValueError:
+        raise ValueError(f"timeout must be a number of seconds, got {value!r}")
+    # Also rejects NaN
+    if not seconds > 0:
+        raise ValueError(f"timeout must be positive, got {value!r}")
+    return seconds
+
+
+def parse_workers(value, maximum):
+    """
+    Worker count from an event's "max_workers" (missing or null: maximum),
+    clamped to maximum. Raises ValueError unless it is a whole number >= 1.
+    """
+    if value is None:
+        return maximum
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"max_workers must be a whole number, got {value!r}")
+    try:
+        workers = float(value)
+    except ValueError:
+        raise ValueError(f"max_workers must be a whole number, got {value!r}")
+    if not workers.is_integer() or workers < 1:
+        raise ValueError(f"max_workers must be a whole number of at least 1, got {value!r}")
+    return min(int(workers), maximum)
+
+
+def default_workers():
+    return max(1, min(os.cpu_count() or 1, int(os.environ.get('DETONATOR_MAX_WORKERS', 8))))
+
+
+def fanout_workers():
+    """Concurrency cap for one script against many targets (network-bound, not CPU-bound)"""
+    return max(1, int(os.environ.get('DETONATOR_FANOUT_WORKERS', 16)))
+
+
+def verdict_map(results):
+    """{target_url: verdict} for a fan-out batch"""
+    verdicts = {}
+    for entry in sorted(results, key=lambda r: r['index']):
+        verdict = {'vulnerable': bool(entry.get('vulnerable')), 'status': entry['status'],
+                   'exit_code': entry.get('exit_code'), 'elapsed_ms': entry.get('elapsed_ms')}
+        summary = (entry.get('probe') or {}).get('verdict')
+        if summary:
+            verdict['reason'] = summary.get('reason')
+        if entry.get('error'):
+            verdict['error'] = entry['error']
+        verdicts[entry['target_url']] = verdict
+    return verdicts
+
+
+def _output_limits(item_count):
+    """Split the single-script output allowance across the batch"""
+    head_bytes, tail_bytes = capture.limits_from_env()
+    return (
+        max(MIN_ITEM_OUTPUT_BYTES, head_bytes // item_count),
+        max(MIN_ITEM_OUTPUT_BYTES, tail_bytes // item_count),
+    )
+
+
+def run_item(item, scan_id, timeout, output_limits=None, deadline=None, force_rerun=False, cancel=None,
+             preflighted=False):
+    """
+    Detonate one item and return its result entry.
+    deadline is the monotonic time by which the whole batch must be done;
+    cancel is an optional execution.CancelToken shared with other items;
+    preflighted skips the pre-flight check the caller already ran.
+    """
+    entry = {'index': item['index'], 'id': item['id'], 'target_url': item['target_url']}
+    if not item.get('script'):
+        entry.update(status='error', error='Missing script', vulnerable=False)
+        return entry
+
+    if preflight.enabled('DETONATOR_PREFLIGHT') and not preflighted:
+        check = preflight.preflight(item['script'], module_check=preflight.module_resolvable)
+        if not check['ok']:
+            entry.update(status='rejected', error='Script failed pre-flight checks',
+                         preflight=check, vulnerable=False)
+            return entry
+
+    cached = None
+    if not (force_rerun or item.get('force_rerun')):
+        cached = result_cache.lookup(item['script'], item['target_url'])
+    if cached is not None:
+        entry.update(cached, status='ok', result_cache_hit=True)
+        return entry
+
+    try:
+        item_timeout = min(parse_timeout(item.get('timeout'), timeout), execution.MAX_SCRIPT_SECONDS)
+    except ValueError as e:
+        entry.update(status='error', error=str(e), vulnerable=False)
+        return entry
+    if deadline is not None:
+        item_timeout = min(item_timeout, deadline - time.monotonic())
+        if item_timeout <= 0:
+            entry.update(status='skipped', error='Time budget exhausted', vulnerable=False)
+            return entry
+    if cancel is not None and cancel.cancelled:
+        entry.update(status='cancelled', vulnerable=False, script_executed=False)
+        return entry
+
+    started = time.monotonic()
+    try:
+        result = execution.detonate(item['script'], item['target_url'], scan_id,
+                                    timeout=item_timeout, output_limits=output_limits, cancel=cancel)
+    except Exception as e:
+        print(f"Error detonating item {item['id']}: {str(e)}")
+        entry.update(status='error', error=str(e), vulnerable=False,
+                     elapsed_ms=int((time.monotonic() - started) * 1000))
+        return entry
+
+    result_cache.store(item['script'], item['target_url'], result)
+    if result.cancelled:
+        entry.update(status='cancelled', vulnerable=False, script_executed=True,
+                     elapsed_ms=result.elapsed_ms)
+        return entry
+    entry.update(
+        status='timeout' if result.timed_out else 'ok',
+        vulnerable=result.returncode == 0 and not result.timed_out,
+        exit_code=result.returncode,
+        stdout=result.stdout,
+        stderr=result.stderr,
+        output=result.output_summary(),
+        output_digest=result.output_digest(),
+        probe=result.probe_report(),
+        timed_out=result.timed_out,
+        elapsed_ms=result.elapsed_ms,
+        result_cache_hit=False
+    )
+    if result.timed_out:
+        entry['error'] = 'Script execution timeout'
+    return entry
+
+
+def run_batch(items, scan_id, timeout=DEFAULT_TIMEOUT_SECONDS, max_workers=None, on_result=None,
+              budget_seconds=None, force_rerun=False, preflighted=False):
+    """
+    Run items in parallel; returns result entries in completion order.
+    budget_seconds bounds the whole batch (see execution.time_budget).
+    """
+    workers = max(1, min(max_workers or default_workers(), len(items)))
+    output_limits = _output_limits(len(items))
+    deadline = None if budget_seconds is None else time.monotonic() + budget_seconds
+    results = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='detonate') as pool:
+        futures = [pool.submit(run_item, item, scan_id, timeout, output_limits, deadline, force_rerun,
+                               None, preflighted)
+                   for item in items]
+        for future in as_completed(futures):
+            entry = future.result()
+            entry['completed_order'] = len(results)
+            results.append(entry)
+            if on_result is not None:
+                on_result(entry)
+    return results
+
+
+def handle_batch(body, context):
+    """Lambda entry point for batch events"""
+    items = expand_items(body)
+    max_items = int(os.environ.get('DETONATOR_BATCH_MAX_ITEMS', 64))
+    if not items or len(items) > max_items:
+        return {
+            'statusCode': 400,
+            'body': timing.dumps({'error': f'Batch must contain 1-{max_items} scripts'})
+        }
+
+    scan_id = body.get('scan_id', 'unknown')
+    fanout = not isinstance(body.get('scripts'), list)
+    try:
+        timeout = parse_timeout(body.get('timeout'))
+        workers = parse_workers(body.get('max_workers'), fanout_workers() if fanout else default_workers())
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'body': timing.dumps({'error': str(e)})
+        }
+
+    # Same script for every target: one pre-flight answers for all of them
+    preflighted = False
+    if fanout and body.get('script') and preflight.enabled('DETONATOR_PREFLIGHT'):
+        with timing.span('preflight'):
+            check = preflight.preflight(body['script'], module_check=preflight.module_resolvable)
+        if not check['ok']:
+            return {
+                'statusCode': 422,
+                'body': timing.dumps({
+                    'scan_id': scan_id,
+                    'error': 'Script failed pre-flight checks',
+                    'preflight': check,
+                    'vulnerable': False,
+                    'script_executed': False
+                })
+            }
+        preflighted = True
+
+    started = time.monotonic()
+    results = run_batch(items, scan_id, timeout=timeout,
+                        max_workers=workers,
+                        budget_seconds=execution.time_budget(context, execution.MAX_SCRIPT_SECONDS),
+                        force_rerun=bool(body.get('force_rerun')), preflighted=preflighted)
+    statuses = [r['status'] for r in results]
+    response = {
+        'scan_id': scan_id,
+        'results': results,
+        'summary': {
+            'total': len(results),
+            'vulnerable': sum(1 for r in results if r.get('vulnerable')),
+            'cache_hits': sum(1 for r in results if r.get('result_cache_hit')),
+            'completed': statuses.count('ok'),
+            'timed_out': statuses.count('timeout'),
+            'failed': statuses.count('error'),
+            'skipped': statuses.count('skipped'),
+            'rejected': statuses.count('rejected'),
+            'workers': workers,
+            'elapsed_ms': int((time.monotonic() - started) * 1000)
+        }
+    }
+    if fanout:
+        response['verdicts'] = verdict_map(results)
+        response['vulnerable'] = any(r.get('vulnerable') for r in results)
+    return {
+        'statusCode': 200,
+        'body': timing.dumps(response)
+    }
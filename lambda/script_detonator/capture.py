@@ -0,0 +1,166 @@
+"""
+Bounded capture of a script's stdout/stderr.
+
+Each stream keeps the first head_bytes and the last tail_bytes it produced,
+plus a total byte count, so memory stays flat however much a script prints.
+When spilling is enabled the full stream is also gzip-compressed to /tmp as
+it arrives and, if the stream was truncated, shipped to S3 (LOG_SPILL_BUCKET)
+or a local directory (LOG_SPILL_DIR); the response then carries a pointer.
+A spill file stops growing after LOG_SPILL_MAX_BYTES of output (100 MiB per
+stream), ending in a marker, so a chatty script cannot fill /tmp.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+DEFAULT_HEAD_BYTES = 64 * 1024
+DEFAULT_TAIL_BYTES = 64 * 1024
+DEFAULT_SPILL_MAX_BYTES = 100 * 1024 * 1024
+
+TRUNCATION_MARKER = "\n... [{omitted} bytes truncated] ...\n"
+SPILL_TRUNCATION_MARKER = b"\n... [spill limit of %d bytes reached, rest of the stream not kept] ...\n"
+
+_UNSAFE = re.compile(r'[^A-Za-z0-9_-]+')
+
+
+class BoundedStream:
+    """Head + tail retention for one output stream"""
+
+    def __init__(self, name, head_bytes=DEFAULT_HEAD_BYTES, tail_bytes=DEFAULT_TAIL_BYTES,
+                 spill_path=None, spill_max_bytes=DEFAULT_SPILL_MAX_BYTES):
+        self.name = name
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.total_bytes = 0
+        self._digest = hashlib.sha256()
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._spill_path = spill_path
+        self._spill = gzip.open(spill_path, 'wb', compresslevel=5) if spill_path else None
+        self.spill_max_bytes = spill_max_bytes
+        self.spill_truncated = False
+
+    @property
+    def truncated(self):
+        return self.total_bytes > self.head_bytes + self.tail_bytes
+
+    def write(self, data):
+        self.total_bytes += len(data)
+        self._digest.update(data)
+        if self._spill is not None and not self.spill_truncated:
+            room = self.spill_max_bytes - (self.total_bytes - len(data))
+            if len(data) <= room:
+                self._spill.write(data)
+            else:
+                self._spill.write(data[:max(room, 0)])
+                self._spill.write(SPILL_TRUNCATION_MARKER % self.spill_max_bytes)
+                self.spill_truncated = True
+
+        room = self.head_bytes - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if data and self.tail_bytes:
+            self._tail += data
+            if len(self._tail) > self.tail_bytes:
+                del self._tail[:len(self._tail) - self.tail_bytes]
+
+    @property
+    def digest(self):
+        """sha256 of everything the stream produced, not just what was retained"""
+        return self._digest.hexdigest()
+
+    def close(self):
+        """Finish the spill file; returns its path when it is worth keeping"""
+        if self._spill is None:
+            return None
+        self._spill.close()
+        self._spill = None
+        if not self.truncated:
+            os.unlink(self._spill_path)
+            return None
+        return self._spill_path
+
+    def text(self):
+        """Retained output, with a marker where bytes were dropped"""
+        head = self._head.decode('utf-8', errors='replace')
+        if not self.truncated:
+            return head + self._tail.decode('utf-8', errors='replace')
+        omitted = self.total_bytes - len(self._head) - len(self._tail)
+        return (head + TRUNCATION_MARKER.format(omitted=omitted)
+                + self._tail.decode('utf-8', errors='replace'))
+
+
+def limits_from_env():
+    return (
+        int(os.environ.get('OUTPUT_HEAD_BYTES', DEFAULT_HEAD_BYTES)),
+        int(os.environ.get('OUTPUT_TAIL_BYTES', DEFAULT_TAIL_BYTES)),
+    )
+
+
+def spill_max_bytes():
+    return int(os.environ.get('LOG_SPILL_MAX_BYTES', DEFAULT_SPILL_MAX_BYTES))
+
+
+def spill_enabled():
+    return bool(os.environ.get('LOG_SPILL_BUCKET') or os.environ.get('LOG_SPILL_DIR'))
+
+
+def open_streams(names=('stdout', 'stderr'), limits=None):
+    """BoundedStreams configured from the environment (or explicit limits)"""
+    head_bytes, tail_bytes = limits or limits_from_env()
+    streams = []
+    for name in names:
+        spill_path = None
+        if spill_enabled():
+            fd, spill_path = tempfile.mkstemp(prefix=f'{name}-', suffix='.log.gz')
+            os.close(fd)
+        streams.append(BoundedStream(name, head_bytes, tail_bytes, spill_path, spill_max_bytes()))
+    return streams
+
+
+def spill_prefix(scan_id):
+    """
+    scan_id as one safe path segment: letters, digits, "_" and "-" kept,
+    anything else (including "/" and "..") replaced, with a hash suffix so
+    different ids cannot collide after cleaning
+    """
+    scan_id = str(scan_id)
+    slug = _UNSAFE.sub('-', scan_id).strip('-')[:64]
+    if slug and slug == scan_id:
+        return slug
+    return f"{slug[:48] or 'scan'}-{hashlib.sha256(scan_id.encode('utf-8')).hexdigest()[:12]}"
+
+
+def publish_spill(path, scan_id, name):
+    """
+    Move a spilled log to its final home and return a pointer to it
+    (s3://bucket/key or a local path). Failures are logged, never raised.
+    """
+    prefix = spill_prefix(scan_id)
+    key = f"detonations/{prefix}/{os.path.basename(path)}"
+    try:
+        bucket = os.environ.get('LOG_SPILL_BUCKET')
+        if bucket:
+            from scanner_common import warm_cache
+            warm_cache.get_boto3_client('s3').upload_file(
+                path, bucket, key,
+                ExtraArgs={'ContentType': 'text/plain', 'ContentEncoding': 'gzip'}
+            )
+            return f"s3://{bucket}/{key}"
+
+        directory = os.path.join(os.environ['LOG_SPILL_DIR'], 'detonations', prefix)
+        os.makedirs(directory, exist_ok=True)
+        destination = os.path.join(directory, os.path.basename(path))
+        shutil.move(path, destination)
+        return destination
+    except Exception as e:
+        print(f"Error spilling {name} log: {str(e)}")
+        return None
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
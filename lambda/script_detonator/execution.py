@@ -0,0 +1,347 @@
+"""
+Script execution for the detonator.
+
+Scripts are forked from the warm zygote when possible and fall back to a
+fresh `sys.executable` otherwise (DETONATOR_USE_ZYGOTE=false, unsupported
+platform, or the zygote died). Either way each script runs in its own
+session so a timeout can take down everything it started.
+"""
+
+import hashlib
+import os
+import selectors
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import capture
+import zygote
+from scanner_common import timing
+
+READ_CHUNK_BYTES = 64 * 1024
+
+# Hard ceiling for a single script, whatever the invocation budget
+MAX_SCRIPT_SECONDS = 240
+
+# Kept back from the invocation budget to kill, serialize and return
+DEFAULT_TIME_RESERVE_MS = 3000
+
+# SIGTERM -> SIGKILL grace period for a timed-out process group
+DEFAULT_KILL_GRACE_SECONDS = 2.0
+
+# Where scanner_probe lives; scripts get it on PYTHONPATH
+DETONATOR_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_zygote = None
+_zygote_lock = threading.Lock()
+
+
+class CancelToken:
+    """
+    Cancels every run_script() watching it. A self-pipe rather than an Event
+    so the drain loops wake on it through the same select() as the output.
+    """
+
+    def __init__(self):
+        self._r, self._w = os.pipe()
+        self._lock = threading.Lock()
+        self.cancelled = False
+
+    def fileno(self):
+        return self._r
+
+    def cancel(self):
+        with self._lock:
+            if not self.cancelled:
+                self.cancelled = True
+                # Never read back, so the pipe stays readable for every waiter
+                os.write(self._w, b'x')
+
+    def close(self):
+        os.close(self._r)
+        os.close(self._w)
+
+
+class ExecutionResult:
+    """Outcome of one script run; output is bounded by capture.BoundedStream"""
+
+    def __init__(self, returncode, stdout, stderr, runner, timed_out=False, elapsed_ms=0, cancelled=False):
+        self.returncode = returncode
+        self.stdout_stream = stdout
+        self.stderr_stream = stderr
+        self.runner = runner
+        self.timed_out = timed_out
+        self.cancelled = cancelled
+        self.elapsed_ms = elapsed_ms
+        self.spilled = {}
+
+    @property
+    def stdout(self):
+        return self.stdout_stream.text()
+
+    @property
+    def stderr(self):
+        return self.stderr_stream.text()
+
+    def publish_spills(self, scan_id):
+        """Ship oversized full logs to the spill store, once"""
+        for stream in (self.stdout_stream, self.stderr_stream):
+            path = stream.close()
+            if path:
+                self.spilled[stream.name] = capture.publish_spill(path, scan_id, stream.name)
+        return self.spilled
+
+    def output_digest(self):
+        """Digest of the full stdout and stderr, for comparing runs"""
+        return hashlib.sha256(
+            f"{self.stdout_stream.digest}:{self.stderr_stream.digest}".encode('ascii')
+        ).hexdigest()
+
+    def probe_report(self):
+        """
+        {"evidence": [...], "verdict": {...}} from the scanner_probe lines in
+        the retained stdout, or None when the script did not use them
+        """
+        if 'SCANNER_' not in self.stdout:
+            return None
+        import scanner_probe
+        evidence, verdict = scanner_probe.parse_output(self.stdout)
+        if not evidence and verdict is None:
+            return None
+        return {'evidence': evidence, 'verdict': verdict}
+
+    def output_summary(self):
+        """Byte counts, truncation flags and spill pointers per stream"""
+        return {
+            stream.name: {
+                'bytes': stream.total_bytes,
+                'truncated': stream.truncated,
+                'log': self.spilled.get(stream.name),
+                'log_truncated': stream.spill_truncated
+            }
+            for stream in (self.stdout_stream, self.stderr_stream)
+        }
+
+
+def zygote_enabled():
+    return (
+        os.environ.get('DETONATOR_USE_ZYGOTE', 'true').lower() == 'true'
+        and zygote.is_supported()
+    )
+
+
+def get_zygote():
+    """Zygote for this container, (re)started on demand; None when unavailable"""
+    global _zygote
+    if not zygote_enabled():
+        return None
+    with _zygote_lock:
+        if _zygote is None or not _zygote.alive:
+            try:
+                _zygote = zygote.Zygote()
+            except Exception as e:
+                print(f"Zygote unavailable, falling back to subprocess: {str(e)}")
+                _zygote = None
+        return _zygote
+
+
+def warm_up():
+    """Start the zygote during the init phase so the first invocation doesn't pay for it"""
+    get_zygote()
+
+
+def time_budget(context, requested=None, reserve_ms=None):
+    """
+    Seconds a script may run: the requested/maximum timeout, shrunk to fit
+    the invocation's remaining time minus a reserve for returning the result.
+    """
+    timeout = min(float(requested or MAX_SCRIPT_SECONDS), MAX_SCRIPT_SECONDS)
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return timeout
+    if reserve_ms is None:
+        reserve_ms = int(os.environ.get('DETONATOR_TIME_RESERVE_MS', DEFAULT_TIME_RESERVE_MS))
+    remaining = (context.get_remaining_time_in_millis() - reserve_ms) / 1000.0
+    return max(0.0, min(timeout, remaining))
+
+
+def _signal_group(pid, signum):
+    try:
+        os.killpg(pid, signum)
+    except ProcessLookupError:
+        # Child may not have called setsid() yet, so its group doesn't exist
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+def _terminate(process, streams, grace=None):
+    """
+    SIGTERM the whole process group, keep collecting output during the
+    grace period, then SIGKILL whatever is left.
+    """
+    if grace is None:
+        grace = float(os.environ.get('DETONATOR_KILL_GRACE_SECONDS', DEFAULT_KILL_GRACE_SECONDS))
+    _signal_group(process.pid, signal.SIGTERM)
+    if grace > 0:
+        _drain(streams, time.monotonic() + grace)
+    try:
+        process.wait(0)
+    except subprocess.TimeoutExpired:
+        pass
+    # Even if the leader exited, stragglers in its group may still hold the pipes
+    _signal_group(process.pid, signal.SIGKILL)
+    returncode = process.wait()
+    _drain(streams, time.monotonic() + 0.5)
+    return returncode
+
+
+def _drain(streams, deadline, cancel=None):
+    """
+    Read every fd into its stream until EOF, a chunk at a time so memory
+    stays bounded. Stops early when the monotonic deadline passes or the
+    CancelToken fires; returns 'timeout', 'cancelled' or None.
+    """
+    selector = selectors.DefaultSelector()
+    for fd, stream in streams.items():
+        selector.register(fd, selectors.EVENT_READ, stream)
+    if cancel is not None:
+        selector.register(cancel.fileno(), selectors.EVENT_READ, None)
+    stopped = None
+    try:
+        while len(selector.get_map()) > (cancel is not None):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                stopped = 'timeout'
+                break
+            events = selector.select(remaining)
+            if cancel is not None and any(key.data is None for key, _ in events):
+                stopped = 'cancelled'
+                break
+            for key, _ in events:
+                data = os.read(key.fd, READ_CHUNK_BYTES)
+                if data:
+                    key.data.write(data)
+                else:
+                    selector.unregister(key.fd)
+    finally:
+        selector.close()
+    return stopped
+
+
+def rlimits_from_env():
+    """
+    Per-child resource limits: CPU seconds, address space, open files and
+    no core dumps. The hard CPU limit leaves a few seconds between SIGXCPU
+    and SIGKILL so the script can still report what it found.
+    """
+    cpu_seconds = int(os.environ.get('SCRIPT_CPU_SECONDS', 120))
+    memory_bytes = int(os.environ.get('SCRIPT_MAX_MEMORY_MB', 512)) * 1024 * 1024
+    open_files = int(os.environ.get('SCRIPT_MAX_OPEN_FILES', 256))
+    return {
+        'RLIMIT_CPU': [cpu_seconds, cpu_seconds + 5],
+        'RLIMIT_AS': [memory_bytes, memory_bytes],
+        'RLIMIT_NOFILE': [open_files, open_files],
+        'RLIMIT_CORE': [0, 0],
+    }
+
+
+def _start(script_path, env, stdout_w, stderr_w, rlimits):
+    forkserver = get_zygote()
+    if forkserver is not None:
+        try:
+            return forkserver.spawn(script_path, env, stdout_w, stderr_w, rlimits), 'zygote'
+        except zygote.ZygoteError as e:
+            print(f"Zygote spawn failed, falling back to subprocess: {str(e)}")
+    process = subprocess.Popen(
+        [sys.executable, script_path],
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=stdout_w,
+        stderr=stderr_w,
+        start_new_session=True
+    )
+    # prlimit from the parent instead of preexec_fn, which is unsafe with the
+    # worker threads batch mode runs; the limits land while the interpreter
+    # is still starting, before any script code runs
+    try:
+        zygote.apply_rlimits(rlimits, process.pid)
+    except ProcessLookupError:
+        pass
+    return process, 'subprocess'
+
+
+def run_script(script_path, env, timeout, rlimits=None, output_limits=None, cancel=None):
+    """
+    Run script_path with env and return an ExecutionResult.
+    rlimits defaults to rlimits_from_env(); output_limits is an optional
+    (head_bytes, tail_bytes) override for the captured streams.
+    On timeout the process group is terminated and the result carries
+    timed_out=True together with whatever output was captured. A fired
+    CancelToken kills the group without a grace period (cancelled=True).
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    if rlimits is None:
+        rlimits = rlimits_from_env()
+    stdout, stderr = capture.open_streams(limits=output_limits)
+    stdout_r, stdout_w = os.pipe()
+    stderr_r, stderr_w = os.pipe()
+    try:
+        try:
+            with timing.span('spawn'):
+                process, runner = _start(script_path, env, stdout_w, stderr_w, rlimits)
+        finally:
+            # The child owns the write ends now; EOF arrives when it exits
+            os.close(stdout_w)
+            os.close(stderr_w)
+
+        streams = {stdout_r: stdout, stderr_r: stderr}
+        with timing.span('script_runtime'):
+            stopped = _drain(streams, deadline, cancel)
+            if stopped is None:
+                try:
+                    returncode = process.wait(max(0, deadline - time.monotonic()))
+                except subprocess.TimeoutExpired:
+                    stopped = 'timeout'
+            if stopped == 'timeout':
+                returncode = _terminate(process, streams)
+            elif stopped == 'cancelled':
+                returncode = _terminate(process, streams, grace=0)
+    finally:
+        os.close(stdout_r)
+        os.close(stderr_r)
+
+    return ExecutionResult(returncode, stdout, stderr, runner, timed_out=stopped == 'timeout',
+                           elapsed_ms=int((time.monotonic() - started) * 1000),
+                           cancelled=stopped == 'cancelled')
+
+
+def detonate(script, target_url, scan_id, timeout, **kwargs):
+    """
+    Write script to a temp file and run it with TARGET_URL/SCAN_ID set, plus
+    SCRIPT_DEADLINE (epoch seconds) and scanner_probe importable.
+    Spilled logs are published before returning. Extra kwargs go to run_script.
+    """
+    with timing.span('temp_file_write'):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+            f.write(script)
+            script_path = f.name
+
+    env = os.environ.copy()
+    env['TARGET_URL'] = target_url
+    env['SCAN_ID'] = scan_id
+    env['SCRIPT_DEADLINE'] = f"{time.time() + timeout:.3f}"
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (DETONATOR_DIR, env.get('PYTHONPATH'))))
+
+    try:
+        result = run_script(script_path, env, timeout, **kwargs)
+    finally:
+        os.unlink(script_path)
+
+    with timing.span('spill_publish'):
+        result.publish_spills(scan_id)
+    return result
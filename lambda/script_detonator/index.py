@@ -1,8 +1,11 @@
 import json
-import subprocess
-import tempfile
-import os
-import sys
+
+import execution
+import result_cache
+from scanner_common import preflight, timing
+
+# Start the fork server during init so warm invocations skip interpreter start-up
+execution.warm_up()
 
 def lambda_handler(event, context):
     """
@@ -13,13 +16,38 @@ def lambda_handler(event, context):
     {
         "script": "print('testing...')",
         "scan_id": "12345",
-        "target_url": "http://10.0.1.45:8080"
+        "target_url": "http://10.0.1.45:8080",
+        "timeout": 60,               # optional, seconds; capped by the remaining budget
+        "force_rerun": false,        # optional, ignore cached verdicts
+        "timings": false             # optional, add per-phase milliseconds to the response
     }
-    """
     
+    Events with a "scripts" list or "target_urls" are run as a batch
+    (see batch_detonation); a "candidates" list races speculative scripts
+    for one target (see race_detonation). SQS batches (Records) are
+    consumed by sqs_detonation and answered with batchItemFailures.
+    """
+    if 'Records' in event:
+        import sqs_detonation
+        if sqs_detonation.is_sqs_event(event):
+            timing.start(None, context, Mode='sqs')
+            return timing.finish(sqs_detonation.handle_sqs(event, context))
+    return timing.finish(_handle(event, context))
+
+def _handle(event, context):
     try:
         # Extract script from event
         body = json.loads(event.get('body', '{}')) if isinstance(event.get('body'), str) else event
+        timing.start(body, context)
+        
+        if isinstance(body.get('scripts'), list) or isinstance(body.get('target_urls'), list):
+            from batch_detonation import handle_batch
+            return handle_batch(body, context)
+        
+        if isinstance(body.get('candidates'), list):
+            from race_detonation import handle_race
+            return handle_race(body, context)
+        
         script = body.get('script', '')
         scan_id = body.get('scan_id', 'unknown')
         target_url = body.get('target_url', '')
@@ -27,61 +55,92 @@ def lambda_handler(event, context):
         if not script:
             return {
                 'statusCode': 400,
-                'body': json.dumps({'error': 'Missing script'})
+                'body': timing.dumps({'error': 'Missing script'})
             }
         
-        # Create temporary file for the script
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write(script)
-            script_path = f.name
+        # Same rules as batch/race/SQS timeouts; missing means the maximum
+        from batch_detonation import parse_timeout
+        try:
+            requested_timeout = parse_timeout(body.get('timeout'), execution.MAX_SCRIPT_SECONDS)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'body': timing.dumps({'scan_id': scan_id, 'error': str(e)})
+            }
         
-        # Set environment variables for the script
-        env = os.environ.copy()
-        env['TARGET_URL'] = target_url
-        env['SCAN_ID'] = scan_id
+        # Reject scripts that cannot work before spending sandbox time on them
+        if preflight.enabled('DETONATOR_PREFLIGHT'):
+            with timing.span('preflight'):
+                check = preflight.preflight(script, module_check=preflight.module_resolvable)
+            if not check['ok']:
+                return {
+                    'statusCode': 422,
+                    'body': timing.dumps({
+                        'scan_id': scan_id,
+                        'error': 'Script failed pre-flight checks',
+                        'preflight': check,
+                        'vulnerable': False,
+                        'script_executed': False
+                    })
+                }
         
-        # Execute script in isolated subprocess
-        # Note: This Lambda has no internet access - network calls will fail
-        result = subprocess.run(
-            [sys.executable, script_path],
-            env=env,
-            capture_output=True,
-            text=True,
-            timeout=240  # 4 minutes max
-        )
+        # Identical script against the same target - reuse the fresh verdict
+        with timing.span('cache_lookup'):
+            cached = None if body.get('force_rerun') else result_cache.lookup(script, target_url)
+        timing.set_property('CacheHit', cached is not None)
+        if cached is not None:
+            return {
+                'statusCode': 200,
+                'body': timing.dumps(dict(cached, scan_id=scan_id, result_cache_hit=True,
+                                        script_executed=False))
+            }
+        
+        # Each script gets what is left of the invocation budget, capped at 4 minutes
+        timeout = execution.time_budget(context, requested_timeout)
         
-        # Clean up
-        os.unlink(script_path)
+        # Execute script in an isolated child (forked from the warm zygote)
+        # Note: This Lambda has no internet access - network calls will fail
+        result = execution.detonate(script, target_url, scan_id, timeout=timeout)
         
         # Determine if vulnerable based on exit code
-        is_vulnerable = result.returncode == 0
+        is_vulnerable = result.returncode == 0 and not result.timed_out
+        with timing.span('cache_store'):
+            result_cache.store(script, target_url, result)
         
-        return {
-            'statusCode': 200,
-            'body': json.dumps({
-                'scan_id': scan_id,
-                'vulnerable': is_vulnerable,
-                'exit_code': result.returncode,
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'script_executed': True
-            })
+        response = {
+            'scan_id': scan_id,
+            'vulnerable': is_vulnerable,
+            'exit_code': result.returncode,
+            'stdout': result.stdout,
+            'stderr': result.stderr,
+            'output': result.output_summary(),
+            'output_digest': result.output_digest(),
+            # Evidence and verdict lines of scripts using scanner_probe
+            'probe': result.probe_report(),
+            'timed_out': result.timed_out,
+            'elapsed_ms': result.elapsed_ms,
+            'result_cache_hit': False,
+            'script_executed': True
         }
         
-    except subprocess.TimeoutExpired:
+        # On timeout still hand back everything captured so far
+        if result.timed_out:
+            response['error'] = 'Script execution timeout'
+            return {
+                'statusCode': 408,
+                'body': timing.dumps(response)
+            }
+        
         return {
-            'statusCode': 408,
-            'body': json.dumps({
-                'error': 'Script execution timeout',
-                'vulnerable': False
-            })
+            'statusCode': 200,
+            'body': timing.dumps(response)
         }
         
     except Exception as e:
         print(f"Error: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': timing.dumps({
                 'error': str(e),
                 'vulnerable': False
             })
@@ -0,0 +1,146 @@
+"""
+Racing detonation for speculative candidates.
+
+The generator can return k candidate scripts for one finding. Instead of
+running them one after another until one works, all of them are detonated at
+once against the same target; the first conclusive verdict wins and every
+other candidate is killed (or never started).
+
+Expected event format:
+{
+    "scan_id": "12345",
+    "target_url": "http://10.0.1.45:8080",
+    "candidates": ["import sys ...", "import sys ..."],   # or [{"script": ...}, ...]
+    "timeout": 60,               # optional, per candidate
+    "force_rerun": false         # optional
+}
+
+A verdict is conclusive when the script ran to completion and used the exit
+code contract: 0 (vulnerable) or 1 (not vulnerable) - and the 1 did not come
+from an uncaught exception.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import batch_detonation
+import execution
+from scanner_common import timing
+
+TRACEBACK_MARKER = 'Traceback (most recent call last)'
+
+
+def candidate_items(body):
+    """Normalize "candidates" (strings or dicts) into batch items"""
+    items = []
+    for index, candidate in enumerate(body.get('candidates') or []):
+        item = dict(candidate) if isinstance(candidate, dict) else {'script': candidate}
+        item['index'] = index
+        item.setdefault('id', index)
+        item['target_url'] = item.get('target_url') or body.get('target_url', '')
+        items.append(item)
+    return items
+
+
+def is_conclusive(entry):
+    if entry.get('status') != 'ok' or entry.get('exit_code') not in (0, 1):
+        return False
+    return not (entry['exit_code'] == 1 and TRACEBACK_MARKER in (entry.get('stderr') or ''))
+
+
+def run_race(items, scan_id, timeout, budget_seconds=None, max_workers=None, force_rerun=False):
+    """
+    Detonate candidates concurrently; returns (winner entry or None, entries
+    in completion order). Candidates still queued when the winner lands are
+    reported as cancelled without running.
+    """
+    # Candidates mostly wait on the target, so race them all even on one vCPU
+    if max_workers is None:
+        max_workers = int(os.environ.get('DETONATOR_MAX_WORKERS', 8))
+    workers = max(1, min(max_workers, len(items)))
+    output_limits = batch_detonation._output_limits(len(items))
+    deadline = None if budget_seconds is None else time.monotonic() + budget_seconds
+    cancel = execution.CancelToken()
+    winner = None
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='race') as pool:
+            futures = [
+                pool.submit(batch_detonation.run_item, item, scan_id, timeout, output_limits,
+                            deadline, force_rerun, cancel)
+                for item in items
+            ]
+            for future in as_completed(futures):
+                entry = future.result()
+                entry['completed_order'] = len(results)
+                entry['conclusive'] = is_conclusive(entry)
+                results.append(entry)
+                if winner is None and entry['conclusive']:
+                    winner = entry
+                    cancel.cancel()
+    finally:
+        cancel.close()
+    return winner, results
+
+
+def race_summary(winner, results, elapsed_ms):
+    """Which candidate won and how much work the others cost"""
+    cancelled = [r for r in results if r['status'] == 'cancelled']
+    return {
+        'candidates': len(results),
+        'winner_index': None if winner is None else winner['index'],
+        'winner_id': None if winner is None else winner['id'],
+        'conclusive': winner is not None,
+        'rejected': sum(1 for r in results if r['status'] == 'rejected'),
+        'inconclusive': sum(1 for r in results
+                            if r['status'] not in ('cancelled', 'rejected') and not r['conclusive']),
+        'cancelled_running': sum(1 for r in cancelled if r.get('script_executed')),
+        'cancelled_before_start': sum(1 for r in cancelled if not r.get('script_executed')),
+        'cancelled_ms': sum(r.get('elapsed_ms', 0) for r in cancelled),
+        'executed_ms': sum(r.get('elapsed_ms', 0) for r in results),
+        'elapsed_ms': elapsed_ms,
+    }
+
+
+def handle_race(body, context):
+    """Lambda entry point for candidate events"""
+    items = candidate_items(body)
+    max_items = int(os.environ.get('DETONATOR_MAX_CANDIDATES', 8))
+    if not items or len(items) > max_items:
+        return {
+            'statusCode': 400,
+            'body': timing.dumps({'error': f'candidates must contain 1-{max_items} scripts'})
+        }
+
+    try:
+        timeout = batch_detonation.parse_timeout(body.get('timeout'))
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'body': timing.dumps({'error': str(e)})
+        }
+
+    scan_id = body.get('scan_id', 'unknown')
+    started = time.monotonic()
+    winner, results = run_race(
+        items, scan_id,
+        timeout=timeout,
+        budget_seconds=execution.time_budget(context, execution.MAX_SCRIPT_SECONDS),
+        force_rerun=bool(body.get('force_rerun'))
+    )
+    summary = race_summary(winner, results, int((time.monotonic() - started) * 1000))
+    response = {
+        'scan_id': scan_id,
+        'target_url': body.get('target_url', ''),
+        'vulnerable': bool(winner and winner.get('vulnerable')),
+        'winner': winner,
+        'results': results,
+        'race': summary
+    }
+    if winner is None:
+        response['error'] = 'No candidate produced a conclusive verdict'
+    return {
+        'statusCode': 200,
+        'body': timing.dumps(response)
+    }
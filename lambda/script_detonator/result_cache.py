@@ -0,0 +1,72 @@
+"""
+Verdict cache for detonations.
+
+Key = normalized script fingerprint (AST dump, so comments and formatting
+don't matter) + normalized target URL. A hit returns the earlier verdict -
+vulnerable, exit_code, a digest of the full output and the scanner_probe
+evidence - without running anything. Entries are fresh for RESULT_CACHE_TTL_SECONDS; "force_rerun"
+in the event bypasses the lookup. Backend: RESULT_CACHE_BACKEND
+(memory | sqlite | redis | none).
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from scanner_common.cache_backends import backend_from_env
+from scanner_common.fingerprint import normalize_target, script_fingerprint
+
+KEY_PREFIX = "verdict:v1:"
+
+_backend = None
+_backend_loaded = False
+
+
+def cache_key(script, target_url):
+    material = f"{script_fingerprint(script)}\n{normalize_target(target_url)}"
+    return KEY_PREFIX + hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def get_backend():
+    """Backend for this container, built on first use"""
+    global _backend, _backend_loaded
+    if not _backend_loaded:
+        _backend = backend_from_env('RESULT_CACHE')
+        _backend_loaded = True
+    return _backend
+
+
+def freshness_seconds():
+    return float(os.environ.get('RESULT_CACHE_TTL_SECONDS', 900))
+
+
+def lookup(script, target_url):
+    """Cached verdict dict, or None. Backend errors count as a miss."""
+    backend = get_backend()
+    if backend is None:
+        return None
+    try:
+        value = backend.get(cache_key(script, target_url))
+    except Exception as e:
+        print(f"Result cache read failed: {str(e)}")
+        return None
+    return json.loads(value) if value else None
+
+
+def store(script, target_url, result):
+    """Remember the verdict of a completed run; timeouts and cancelled runs are never cached"""
+    backend = get_backend()
+    if backend is None or result.timed_out or result.cancelled:
+        return
+    verdict = {
+        'vulnerable': result.returncode == 0,
+        'exit_code': result.returncode,
+        'output_digest': result.output_digest(),
+        'probe': result.probe_report(),
+        'cached_at': int(time.time())
+    }
+    try:
+        backend.set(cache_key(script, target_url), json.dumps(verdict), freshness_seconds())
+    except Exception as e:
+        print(f"Result cache write failed: {str(e)}")
@@ -0,0 +1,314 @@
+"""
+HTTP helpers for validation scripts, preinstalled in the detonator.
+
+    import scanner_probe as probe
+
+    r = probe.get('/login')                        # relative to TARGET_URL
+    r = probe.post('/login', data={'user': "admin'--", 'password': 'x'})
+    if r.error:                                    # network errors never raise
+        ...
+    pages = probe.many([('GET', '/a'), ('GET', '/b', {'params': {'id': "1'"}})])
+    probe.evidence('sql_error', 'syntax error near "admin"', r)
+    probe.verdict(True, 'login bypassed')          # prints the summary, exits 0 (1 if False)
+
+Connections are kept alive and pooled per host, so a script sending fifty
+probes pays for one TCP (and TLS) handshake instead of fifty. A request
+waits PROBE_TIMEOUT_SECONDS (default 5) at most, and never past the point
+where the detonator kills the script (SCRIPT_DEADLINE, epoch seconds), so
+the verdict still gets printed. TLS certificates are not verified: targets
+are internal test hosts.
+
+evidence() and verdict() print one line each,
+
+    SCANNER_EVIDENCE {"kind": "sql_error", "detail": "...", "status": 500, ...}
+    SCANNER_VERDICT {"vulnerable": true, "reason": "...", "probes": 12, "evidence": 1}
+
+which the detonator lifts out of stdout with parse_output().
+"""
+
+import http.client
+import json as _json
+import os
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+EVIDENCE_PREFIX = 'SCANNER_EVIDENCE '
+VERDICT_PREFIX = 'SCANNER_VERDICT '
+
+DEFAULT_TIMEOUT_SECONDS = 5
+DEFAULT_WORKERS = 8
+MAX_IDLE_PER_HOST = 16
+MAX_BODY_BYTES = 1 << 20
+MAX_DETAIL_CHARS = 500
+MAX_EVIDENCE_RECORDS = 50
+
+# Kept back before the kill so evidence and the verdict still get out
+DEADLINE_MARGIN_SECONDS = 0.5
+
+USER_AGENT = 'scanner-probe/1'
+
+_stats = {'probes': 0, 'evidence': 0}
+_lock = threading.Lock()
+
+
+class Response:
+    """One probe's outcome; status is None and error set when nothing came back"""
+
+    __slots__ = ('method', 'url', 'status', 'headers', 'body', 'elapsed_ms', 'error', 'truncated')
+
+    def __init__(self, method, url, status=None, headers=None, body=b'', elapsed_ms=0, error=None,
+                 truncated=False):
+        self.method = method
+        self.url = url
+        self.status = status
+        self.headers = headers or {}
+        self.body = body
+        self.elapsed_ms = elapsed_ms
+        self.error = error
+        self.truncated = truncated
+
+    @property
+    def ok(self):
+        return self.error is None and self.status < 400
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self):
+        return _json.loads(self.body)
+
+    def header(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+    def __repr__(self):
+        outcome = self.error or self.status
+        return f"<Response {self.method} {self.url} {outcome} {self.elapsed_ms}ms>"
+
+
+class _Pool:
+    """Idle keep-alive connections per (scheme, host, port)"""
+
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._tls = None
+
+    def _context(self):
+        if self._tls is None:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            self._tls = context
+        return self._tls
+
+    def get(self, key, timeout):
+        """(connection, reused)"""
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._context()), False
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def put(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < MAX_IDLE_PER_HOST:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+_pool = _Pool()
+
+
+def target():
+    """The URL under test (read per call: the zygote imports this module before the env is set)"""
+    return os.environ.get('TARGET_URL', '')
+
+
+def url_for(path=''):
+    """Absolute URL for path: as is when absolute, else resolved against TARGET_URL"""
+    if not path:
+        return target()
+    if '://' in path:
+        return path
+    return urllib.parse.urljoin(target(), path)
+
+
+def timeout_for(requested=None):
+    """Seconds this request may take, or None once the script is out of time"""
+    timeout = float(requested or os.environ.get('PROBE_TIMEOUT_SECONDS', DEFAULT_TIMEOUT_SECONDS))
+    deadline = os.environ.get('SCRIPT_DEADLINE')
+    if deadline:
+        remaining = float(deadline) - time.time() - DEADLINE_MARGIN_SECONDS
+        if remaining <= 0:
+            return None
+        timeout = min(timeout, remaining)
+    return timeout
+
+
+def _encode(data, json, headers):
+    if json is not None:
+        headers.setdefault('Content-Type', 'application/json')
+        return _json.dumps(json).encode('utf-8')
+    if isinstance(data, dict):
+        headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+        return urllib.parse.urlencode(data, doseq=True).encode('utf-8')
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    return data
+
+
+def request(method, path='', params=None, data=None, json=None, headers=None, timeout=None,
+            max_body=MAX_BODY_BYTES):
+    """
+    Send one request over a pooled connection. data is a dict (form encoded),
+    str or bytes; json is serialized as the body. Redirects are not followed.
+    Never raises for network errors - check response.error.
+    """
+    method = method.upper()
+    url = url_for(path)
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return Response(method, url, error=f"not an http(s) URL: {url!r} (is TARGET_URL set?)")
+    query = parts.query
+    if params:
+        query = '&'.join(filter(None, (query, urllib.parse.urlencode(params, doseq=True))))
+    selector = (parts.path or '/') + (f'?{query}' if query else '')
+
+    request_headers = {'User-Agent': USER_AGENT, 'Accept': '*/*'}
+    request_headers.update(headers or {})
+    body = _encode(data, json, request_headers)
+
+    limit = timeout_for(timeout)
+    if limit is None:
+        return Response(method, url, error='script deadline reached')
+    with _lock:
+        _stats['probes'] += 1
+
+    key = (parts.scheme, parts.hostname, parts.port)
+    started = time.monotonic()
+    for attempt in (0, 1):
+        conn, reused = _pool.get(key, limit)
+        try:
+            conn.request(method, selector, body=body, headers=request_headers)
+            response = conn.getresponse()
+            payload = response.read(max_body + 1)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+            conn.close()
+            if reused and attempt == 0:
+                # The server dropped an idle keep-alive connection; once more on a fresh one
+                continue
+            error = f"{type(e).__name__}: {e}"
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            error = f"{type(e).__name__}: {e}"
+        else:
+            truncated = len(payload) > max_body
+            if response.isclosed() and not response.will_close:
+                _pool.put(key, conn)
+            else:
+                # Unread body or the server asked to close: not reusable
+                conn.close()
+            return Response(method, url, response.status, {k.lower(): v for k, v in response.getheaders()},
+                            payload[:max_body], int((time.monotonic() - started) * 1000),
+                            truncated=truncated)
+        break
+    return Response(method, url, elapsed_ms=int((time.monotonic() - started) * 1000), error=error)
+
+
+def get(path='', **kwargs):
+    return request('GET', path, **kwargs)
+
+
+def post(path='', **kwargs):
+    return request('POST', path, **kwargs)
+
+
+def head(path='', **kwargs):
+    return request('HEAD', path, **kwargs)
+
+
+def many(probes, workers=None):
+    """
+    Send probes concurrently - each (method, path) or (method, path, {request
+    kwargs}) - and return their responses in the same order.
+    """
+    probes = [tuple(p) for p in probes]
+    if not probes:
+        return []
+    workers = workers or int(os.environ.get('PROBE_WORKERS', DEFAULT_WORKERS))
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(probes))), thread_name_prefix='probe') as pool:
+        return list(pool.map(lambda p: request(p[0], p[1], **(p[2] if len(p) > 2 else {})), probes))
+
+
+def _emit(prefix, record):
+    line = prefix + _json.dumps(record, default=str) + '\n'
+    with _lock:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+
+def evidence(kind, detail='', response=None, **fields):
+    """Report one observation backing the verdict (printed as a SCANNER_EVIDENCE line)"""
+    record = {'kind': str(kind), 'detail': str(detail)[:MAX_DETAIL_CHARS]}
+    if response is not None:
+        record.update(method=response.method, url=response.url, status=response.status,
+                      elapsed_ms=response.elapsed_ms)
+    record.update(fields)
+    with _lock:
+        _stats['evidence'] += 1
+    _emit(EVIDENCE_PREFIX, record)
+    return record
+
+
+def verdict(vulnerable, reason=''):
+    """Print the SCANNER_VERDICT line and exit: 0 when vulnerable, 1 when not"""
+    with _lock:
+        summary = {'vulnerable': bool(vulnerable), 'reason': str(reason)[:MAX_DETAIL_CHARS],
+                   'probes': _stats['probes'], 'evidence': _stats['evidence']}
+    _emit(VERDICT_PREFIX, summary)
+    _pool.close()
+    sys.exit(0 if vulnerable else 1)
+
+
+def parse_output(text, limit=MAX_EVIDENCE_RECORDS):
+    """(evidence records, verdict record or None) from a script's stdout"""
+    records, summary = [], None
+    for line in (text or '').splitlines():
+        if line.startswith(EVIDENCE_PREFIX) and len(records) < limit:
+            prefix = EVIDENCE_PREFIX
+        elif line.startswith(VERDICT_PREFIX):
+            prefix = VERDICT_PREFIX
+        else:
+            continue
+        try:
+            record = _json.loads(line[len(prefix):])
+        except ValueError:
+            continue
+        if not isinstance(record, dict):
+            continue
+        if prefix == EVIDENCE_PREFIX:
+            records.append(record)
+        else:
+            summary = record
+    return records, summary
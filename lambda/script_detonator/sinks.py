@@ -0,0 +1,87 @@
+"""
+Where verdicts of queued (SQS) detonations go, since nobody is waiting on
+the response. RESULT_SINK picks one:
+
+- log:  one JSON line per verdict ({"event": "detonation_verdict", ...}) in
+        CloudWatch Logs; needs no network from the sandbox. Default.
+- sqs:  SendMessageBatch to RESULTS_QUEUE_URL (the sandbox VPC needs an
+        SQS endpoint for this)
+- none: drop them
+
+send(verdicts) returns the ids of the verdicts that could not be delivered,
+so the caller can have those messages redelivered.
+"""
+
+import json
+import os
+
+from scanner_common import warm_cache
+
+# SendMessageBatch takes at most 10 entries and 256 KiB per request
+SQS_BATCH_ENTRIES = 10
+SQS_BATCH_BYTES = 256 * 1024
+
+
+def verdict(entry, scan_id):
+    """The part of a detonation entry worth keeping (no raw stdout/stderr)"""
+    kept = {k: v for k, v in entry.items() if k not in ('stdout', 'stderr', 'index', 'completed_order')}
+    kept['scan_id'] = scan_id
+    return kept
+
+
+class LogSink:
+    def send(self, verdicts):
+        for item in verdicts:
+            print(json.dumps(dict(item, event='detonation_verdict'), default=str))
+        return []
+
+
+class SqsSink:
+    def __init__(self, queue_url, client=None):
+        self.queue_url = queue_url
+        self._client = client
+
+    def _sqs(self):
+        return self._client or warm_cache.get_boto3_client('sqs')
+
+    def _chunks(self, verdicts):
+        chunk, size = [], 0
+        for item in verdicts:
+            body = json.dumps(item, default=str)
+            if chunk and (len(chunk) == SQS_BATCH_ENTRIES or size + len(body) > SQS_BATCH_BYTES):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append((str(item['id']), body))
+            size += len(body)
+        if chunk:
+            yield chunk
+
+    def send(self, verdicts):
+        failed = []
+        for chunk in self._chunks(verdicts):
+            entries = [{'Id': f"v{i}", 'MessageBody': body} for i, (_, body) in enumerate(chunk)]
+            try:
+                response = self._sqs().send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            except Exception as e:
+                print(f"Error: sending {len(chunk)} verdicts failed: {str(e)}")
+                failed.extend(item_id for item_id, _ in chunk)
+                continue
+            for failure in response.get('Failed', []):
+                failed.append(chunk[int(failure['Id'][1:])][0])
+        return failed
+
+
+class NullSink:
+    def send(self, verdicts):
+        return []
+
+
+def sink_from_env():
+    kind = os.environ.get('RESULT_SINK', 'log').lower()
+    if kind == 'sqs':
+        return SqsSink(os.environ['RESULTS_QUEUE_URL'])
+    if kind == 'none':
+        return NullSink()
+    if kind != 'log':
+        print(f"Unknown RESULT_SINK {kind!r}, using log")
+    return LogSink()
@@ -0,0 +1,115 @@
+"""
+Queued detonation: the detonator as an SQS consumer.
+
+Each message body is one detonation request, the same shape as a
+synchronous event:
+{
+    "script": "print('testing...')",
+    "scan_id": "12345",
+    "target_url": "http://10.0.1.45:8080",
+    "timeout": 60,
+    "force_rerun": false
+}
+
+Every message in the batch runs concurrently (DETONATOR_MAX_WORKERS
+children at a time), so a batch of ten costs one invocation, not ten.
+Verdicts go to the results sink (see sinks). The response lists
+batchItemFailures, so SQS redelivers only those messages - after
+maxReceiveCount they land in the DLQ:
+
+- retried:  malformed bodies (including a "timeout" that is not a
+            positive number), detonator errors, items the time budget
+            never reached, and verdicts the sink did not accept
+- settled:  completed runs, timeouts and pre-flight rejections (running the
+            same script again would give the same answer)
+
+Locally: lambda_handler({"Records": [{"messageId": "1", "eventSource":
+"aws:sqs", "body": json.dumps(request)}, ...]}, context).
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import batch_detonation
+import execution
+import sinks
+from scanner_common import timing
+
+SETTLED_STATUSES = ('ok', 'timeout', 'rejected')
+
+
+def is_sqs_event(event):
+    records = event.get('Records')
+    return isinstance(records, list) and bool(records) and records[0].get('eventSource') == 'aws:sqs'
+
+
+def parse_records(records):
+    """(items, failed message ids) - items carry their message id as "id" """
+    items, failed = [], []
+    for record in records:
+        try:
+            request = json.loads(record['body'])
+            if not isinstance(request, dict):
+                raise ValueError('body is not a JSON object')
+            timeout = batch_detonation.parse_timeout(request.get('timeout'))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Error: unreadable message {record.get('messageId')}: {str(e)}")
+            failed.append(record.get('messageId'))
+            continue
+        items.append({
+            'index': len(items),
+            'id': record['messageId'],
+            'script': request.get('script', ''),
+            'target_url': request.get('target_url', ''),
+            'scan_id': request.get('scan_id', 'unknown'),
+            'timeout': timeout,
+            'force_rerun': bool(request.get('force_rerun')),
+        })
+    return items, failed
+
+
+def run_messages(items, budget_seconds=None, max_workers=None):
+    """Detonate every item concurrently; entries come back in item order"""
+    if not items:
+        return []
+    workers = max(1, min(max_workers or int(os.environ.get('DETONATOR_MAX_WORKERS', 8)), len(items)))
+    deadline = None if budget_seconds is None else time.monotonic() + budget_seconds
+    # Nobody reads stdout here, only what the sink keeps, so share the allowance
+    output_limits = batch_detonation._output_limits(len(items))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sqs-detonate') as pool:
+        futures = [
+            pool.submit(batch_detonation.run_item, item, item['scan_id'], item['timeout'],
+                        output_limits, deadline)
+            for item in items
+        ]
+        return [future.result() for future in futures]
+
+
+def handle_sqs(event, context, sink=None):
+    """Lambda entry point for SQS batches; returns the partial batch response"""
+    items, failed = parse_records(event['Records'])
+    budget = execution.time_budget(context, execution.MAX_SCRIPT_SECONDS)
+    with timing.span('detonate_batch'):
+        entries = run_messages(items, budget_seconds=budget)
+
+    settled = [entry for entry in entries if entry['status'] in SETTLED_STATUSES]
+    failed.extend(entry['id'] for entry in entries if entry['status'] not in SETTLED_STATUSES)
+
+    scan_ids = {item['id']: item['scan_id'] for item in items}
+    with timing.span('sink'):
+        failed.extend((sink or sinks.sink_from_env()).send(
+            [sinks.verdict(entry, scan_ids[entry['id']]) for entry in settled]
+        ))
+
+    statuses = [entry['status'] for entry in entries]
+    print(json.dumps({
+        'event': 'detonation_batch',
+        'messages': len(event['Records']),
+        'settled': len(settled),
+        'failed': len(failed),
+        'vulnerable': sum(1 for entry in settled if entry.get('vulnerable')),
+        'timed_out': statuses.count('timeout'),
+    }))
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed]}
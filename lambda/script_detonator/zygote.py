@@ -0,0 +1,350 @@
+"""
+Fork server ("zygote") for the detonator.
+
+Starting sys.executable for every script pays interpreter start-up plus the
+stdlib imports generated scripts almost always make. The zygote is started
+once per warm container, pre-imports those modules and forks a fresh child
+per script. Each child gets its own session, the caller's stdout/stderr
+pipes and env, and exits with the same code `python script.py` would.
+
+Protocol over an AF_UNIX SOCK_SEQPACKET pair, one JSON object per packet:
+    -> {"id": n, "script_path": "...", "env": {...}, "rlimits": {...}}
+                                                        + fds [stdout_w, stderr_w]
+    <- {"id": n, "pid": pid}                            child forked
+    <- {"id": n, "returncode": rc}                      child reaped
+"""
+
+import builtins
+import importlib
+import itertools
+import json
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import traceback
+import types
+
+# Modules generated validation scripts reach for first (scanner_probe is
+# the detonator's own HTTP helper, next to this file)
+PRELOAD_MODULES = (
+    'socket', 'ssl', 'json', 're', 'time', 'base64', 'hashlib',
+    'http.client', 'urllib.request', 'urllib.parse', 'urllib.error',
+    'concurrent.futures', 'scanner_probe',
+)
+
+MAX_MESSAGE_BYTES = 1 << 20
+
+
+def is_supported():
+    """The zygote needs fork() and fd passing over Unix sockets"""
+    return hasattr(os, 'fork') and hasattr(socket, 'send_fds')
+
+
+# ============================================================================
+# SERVER SIDE (runs in the zygote process)
+# ============================================================================
+
+def _send(sock, message):
+    sock.send(json.dumps(message).encode('utf-8'))
+
+
+def _reap(sock, children):
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        request_id = children.pop(pid, None)
+        if request_id is not None:
+            _send(sock, {'id': request_id, 'returncode': os.waitstatus_to_exitcode(status)})
+
+
+def serve(sock):
+    """
+    Fork-server loop. Only ever returns inside a freshly forked child, handing
+    back (request, fds) for run_child(); in the zygote it runs until the
+    parent closes its end of the socket.
+    """
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+    # SIGCHLD wakes the selector through the wakeup fd so children are reaped promptly
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    os.set_blocking(wake_w, False)
+    signal.set_wakeup_fd(wake_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    selector.register(wake_r, selectors.EVENT_READ)
+    children = {}
+
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is not sock:
+                try:
+                    while os.read(wake_r, 512):
+                        pass
+                except BlockingIOError:
+                    pass
+                continue
+
+            try:
+                data, fds, _, _ = socket.recv_fds(sock, MAX_MESSAGE_BYTES, 2)
+            except OSError:
+                data, fds = b'', []
+            if not data:
+                return None
+
+            request = json.loads(data)
+            pid = os.fork()
+            if pid == 0:
+                # Child: drop every zygote resource before running the script
+                signal.set_wakeup_fd(-1)
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                selector.close()
+                sock.close()
+                os.close(wake_r)
+                os.close(wake_w)
+                return request, fds
+
+            for fd in fds:
+                os.close(fd)
+            children[pid] = request['id']
+            _send(sock, {'id': request['id'], 'pid': pid})
+        _reap(sock, children)
+
+
+def _exception_from_script(exc, script_path):
+    """Traceback starting at the script's own frames, like `python script.py`"""
+    tb = exc.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename != script_path:
+        tb = tb.tb_next
+    traceback.print_exception(type(exc), exc, tb or exc.__traceback__)
+
+
+def apply_rlimits(rlimits, pid=0):
+    """Apply {"RLIMIT_CPU": [soft, hard], ...} to pid (0 = this process)"""
+    import resource
+
+    for name, (soft, hard) in (rlimits or {}).items():
+        resource.prlimit(pid, getattr(resource, name), (soft, hard))
+
+
+def run_child(request, fds):
+    """Turn the forked child into `python <script_path>` and exit with its code"""
+
+    os.setsid()
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(fds[0], 1)
+    os.dup2(fds[1], 2)
+    for fd in (devnull, *fds):
+        os.close(fd)
+
+    apply_rlimits(request.get('rlimits'))
+
+    os.environ.clear()
+    os.environ.update(request['env'])
+
+    script_path = request['script_path']
+    sys.argv = [script_path]
+    sys.path[0] = os.path.dirname(os.path.abspath(script_path))
+
+    try:
+        _exec_main(script_path)
+        code = 0
+    except SystemExit as e:
+        code = _exit_code(e.code)
+    except BaseException as e:
+        _exception_from_script(e, script_path)
+        code = 1
+    _shutdown(code)
+
+
+def _exec_main(script_path):
+    """
+    Execute the script as __main__. Equivalent to runpy.run_path but without
+    its importer lookups, which dominate the cost of a short script.
+    """
+    with open(script_path, 'rb') as f:
+        code = compile(f.read(), script_path, 'exec')
+    main_module = types.ModuleType('__main__')
+    main_module.__file__ = script_path
+    main_module.__builtins__ = builtins
+    sys.modules['__main__'] = main_module
+    exec(code, main_module.__dict__)
+
+
+def _exit_code(code):
+    """Map SystemExit.code the way the interpreter does"""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code & 0xFF
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _shutdown(code):
+    """
+    Exit like the interpreter would - join non-daemon threads, run atexit
+    handlers, flush stdio - but skip full finalization, which costs more
+    than the fork itself once the preloaded modules are in memory.
+    """
+    import atexit
+
+    try:
+        threading._shutdown()
+        atexit._run_exitfuncs()
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(code)
+
+
+def main():
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    child = serve(sock)
+    if child is not None:
+        run_child(*child)
+
+
+# ============================================================================
+# CLIENT SIDE (runs in the Lambda handler process)
+# ============================================================================
+
+class ZygoteError(RuntimeError):
+    """The zygote died or refused a request"""
+
+
+class ZygoteProcess:
+    """Popen-like handle for a script forked by the zygote"""
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.pid = None
+        self.returncode = None
+        self._started = threading.Event()
+        self._finished = threading.Event()
+        self._error = None
+
+    def _wait_started(self):
+        self._started.wait()
+        if self.pid is None:
+            raise ZygoteError(self._error or "zygote did not start the script")
+
+    def poll(self):
+        return self.returncode if self._finished.is_set() else None
+
+    def wait(self, timeout=None):
+        if not self._finished.wait(timeout):
+            raise subprocess.TimeoutExpired(self.pid, timeout)
+        if self.returncode is None:
+            raise ZygoteError(self._error or "zygote lost track of the script")
+        return self.returncode
+
+    def _fail(self, error):
+        self._error = error
+        self._started.set()
+        self._finished.set()
+
+
+class Zygote:
+    """Handle on a running zygote process"""
+
+    def __init__(self):
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self._proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), str(child_sock.fileno())],
+            pass_fds=[child_sock.fileno()],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL
+        )
+        child_sock.close()
+        self._sock = parent_sock
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._alive = True
+        self._reader = threading.Thread(target=self._read_loop, name='zygote-reader', daemon=True)
+        self._reader.start()
+
+    @property
+    def alive(self):
+        return self._alive and self._proc.poll() is None
+
+    def spawn(self, script_path, env, stdout_fd, stderr_fd, rlimits=None):
+        """
+        Fork a child running script_path; stdout/stderr go to the given fds and
+        rlimits are applied in the child before the script starts.
+        """
+        with self._lock:
+            if not self._alive:
+                raise ZygoteError("zygote is not running")
+            process = ZygoteProcess(next(self._ids))
+            self._pending[process.request_id] = process
+            message = json.dumps({
+                'id': process.request_id,
+                'script_path': script_path,
+                'env': dict(env),
+                'rlimits': rlimits or {}
+            }).encode('utf-8')
+            try:
+                socket.send_fds(self._sock, [message], [stdout_fd, stderr_fd])
+            except OSError as e:
+                self._pending.pop(process.request_id, None)
+                raise ZygoteError(f"zygote request failed: {e}") from e
+        process._wait_started()
+        return process
+
+    def _read_loop(self):
+        while True:
+            try:
+                data = self._sock.recv(MAX_MESSAGE_BYTES)
+            except OSError:
+                data = b''
+            if not data:
+                break
+            message = json.loads(data)
+            with self._lock:
+                process = self._pending.get(message['id'])
+                if process is None:
+                    continue
+                if 'pid' in message:
+                    process.pid = message['pid']
+                    process._started.set()
+                else:
+                    self._pending.pop(message['id'], None)
+                    process.returncode = message['returncode']
+                    process._finished.set()
+
+        with self._lock:
+            self._alive = False
+            pending, self._pending = self._pending, {}
+        for process in pending.values():
+            process._fail("zygote exited")
+
+    def close(self):
+        self._sock.close()
+        try:
+            self._proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+"""
+End-to-end scan pipeline: findings -> generated scripts -> detonation verdicts.
+
+    python -m pipeline --findings findings.json --local
+"""
+
+from pipeline.orchestrator import ScanPipeline, run_scan
@@ -0,0 +1,102 @@
+"""
+Run a scan from the command line.
+
+    python -m pipeline --findings findings.json --local
+    python -m pipeline --findings findings.json --project ai-scanner --environment dev
+    python -m pipeline --findings findings.json --local --results-db postgresql://localhost/scanner
+
+findings.json is a list of {"vulnerability": ..., "target_url": ...} objects
+(optionally with "target_urls": every host the finding was reported on).
+--fan-out merges findings with the same description, so each is generated
+once and detonated against all of its hosts. With --results-db every
+verdict (one row per target) is also written to PostgreSQL in batches
+(scanner_common.result_writer).
+"""
+
+import argparse
+import json
+import os
+import sys
+import uuid
+
+from pipeline.invokers import COMMON_LAYER_DIR, LambdaInvoker, LocalInvoker
+from pipeline.orchestrator import run_scan
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pipeline', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--findings', required=True, help='JSON file with a list of findings ("-" for stdin)')
+    parser.add_argument('--local', action='store_true', help='Call the handlers in-process instead of Lambda')
+    parser.add_argument('--project', default='ai-scanner')
+    parser.add_argument('--environment', default='dev')
+    parser.add_argument('--scan-id', default=None)
+    parser.add_argument('--generate-concurrency', type=int, default=4)
+    parser.add_argument('--detonate-concurrency', type=int, default=2)
+    parser.add_argument('--queue-size', type=int, default=None,
+                        help='Scripts waiting for detonation before generation blocks')
+    parser.add_argument('--regenerate-attempts', type=int, default=1)
+    parser.add_argument('--candidates', type=int, default=1,
+                        help='Speculative scripts per finding, raced in the detonator')
+    parser.add_argument('--fan-out', action='store_true',
+                        help='One script per vulnerability description, detonated against all its hosts')
+    parser.add_argument('--progress', action='store_true', help='Print each finding to stderr as it finishes')
+    parser.add_argument('--results-db', default=os.environ.get('RESULTS_DATABASE_URL'),
+                        help='PostgreSQL conninfo/URL to write verdicts to (default: $RESULTS_DATABASE_URL)')
+    args = parser.parse_args(argv)
+
+    if args.findings == '-':
+        findings = json.load(sys.stdin)
+    else:
+        with open(args.findings) as f:
+            findings = json.load(f)
+
+    if args.local:
+        invoker = LocalInvoker()
+    else:
+        invoker = LambdaInvoker.for_environment(args.project, args.environment)
+
+    scan_id = args.scan_id or str(uuid.uuid4())
+    writer = _results_writer(args.results_db) if args.results_db else None
+
+    def on_result(result):
+        if args.progress:
+            print(f"[{result['status']}] {result['id']} {result['target_url']}", file=sys.stderr)
+        if writer is not None and 'verdicts' in result:
+            for target_url, verdict in result['verdicts'].items():
+                writer.add(scan_id, dict(verdict, id=result['id'], status=result['status'], target_url=target_url))
+        elif writer is not None:
+            writer.add(scan_id, dict(result.get('detonation') or {}, id=result['id'], status=result['status'],
+                                     target_url=result['target_url'], vulnerable=result.get('vulnerable', False)))
+
+    report = run_scan(
+        findings,
+        invoker,
+        scan_id=scan_id,
+        generate_concurrency=args.generate_concurrency,
+        detonate_concurrency=args.detonate_concurrency,
+        queue_size=args.queue_size,
+        regenerate_attempts=args.regenerate_attempts,
+        candidates=args.candidates,
+        fan_out=args.fan_out,
+        on_result=on_result if args.progress or writer is not None else None
+    )
+    if writer is not None:
+        writer.flush()
+        writer.close()
+        report['results_db'] = dict(writer.stats, pending=writer.pending())
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0 if report['summary']['generation_failed'] + report['summary']['detonation_failed'] == 0 else 1
+
+
+def _results_writer(conninfo):
+    if COMMON_LAYER_DIR not in sys.path:
+        sys.path.insert(0, COMMON_LAYER_DIR)
+    from scanner_common.result_writer import ResultWriter
+    writer = ResultWriter(conninfo)
+    writer.ensure_schema()
+    return writer
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+How the pipeline reaches the two handlers.
+
+- LocalInvoker imports both handlers in-process (tests, benchmarks, laptops)
+- LambdaInvoker calls the deployed functions through the Lambda Invoke API
+
+Both return (status_code, body_dict) for generate() and detonate().
+"""
+
+import importlib.util
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMON_LAYER_DIR = os.path.join(REPO_ROOT, 'lambda', 'common', 'python')
+HANDLER_DIRS = {
+    'generator': os.path.join(REPO_ROOT, 'lambda', 'ai_script_generator'),
+    'detonator': os.path.join(REPO_ROOT, 'lambda', 'script_detonator'),
+}
+
+_handlers = {}
+
+
+class LocalContext:
+    """Just enough of the Lambda context object for the handlers"""
+
+    def __init__(self, function_name, timeout_ms=300000):
+        self.function_name = function_name
+        self.aws_request_id = f"local-{time.monotonic_ns()}"
+        self._deadline = time.monotonic() + timeout_ms / 1000.0
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def load_handler(name):
+    """
+    Import lambda/<handler>/index.py under a unique module name, with the
+    shared layer and the handler's own directory on sys.path as in Lambda.
+    """
+    if name not in _handlers:
+        handler_dir = HANDLER_DIRS[name]
+        for path in (COMMON_LAYER_DIR, handler_dir):
+            if path not in sys.path:
+                sys.path.insert(0, path)
+        spec = importlib.util.spec_from_file_location(f"{name}_index", os.path.join(handler_dir, 'index.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _handlers[name] = module.lambda_handler
+    return _handlers[name]
+
+
+def _parse(response):
+    body = response.get('body')
+    if isinstance(body, str):
+        body = json.loads(body)
+    return response.get('statusCode', 200), body or {}
+
+
+class LocalInvoker:
+    """Calls both handlers in this process"""
+
+    def __init__(self, timeout_ms=300000):
+        self.timeout_ms = timeout_ms
+
+    def _call(self, name, payload):
+        response = load_handler(name)(payload, LocalContext(name, self.timeout_ms))
+        return _parse(response)
+
+    def generate(self, payload):
+        return self._call('generator', payload)
+
+    def detonate(self, payload):
+        return self._call('detonator', payload)
+
+
+class LambdaInvoker:
+    """Calls the deployed functions (RequestResponse invocations)"""
+
+    def __init__(self, generator_function, detonator_function, client=None):
+        if client is None:
+            import boto3
+            from botocore.config import Config
+            # Detonations can legitimately take minutes
+            client = boto3.client('lambda', config=Config(read_timeout=310, retries={'max_attempts': 0}))
+        self._client = client
+        self.generator_function = generator_function
+        self.detonator_function = detonator_function
+
+    @classmethod
+    def for_environment(cls, project_name, environment, client=None, qualifier='live'):
+        """
+        Function names as LambdaStack names them, on its "live" alias (where
+        provisioned concurrency is attached); qualifier=None calls $LATEST.
+        """
+        suffix = f":{qualifier}" if qualifier else ''
+        return cls(
+            f"{project_name}-{environment}-ai-script-generator{suffix}",
+            f"{project_name}-{environment}-script-detonator{suffix}",
+            client=client
+        )
+
+    def _call(self, function_name, payload):
+        response = self._client.invoke(
+            FunctionName=function_name,
+            InvocationType='RequestResponse',
+            Payload=json.dumps(payload).encode('utf-8')
+        )
+        result = json.loads(response['Payload'].read() or b'{}')
+        if response.get('FunctionError'):
+            return 500, {'error': result.get('errorMessage', 'Function error')}
+        return _parse(result)
+
+    def generate(self, payload):
+        return self._call(self.generator_function, payload)
+
+    def detonate(self, payload):
+        return self._call(self.detonator_function, payload)
@@ -0,0 +1,320 @@
+"""
+Scan pipeline: generate -> detonate for many findings, with the two stages
+overlapping.
+
+Generation workers pull findings and push each finished script onto a
+bounded hand-off queue; detonation workers pull from it as soon as anything
+is there. A full queue blocks generation (backpressure), so a slow sandbox
+never accumulates an unbounded pile of scripts. Each stage has its own
+concurrency limit and reports its own throughput; the hand-off queue depth
+is sampled on every put/get.
+
+With candidates=k the generator returns k alternative scripts per finding
+and the detonator races them (first conclusive verdict wins, the rest are
+killed); each result then carries the detonator's "race" report.
+
+A finding with "target_urls" (or, with fan_out=True, every finding sharing
+a vulnerability description, grouped by group_findings) is generated once
+and its script detonated against all of its hosts in one fan-out call -
+chunked to the detonator's batch limit - so the result carries a per-target
+"verdicts" map and is vulnerable when any host is.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+
+# Targets per detonator fan-out call (DETONATOR_BATCH_MAX_ITEMS)
+MAX_TARGETS_PER_CALL = 64
+
+
+def finding_targets(finding):
+    """Every host a finding names: target_url first, then target_urls, without repeats"""
+    targets = [finding.get('target_url') or ''] + list(finding.get('target_urls') or [])
+    return list(dict.fromkeys(t for t in targets if t))
+
+
+def group_findings(findings):
+    """
+    Merge findings with the same vulnerability description (and category)
+    into one finding per description, listing every host in target_urls and
+    the merged ids in "ids".
+    """
+    groups = {}
+    for index, finding in enumerate(findings):
+        key = (' '.join((finding.get('vulnerability') or '').lower().split()), finding.get('category'))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = dict(finding, id=finding.get('id', index), ids=[], target_urls=[])
+            group.pop('target_url', None)
+        group['ids'].append(finding.get('id', index))
+        group['target_urls'].extend(t for t in finding_targets(finding) if t not in group['target_urls'])
+    return list(groups.values())
+
+
+class StageStats:
+    """Counters for one pipeline stage"""
+
+    def __init__(self, name, concurrency):
+        self.name = name
+        self.concurrency = concurrency
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.first_started = None
+        self.last_finished = None
+
+    def record(self, started, finished, ok):
+        if self.first_started is None or started < self.first_started:
+            self.first_started = started
+        if self.last_finished is None or finished > self.last_finished:
+            self.last_finished = finished
+        self.busy_seconds += finished - started
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+
+    def to_dict(self):
+        span = 0.0
+        if self.first_started is not None:
+            span = self.last_finished - self.first_started
+        handled = self.completed + self.failed
+        return {
+            'concurrency': self.concurrency,
+            'completed': self.completed,
+            'failed': self.failed,
+            'wall_seconds': round(span, 3),
+            'throughput_per_second': round(handled / span, 3) if span else None,
+            'mean_latency_ms': round(self.busy_seconds / handled * 1000, 1) if handled else None,
+            'utilization': round(self.busy_seconds / (span * self.concurrency), 3) if span else None,
+        }
+
+
+class QueueStats:
+    """Depth samples for the hand-off queue"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.samples = 0
+        self.total_depth = 0
+        self.max_depth = 0
+        self.blocked_puts = 0
+
+    def sample(self, depth):
+        self.samples += 1
+        self.total_depth += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def to_dict(self):
+        return {
+            'maxsize': self.maxsize,
+            'max_depth': self.max_depth,
+            'mean_depth': round(self.total_depth / self.samples, 2) if self.samples else 0,
+            'blocked_puts': self.blocked_puts,
+        }
+
+
+class ScanPipeline:
+    """
+    Runs one scan through an invoker (pipeline.invokers.LocalInvoker or
+    LambdaInvoker).
+
+    regenerate_attempts: extra generations (bypassing the script cache) for
+    findings whose script failed the generator's pre-flight checks.
+    candidates: speculative scripts per finding (1 disables racing).
+    fan_out: group findings by description first (see group_findings).
+    """
+
+    def __init__(self, invoker, generate_concurrency=4, detonate_concurrency=2,
+                 queue_size=None, regenerate_attempts=1, on_result=None, candidates=1, fan_out=False):
+        self.invoker = invoker
+        self.generate_concurrency = generate_concurrency
+        self.detonate_concurrency = detonate_concurrency
+        self.queue_size = queue_size or detonate_concurrency * 2
+        self.regenerate_attempts = regenerate_attempts
+        self.on_result = on_result
+        self.candidates = candidates
+        self.fan_out = fan_out
+
+    async def _call(self, executor, fn, payload):
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, payload)
+
+    async def _generate(self, executor, finding, scan_id, stats):
+        targets = finding_targets(finding)
+        payload = {
+            'vulnerability': finding.get('vulnerability', ''),
+            'target_url': targets[0] if targets else '',
+            'scan_id': scan_id,
+        }
+        if len(targets) > 1:
+            payload['target_urls'] = targets
+        if self.candidates > 1:
+            payload['candidates'] = self.candidates
+        for attempt in range(self.regenerate_attempts + 1):
+            started = time.monotonic()
+            try:
+                status, body = await self._call(executor, self.invoker.generate, payload)
+            except Exception as e:
+                status, body = 500, {'error': str(e)}
+            preflight = body.get('preflight')
+            ok = status == 200 and (preflight is None or preflight.get('ok'))
+            stats.record(started, time.monotonic(), ok)
+            if ok or status != 200:
+                break
+            payload = dict(payload, bypass_cache=True)
+        body['attempts'] = attempt + 1
+        return status, body
+
+    async def _generation_worker(self, executor, findings, handoff, scan_id, results, stats, queue_stats):
+        while findings:
+            index, finding = findings.pop()
+            status, body = await self._generate(executor, finding, scan_id, stats)
+            result = results[index]
+            result['generation'] = dict(body, statusCode=status)
+
+            preflight = body.get('preflight')
+            if status != 200:
+                result['status'] = 'generation_failed'
+            elif preflight is not None and not preflight.get('ok'):
+                result['status'] = 'rejected'
+            else:
+                if handoff.full():
+                    queue_stats.blocked_puts += 1
+                await handoff.put((index, self._detonation_payloads(body, finding, scan_id)))
+                queue_stats.sample(handoff.qsize())
+                continue
+            self._emit(result)
+
+    async def _detonation_worker(self, executor, handoff, scan_id, results, stats, queue_stats):
+        while True:
+            item = await handoff.get()
+            queue_stats.sample(handoff.qsize())
+            if item is _DONE:
+                return
+            index, payloads = item
+            verdicts = {}
+            for payload in payloads:
+                started = time.monotonic()
+                try:
+                    status, body = await self._call(executor, self.invoker.detonate, payload)
+                except Exception as e:
+                    status, body = 500, {'error': str(e)}
+                ok = status in (200, 408)
+                stats.record(started, time.monotonic(), ok)
+                verdicts.update(body.get('verdicts') or {})
+                if not ok:
+                    break
+
+            result = results[index]
+            result['detonation'] = dict(body, statusCode=status)
+            result['status'] = 'detonated' if ok else 'detonation_failed'
+            if 'target_urls' in payloads[0]:
+                result['verdicts'] = verdicts
+                result['vulnerable'] = any(v['vulnerable'] for v in verdicts.values())
+            else:
+                result['vulnerable'] = bool(body.get('vulnerable'))
+            if 'race' in body:
+                result['race'] = body['race']
+            self._emit(result)
+
+    def _detonation_payloads(self, generation, finding, scan_id):
+        """Detonator calls for one finding: one, or a fan-out per chunk of its targets"""
+        targets = finding_targets(finding)
+        if len(targets) > 1:
+            # Racing is per target; a multi-host finding fans out its best script
+            return [
+                {'script': generation['script'], 'target_urls': targets[i:i + MAX_TARGETS_PER_CALL],
+                 'scan_id': scan_id}
+                for i in range(0, len(targets), MAX_TARGETS_PER_CALL)
+            ]
+        payload = {'target_url': targets[0] if targets else '', 'scan_id': scan_id}
+        scripts = [c['script'] for c in generation.get('scripts') or [] if c.get('valid')]
+        if self.candidates > 1 and len(scripts) > 1:
+            payload['candidates'] = scripts
+        else:
+            payload['script'] = generation['script']
+        return [payload]
+
+    def _emit(self, result):
+        if self.on_result is not None:
+            self.on_result(result)
+
+    async def run(self, findings, scan_id='unknown'):
+        """Run every finding through both stages; returns the scan report"""
+        started = time.monotonic()
+        if self.fan_out:
+            findings = group_findings(findings)
+        results = []
+        for i, f in enumerate(findings):
+            targets = finding_targets(f)
+            result = {'index': i, 'id': f.get('id', i), 'target_url': targets[0] if targets else '',
+                      'status': 'pending'}
+            if len(targets) > 1:
+                result['target_urls'] = targets
+            if 'ids' in f:
+                result['ids'] = f['ids']
+            results.append(result)
+        pending = list(reversed(list(enumerate(findings))))
+        handoff = asyncio.Queue(maxsize=self.queue_size)
+        generation_stats = StageStats('generation', self.generate_concurrency)
+        detonation_stats = StageStats('detonation', self.detonate_concurrency)
+        queue_stats = QueueStats(self.queue_size)
+
+        # Invokers are blocking; give every worker its own thread
+        executor = ThreadPoolExecutor(
+            max_workers=self.generate_concurrency + self.detonate_concurrency,
+            thread_name_prefix='pipeline'
+        )
+        try:
+            detonators = [
+                asyncio.ensure_future(self._detonation_worker(
+                    executor, handoff, scan_id, results, detonation_stats, queue_stats))
+                for _ in range(self.detonate_concurrency)
+            ]
+            await asyncio.gather(*[
+                self._generation_worker(executor, pending, handoff, scan_id, results,
+                                        generation_stats, queue_stats)
+                for _ in range(self.generate_concurrency)
+            ])
+            for _ in detonators:
+                await handoff.put(_DONE)
+            await asyncio.gather(*detonators)
+        finally:
+            executor.shutdown(wait=False)
+
+        statuses = [r['status'] for r in results]
+        return {
+            'scan_id': scan_id,
+            'results': results,
+            'summary': {
+                'total': len(results),
+                'vulnerable': sum(1 for r in results if r.get('vulnerable')),
+                'detonated': statuses.count('detonated'),
+                'rejected': statuses.count('rejected'),
+                'generation_failed': statuses.count('generation_failed'),
+                'detonation_failed': statuses.count('detonation_failed'),
+                'races': sum(1 for r in results if 'race' in r),
+                'targets': sum(len(r.get('target_urls') or [r['target_url']]) for r in results),
+                'vulnerable_targets': sum(
+                    sum(1 for v in r['verdicts'].values() if v['vulnerable']) if 'verdicts' in r
+                    else int(bool(r.get('vulnerable')))
+                    for r in results
+                ),
+                'race_cancelled': sum(r['race']['cancelled_running'] + r['race']['cancelled_before_start']
+                                      for r in results if 'race' in r),
+                'elapsed_seconds': round(time.monotonic() - started, 3),
+            },
+            'stages': {
+                'generation': generation_stats.to_dict(),
+                'detonation': detonation_stats.to_dict(),
+                'handoff_queue': queue_stats.to_dict(),
+            }
+        }
+
+
+def run_scan(findings, invoker, scan_id='unknown', **options):
+    """Synchronous wrapper around ScanPipeline.run"""
+    return asyncio.run(ScanPipeline(invoker, **options).run(findings, scan_id))
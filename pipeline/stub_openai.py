@@ -0,0 +1,311 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Lets the generator (router, streaming, batch mode) run offline: point the SDK
+at it with OPENAI_BASE_URL and any OPENAI_API_KEY.
+
+    python -m pipeline.stub_openai --port 8089 --behavior gpt-4o-mini=no_exit
+
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub \\
+        python -m pipeline --findings findings.json --local
+
+Each model answers with one of the canned behaviours below (default "good"):
+- good:      fenced script that prints and exits 0/1, target from TARGET_URL
+- hardcoded: like good, but pins the example target from the prompt
+- no_exit:   runs fine but never sets an exit code
+- broken:    does not parse
+- probe:     uses the detonator's scanner_probe helper
+Streaming (stream=true) is served as server-sent events, and n > 1 returns
+that many choices. --rate-limit-rps N answers anything past N requests in
+the last second with a 429 and retry-after-ms, like the real API does.
+From Python, use StubOpenAI as a context manager.
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BEHAVIORS = {
+    'good': '''import os
+import sys
+import urllib.request
+
+TARGET = os.environ.get('TARGET_URL', '')
+print(f"Probing {{TARGET}}")
+try:
+    urllib.request.urlopen(TARGET, timeout=5)
+except Exception as e:
+    print(f"Not reachable: {{e}}")
+    sys.exit(1)
+sys.exit(0)
+''',
+    'hardcoded': '''import sys
+import urllib.request
+
+TARGET = {target!r}
+print(f"Probing {{TARGET}}")
+try:
+    urllib.request.urlopen(TARGET, timeout=5)
+except Exception as e:
+    print(f"Not reachable: {{e}}")
+    sys.exit(1)
+sys.exit(0)
+''',
+    'no_exit': '''TARGET = {target!r}
+print(f"Probing {{TARGET}}")
+''',
+    'broken': '''def probe(:
+    return {target!r}
+''',
+    'probe': '''import scanner_probe as probe
+
+r = probe.get('/')
+if r.error:
+    probe.evidence('unreachable', r.error)
+    probe.verdict(False, 'target not reachable')
+probe.evidence('reachable', f"HTTP {{r.status}}", r)
+probe.verdict(False, 'no injection point confirmed')
+''',
+}
+
+
+def _target(messages):
+    for message in messages:
+        match = re.search(r'Target: (\S*)', message.get('content') or '')
+        if match:
+            return match.group(1)
+    return ''
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/stats'):
+            self._json(200, self.server.stub.stats())
+        else:
+            self._json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._json(404, {'error': {'message': 'Not found'}})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+        stub = self.server.stub
+        model = request.get('model', '')
+        retry_after = stub.admit()
+        if retry_after is not None:
+            self._throttled(retry_after)
+            return
+        stub.record(model)
+
+        contents = [stub.content(model, request.get('messages', []), i) for i in range(int(request.get('n') or 1))]
+        if stub.latency_ms:
+            time.sleep(stub.latency_ms / 1000.0)
+
+        completion_id = f"chatcmpl-stub-{stub.request_count}"
+        if request.get('stream'):
+            self._stream(completion_id, model, contents)
+            return
+
+        self._json(200, {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [
+                {'index': i, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}
+                for i, content in enumerate(contents)
+            ],
+            'usage': {
+                'prompt_tokens': 100,
+                'completion_tokens': sum(len(c) // 4 for c in contents),
+                'total_tokens': 100 + sum(len(c) // 4 for c in contents),
+            },
+        })
+
+    def _throttled(self, retry_after):
+        data = json.dumps({'error': {'message': 'Rate limit reached (stub)', 'type': 'requests',
+                                     'code': 'rate_limit_exceeded'}}).encode('utf-8')
+        self.send_response(429)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('retry-after-ms', str(int(retry_after * 1000)))
+        self.send_header('retry-after', str(max(1, round(retry_after))))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, completion_id, model, contents):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def event(index, delta, finish_reason=None):
+            payload = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': index, 'delta': delta, 'finish_reason': finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        stub = self.server.stub
+        try:
+            for index, content in enumerate(contents):
+                event(index, {'role': 'assistant', 'content': ''})
+                for line in content.splitlines(keepends=True):
+                    event(index, {'content': line})
+                    if stub.chunk_delay_ms:
+                        time.sleep(stub.chunk_delay_ms / 1000.0)
+                event(index, {}, 'stop')
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client stopped reading early (closing fence seen) - that's the point
+            pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # A client that gave up (cancelled batch item, closed stream) is not an error
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubOpenAI:
+    """
+    Threaded stub server. behaviors maps model name -> behaviour name;
+    latency_ms delays every response, chunk_delay_ms every streamed line;
+    rate_limit_rps throttles past that many requests per second.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, behaviors=None, default_behavior='good',
+                 latency_ms=0, chunk_delay_ms=0, rate_limit_rps=None):
+        self.behaviors = dict(behaviors or {})
+        self.default_behavior = default_behavior
+        self.latency_ms = latency_ms
+        self.chunk_delay_ms = chunk_delay_ms
+        self.rate_limit_rps = rate_limit_rps
+        self.request_count = 0
+        self.throttled_count = 0
+        self.requests_by_model = {}
+        self._admitted = []
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record(self, model):
+        with self._lock:
+            self.request_count += 1
+            self.requests_by_model[model] = self.requests_by_model.get(model, 0) + 1
+
+    def admit(self):
+        """None when the request may proceed, else seconds until it could"""
+        if not self.rate_limit_rps:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            self._admitted = [t for t in self._admitted if now - t < 1.0]
+            if len(self._admitted) >= self.rate_limit_rps:
+                self.throttled_count += 1
+                return 1.0 - (now - self._admitted[0])
+            self._admitted.append(now)
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.request_count, 'throttled': self.throttled_count,
+                    'by_model': dict(self.requests_by_model)}
+
+    def content(self, model, messages, index=0):
+        behavior = self.behaviors.get(model, self.default_behavior)
+        script = BEHAVIORS[behavior].format(target=_target(messages))
+        if index:
+            script = f"# candidate {index}\n{script}"
+        return f"```python\n{script}```\n"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-openai', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _parse_behaviors(values):
+    behaviors = {}
+    for value in values or []:
+        model, _, behavior = value.partition('=')
+        if behavior not in BEHAVIORS:
+            raise ValueError(f"Unknown behavior '{behavior}' (choose from {', '.join(BEHAVIORS)})")
+        behaviors[model] = behavior
+    return behaviors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pipeline.stub_openai', description='Offline OpenAI stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--behavior', action='append', metavar='MODEL=BEHAVIOR',
+                        help=f"Per-model behaviour ({', '.join(BEHAVIORS)}); repeatable")
+    parser.add_argument('--default-behavior', default='good', choices=sorted(BEHAVIORS))
+    parser.add_argument('--latency-ms', type=int, default=0)
+    parser.add_argument('--chunk-delay-ms', type=int, default=0)
+    parser.add_argument('--rate-limit-rps', type=int, help='429 past this many requests per second')
+    args = parser.parse_args(argv)
+
+    try:
+        behaviors = _parse_behaviors(args.behavior)
+    except ValueError as e:
+        parser.error(str(e))
+
+    stub = StubOpenAI(args.host, args.port, behaviors, args.default_behavior,
+                      args.latency_ms, args.chunk_delay_ms, args.rate_limit_rps)
+    print(f"Stub OpenAI endpoint on {stub.base_url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._server.server_close()
+
+
+if __name__ == '__main__':
+    main()
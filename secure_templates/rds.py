@@ -42,7 +42,8 @@ class SecureDatabaseInstance(rds.DatabaseInstance):
             kwargs["backup_retention"] = cdk.Duration.days(30)
         
         # ENFORCE DELETION PROTECTION for production
-        if kwargs.get("environment", {}).get("ENVIRONMENT") == "prod":
+        # (environment is template input only, not a DatabaseInstance property)
+        if kwargs.pop("environment", {}).get("ENVIRONMENT") == "prod":
             kwargs["deletion_protection"] = True
         
         super().__init__(scope, construct_id, publicly_accessible=publicly_accessible, **kwargs)
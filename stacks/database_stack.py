@@ -5,10 +5,12 @@ from aws_cdk import (
     aws_secretsmanager as secretsmanager,
     aws_kms as kms,
     Duration,
+    RemovalPolicy,
     CfnOutput
 )
 from constructs import Construct
 from secure_templates.rds import SecureDatabaseInstance
+from stacks import shared_params
 
 class DatabaseStack(Stack):
     """
@@ -17,10 +19,19 @@ class DatabaseStack(Stack):
     """
     
     def __init__(self, scope: Construct, construct_id: str,
-                 vpc: ec2.Vpc, ecs_security_group: ec2.SecurityGroup,
-                 environment: str, project_name: str, **kwargs) -> None:
+                 environment: str, project_name: str,
+                 vpc: ec2.IVpc = None, ecs_security_group: ec2.ISecurityGroup = None,
+                 **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
         
+        # Without NetworkStack in this synth, use what it published to SSM
+        if vpc is None:
+            vpc = shared_params.vpc(self, "MainVPC", project_name, environment, shared_params.MAIN_VPC_ID)
+        if ecs_security_group is None:
+            ecs_security_group = shared_params.security_group(
+                self, "ECSTasksSG", project_name, environment, shared_params.ECS_TASKS_SG_ID
+            )
+        
         # ====================================================================
         # KMS Key for RDS Encryption
         # ====================================================================
@@ -71,6 +82,23 @@ class DatabaseStack(Stack):
             )
         )
         
+        # ====================================================================
+        # DB Security Group - ECS tasks directly, everything else via the proxy
+        # ====================================================================
+        # Owned by this stack so rules referencing the instance (the proxy adds
+        # one) never make NetworkStack depend on DatabaseStack
+        self.rds_sg = ec2.SecurityGroup(
+            self, "RDSSG",
+            vpc=vpc,
+            description="Security group for RDS PostgreSQL",
+            allow_all_outbound=False
+        )
+        self.rds_sg.add_ingress_rule(
+            peer=ecs_security_group,
+            connection=ec2.Port.tcp(5432),
+            description="Allow PostgreSQL from ECS tasks"
+        )
+        
         # ====================================================================
         # SECURE RDS INSTANCE - Using security guardrail template
         # ====================================================================
@@ -84,10 +112,7 @@ class DatabaseStack(Stack):
                 ec2.InstanceSize.MICRO if environment == "dev" else ec2.InstanceSize.LARGE
             ),
             vpc=vpc,
-            vpc_subnets=ec2.SubnetSelection(
-                subnet_group=db_subnet_group
-            ),
-            security_groups=[ecs_security_group],
+            security_groups=[self.rds_sg],
             subnet_group=db_subnet_group,
             credentials=rds.Credentials.from_secret(self.rds_secret),
             database_name="scannerdb",
@@ -97,8 +122,8 @@ class DatabaseStack(Stack):
             storage_encrypted=True,
             storage_encryption_key=self.rds_key,
             backup_retention=Duration.days(7 if environment == "dev" else 30),
-            backup_window="03:00-04:00",
-            maintenance_window="sun:04:00-sun:05:00",
+            preferred_backup_window="03:00-04:00",
+            preferred_maintenance_window="sun:04:00-sun:05:00",
             multi_az=False if environment == "dev" else True,
             publicly_accessible=False,  # ENFORCED by secure template
             deletion_protection=True if environment == "prod" else False,
@@ -106,9 +131,51 @@ class DatabaseStack(Stack):
             environment={"ENVIRONMENT": environment}  # Pass to secure template
         )
         
+        # ====================================================================
+        # RDS PROXY - Pools connections from Lambdas and Celery workers
+        # ====================================================================
+        # Clients connect to the proxy (IAM auth, TLS); it multiplexes them onto
+        # a bounded set of database connections, so bursts of short-lived
+        # writers cannot exhaust max_connections, and it rides out failovers.
+        self.rds_proxy_sg = ec2.SecurityGroup(
+            self, "RDSProxySG",
+            vpc=vpc,
+            description="Security group for the RDS Proxy",
+            allow_all_outbound=True
+        )
+        self.rds_proxy_sg.add_ingress_rule(
+            peer=ecs_security_group,
+            connection=ec2.Port.tcp(5432),
+            description="Allow PostgreSQL from ECS tasks"
+        )
+        self.rds_proxy = self.rds_instance.add_proxy(
+            "PostgreSQLProxy",
+            db_proxy_name=f"{project_name}-{environment}-postgres-proxy",
+            secrets=[self.rds_secret],
+            vpc=vpc,
+            vpc_subnets=ec2.SubnetSelection(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ),
+            security_groups=[self.rds_proxy_sg],
+            iam_auth=True,
+            require_tls=True,
+            # Headroom below max_connections for migrations and admin sessions
+            max_connections_percent=90,
+            max_idle_connections_percent=50,
+            borrow_timeout=Duration.seconds(30)
+        )
+        
         # ====================================================================
         # OUTPUTS
         # ====================================================================
         CfnOutput(self, "RDSInstanceEndpoint", value=self.rds_instance.db_instance_endpoint_address)
         CfnOutput(self, "RDSSecretARN", value=self.rds_secret.secret_arn)
         CfnOutput(self, "OpenAISecretARN", value=self.openai_secret.secret_arn)
+        CfnOutput(self, "RDSProxyEndpoint", value=self.rds_proxy.endpoint)
+        
+        shared_params.publish(self, project_name, environment, {
+            shared_params.OPENAI_SECRET_ARN: self.openai_secret.secret_arn,
+            shared_params.RDS_SECRET_ARN: self.rds_secret.secret_arn,
+            shared_params.RDS_ENDPOINT: self.rds_instance.db_instance_endpoint_address,
+            shared_params.RDS_PROXY_ENDPOINT: self.rds_proxy.endpoint,
+        })
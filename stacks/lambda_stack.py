@@ -1,15 +1,116 @@
 from aws_cdk import (
+    Annotations,
     Stack,
+    BundlingOptions,
     aws_lambda as lambda_,
+    aws_lambda_event_sources as lambda_event_sources,
     aws_ec2 as ec2,
     aws_secretsmanager as secretsmanager,
     aws_iam as iam,
+    aws_s3 as s3,
+    aws_sqs as sqs,
     Duration,
+    RemovalPolicy,
+    Size,
     CfnOutput
 )
 from constructs import Construct
+import json
 import os
 
+from stacks import performance_profiles, shared_params, vpc_endpoints
+
+# Slim dependency bundle for the generator: install without bytecode, drop
+# what a Lambda never imports (CLI, tests, type stubs, console scripts), then
+# precompile once with the runtime's Python. unchecked-hash .pyc files stay
+# valid even though zip extraction changes the source mtimes, so cold starts
+# never recompile on the read-only filesystem.
+SLIM_DEPS_COMMAND = " && ".join([
+    "pip install --no-cache-dir --no-compile -r requirements.txt -t /asset-output/python",
+    "cd /asset-output/python",
+    "rm -rf bin openai/cli",
+    "find . -type d \\( -name tests -o -name test \\) -prune -exec rm -rf {} +",
+    "find . -name '*.pyi' -delete",
+    "python -m compileall -q -j 0 --invalidation-mode unchecked-hash .",
+])
+
+# Callers invoke this alias; provisioned concurrency is attached to it
+LIVE_ALIAS = "live"
+
+ARCHITECTURES = {
+    "arm64": lambda_.Architecture.ARM_64,
+    "x86_64": lambda_.Architecture.X86_64,
+}
+
+
+def profile_settings(profile):
+    """lambda_.Function keyword arguments for a performance profile"""
+    return dict(
+        architecture=ARCHITECTURES[profile["architecture"]],
+        memory_size=profile["memory_mb"],
+        timeout=Duration.seconds(profile["timeout_seconds"]),
+        ephemeral_storage_size=Size.mebibytes(profile["ephemeral_storage_mb"]),
+        reserved_concurrent_executions=profile["reserved_concurrency"]
+    )
+
+
+def live_alias(scope, construct_id, function, profile):
+    """
+    The "live" alias on the function's current version, with the profile's
+    provisioned concurrency and, when it has headroom to grow into, target
+    tracking on provisioned concurrency utilization.
+    """
+    provisioned = profile["provisioned_concurrency"]
+    alias = lambda_.Alias(
+        scope, construct_id,
+        alias_name=LIVE_ALIAS,
+        version=function.current_version,
+        provisioned_concurrent_executions=provisioned or None
+    )
+    ceiling = profile["max_provisioned_concurrency"]
+    if provisioned and ceiling and ceiling > provisioned:
+        alias.add_auto_scaling(
+            min_capacity=provisioned,
+            max_capacity=ceiling
+        ).scale_on_utilization(utilization_target=profile["target_utilization"])
+    return alias
+
+
+# Account-wide OpenAI quotas for the models the generator uses; set the
+# account's real tier with -c llm_rate_limits='{"gpt-4": {"rpm": ..., "tpm": ...}}'
+DEFAULT_LLM_RATE_LIMITS = {
+    "gpt-4": {"rpm": 500, "tpm": 10000},
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+}
+
+
+def container_rate_limits(account_limits, reserved_concurrency):
+    """
+    LLM_RATE_LIMITS for one generator container. Buckets are per container,
+    so the account's quota is split across the most containers that can run
+    at once - the reserved concurrency. Approximate: an idle container's
+    share goes unused. Without reserved concurrency nothing bounds the
+    container count and every container gets the whole quota.
+    """
+    if isinstance(account_limits, str):
+        try:
+            account_limits = json.loads(account_limits)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"llm_rate_limits context is not valid JSON: {e}")
+    if not isinstance(account_limits, dict):
+        raise ValueError("llm_rate_limits must be an object keyed by model")
+    containers = reserved_concurrency or 1
+    limits = {}
+    for model, quota in account_limits.items():
+        if not isinstance(quota, dict) or not quota or set(quota) - {"rpm", "tpm"}:
+            raise ValueError(f"llm_rate_limits.{model} must be an object with rpm and/or tpm")
+        for key, value in quota.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                raise ValueError(f"llm_rate_limits.{model}.{key} must be a positive number, got {value!r}")
+        limits[model] = {key: round(value / containers, 3) for key, value in quota.items()}
+    return limits
+
+
 class LambdaStack(Stack):
     """
     Lambda functions for AI Script Generation and Sandbox Detonation
@@ -18,13 +119,49 @@ class LambdaStack(Stack):
     """
     
     def __init__(self, scope: Construct, construct_id: str,
-                 main_vpc: ec2.Vpc, sandbox_vpc: ec2.Vpc,
-                 ecs_security_group: ec2.SecurityGroup,
-                 sandbox_lambda_sg: ec2.SecurityGroup,
-                 openai_secret: secretsmanager.Secret,
-                 environment: str, project_name: str, **kwargs) -> None:
+                 environment: str, project_name: str,
+                 main_vpc: ec2.IVpc = None, sandbox_vpc: ec2.IVpc = None,
+                 ecs_security_group: ec2.ISecurityGroup = None,
+                 sandbox_lambda_sg: ec2.ISecurityGroup = None,
+                 openai_secret: secretsmanager.ISecret = None, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
         
+        # Anything not handed over (its stack is not being built) is read
+        # from the SSM parameters NetworkStack/DatabaseStack publish
+        if main_vpc is None:
+            main_vpc = shared_params.vpc(self, "MainVPC", project_name, environment, shared_params.MAIN_VPC_ID)
+        if sandbox_vpc is None:
+            sandbox_vpc = shared_params.vpc(
+                self, "SandboxVPC", project_name, environment, shared_params.SANDBOX_VPC_ID
+            )
+        if sandbox_lambda_sg is None:
+            sandbox_lambda_sg = shared_params.security_group(
+                self, "SandboxLambdaSG", project_name, environment, shared_params.SANDBOX_LAMBDA_SG_ID
+            )
+        if openai_secret is None:
+            openai_secret = shared_params.secret(
+                self, "OpenAISecret", project_name, environment, shared_params.OPENAI_SECRET_ARN
+            )
+        
+        # Memory, architecture, concurrency per function for this environment,
+        # with overrides from -c performance_profiles=... (see performance_profiles)
+        self.performance_profiles = performance_profiles.resolve(
+            environment, self.node.try_get_context("performance_profiles")
+        )
+        generator_profile = self.performance_profiles["generator"]
+        detonator_profile = self.performance_profiles["detonator"]
+        
+        # ====================================================================
+        # SHARED LAYER - scanner_common (warm secret/client cache, ...)
+        # ====================================================================
+        self.common_layer = lambda_.LayerVersion(
+            self, "ScannerCommonLayer",
+            layer_version_name=f"{project_name}-{environment}-scanner-common",
+            code=lambda_.Code.from_asset("lambda/common"),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_11],
+            description="Shared helpers for scanner Lambda functions"
+        )
+        
         # ====================================================================
         # AI SCRIPT GENERATOR LAMBDA - OpenAI Integration
         # ====================================================================
@@ -43,6 +180,41 @@ class LambdaStack(Stack):
         # Grant access to OpenAI secret
         openai_secret.grant_read(ai_role)
         
+        generator_architecture = ARCHITECTURES[generator_profile["architecture"]]
+        generator_layers = [self.common_layer]
+        
+        # Optional pruned + precompiled OpenAI SDK layer (-c slim_generator_deps=true).
+        # Bundling runs in the runtime's build image, so it needs Docker at synth time.
+        if str(self.node.try_get_context("slim_generator_deps")).lower() == "true":
+            self.generator_deps_layer = lambda_.LayerVersion(
+                self, "GeneratorDepsLayer",
+                layer_version_name=f"{project_name}-{environment}-generator-deps",
+                code=lambda_.Code.from_asset(
+                    "lambda/layers/generator_deps",
+                    bundling=BundlingOptions(
+                        image=lambda_.Runtime.PYTHON_3_11.bundling_image,
+                        platform=generator_architecture.docker_platform,
+                        command=["bash", "-c", SLIM_DEPS_COMMAND]
+                    )
+                ),
+                compatible_runtimes=[lambda_.Runtime.PYTHON_3_11],
+                compatible_architectures=[generator_architecture],
+                description="OpenAI SDK for the script generator, pruned and precompiled"
+            )
+            generator_layers.append(self.generator_deps_layer)
+        
+        # Account quota split per container (see container_rate_limits)
+        llm_rate_limits = container_rate_limits(
+            self.node.try_get_context("llm_rate_limits") or DEFAULT_LLM_RATE_LIMITS,
+            generator_profile["reserved_concurrency"]
+        )
+        if generator_profile["reserved_concurrency"] is None:
+            Annotations.of(self).add_warning_v2(
+                "LlmRateLimitUnbounded",
+                "The generator has no reserved concurrency, so LLM rate limits apply per container "
+                "and do not bound the account's total request rate"
+            )
+        
         # AI Script Generator Lambda (no VPC - needs internet for OpenAI API)
         self.ai_script_generator = lambda_.Function(
             self, "AIScriptGenerator",
@@ -50,15 +222,42 @@ class LambdaStack(Stack):
             runtime=lambda_.Runtime.PYTHON_3_11,
             handler="ai_script_generator.lambda_handler",
             code=lambda_.Code.from_asset("lambda/ai_script_generator"),
+            layers=generator_layers,
             role=ai_role,
-            timeout=Duration.minutes(5),
-            memory_size=1024,
+            **profile_settings(generator_profile),
             environment={
                 "MODEL": "gpt-4",
+                # Tried first; escalates to MODEL when its script fails validation
+                "MODEL_FAST": "gpt-4o-mini",
                 "OPENAI_SECRET_ARN": openai_secret.secret_arn,
+                "SECRET_CACHE_TTL_SECONDS": "300",
+                # In-process LRU per warm container; set to "redis" plus
+                # SCRIPT_CACHE_REDIS_URL to share across containers
+                "SCRIPT_CACHE_BACKEND": "memory",
+                "SCRIPT_CACHE_TTL_SECONDS": "3600",
+                # Near-duplicate descriptions (same paths and parameters) reuse a script
+                "SEMANTIC_CACHE": "true",
+                "SEMANTIC_CACHE_THRESHOLD": "0.85",
+                "SEMANTIC_CACHE_CAPACITY": "1000",
+                "BATCH_MAX_CONCURRENCY": "16",
+                # Client-side limits per model, this container's share of the
+                # account quota. LLM_RATE_LIMIT_BACKEND "redis" would share one
+                # bucket instead, but needs the function in the VPC next to the
+                # cluster; retries and the circuit breaker apply either way
+                "LLM_RATE_LIMITS": json.dumps(llm_rate_limits),
+                "LLM_RATE_LIMIT_BACKEND": "memory",
+                "LLM_MAX_RETRIES": "4",
+                "LLM_BREAKER_THRESHOLD": "5",
+                "STREAM_GENERATION": "true",
+                "PREFLIGHT_SCRIPTS": "true",
+                # One EMF line of per-phase timings per invocation
+                "TIMING_METRICS": "true",
                 "ENVIRONMENT": environment
             }
         )
+        self.ai_script_generator_alias = live_alias(
+            self, "AIScriptGeneratorLiveAlias", self.ai_script_generator, generator_profile
+        )
         
         # ====================================================================
         # SCRIPT DETONATOR LAMBDA - Isolated Sandbox (NO INTERNET)
@@ -78,6 +277,78 @@ class LambdaStack(Stack):
             ]
         )
         
+        detonator_env = {
+            "ENVIRONMENT": environment,
+            "MAIN_VPC_CIDR": main_vpc.vpc_cidr_block,
+            "DETONATOR_USE_ZYGOTE": "true",
+            # Per-stream head/tail kept inline in the response
+            "OUTPUT_HEAD_BYTES": "65536",
+            "OUTPUT_TAIL_BYTES": "65536",
+            # Per-child rlimits and batch parallelism
+            "SCRIPT_CPU_SECONDS": "120",
+            "SCRIPT_MAX_MEMORY_MB": "512",
+            "SCRIPT_MAX_OPEN_FILES": "256",
+            "DETONATOR_MAX_WORKERS": "8",
+            # One script against many targets: children mostly wait on the network
+            "DETONATOR_FANOUT_WORKERS": "16",
+            # Script deadlines come from the remaining invocation time minus this
+            "DETONATOR_TIME_RESERVE_MS": "3000",
+            "DETONATOR_KILL_GRACE_SECONDS": "2",
+            "DETONATOR_PREFLIGHT": "true",
+            "TIMING_METRICS": "true",
+            # Verdicts for identical script+target pairs are reused this long
+            "RESULT_CACHE_BACKEND": "memory",
+            "RESULT_CACHE_TTL_SECONDS": "900"
+        }
+        
+        # The sandbox VPC has no NAT: whatever the detonator sends to AWS goes
+        # through the endpoints NetworkStack puts there (see vpc_endpoints)
+        sandbox_endpoints = vpc_endpoints.resolve(
+            environment, self.node.try_get_context("vpc_endpoints")
+        )["sandbox"]
+        
+        # Optional bucket for full logs of truncated runs (-c detonator_log_spill=true)
+        if str(self.node.try_get_context("detonator_log_spill")).lower() == "true":
+            if "s3" not in sandbox_endpoints:
+                Annotations.of(self).add_warning_v2(
+                    "LogSpillWithoutS3Endpoint",
+                    "detonator_log_spill is on but the sandbox VPC has no s3 endpoint; uploads will time out"
+                )
+            self.detonation_logs_bucket = s3.Bucket(
+                self, "DetonationLogsBucket",
+                encryption=s3.BucketEncryption.S3_MANAGED,
+                block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+                enforce_ssl=True,
+                lifecycle_rules=[s3.LifecycleRule(expiration=Duration.days(30))],
+                removal_policy=RemovalPolicy.DESTROY if environment == "dev" else RemovalPolicy.RETAIN,
+                auto_delete_objects=environment == "dev"
+            )
+            self.detonation_logs_bucket.grant_put(sandbox_role)
+            detonator_env["LOG_SPILL_BUCKET"] = self.detonation_logs_bucket.bucket_name
+            detonator_env["LOG_SPILL_MAX_BYTES"] = str(100 * 1024 * 1024)
+        
+        # Verdicts of queued detonations go to CloudWatch Logs by default (no
+        # network needed); -c detonation_results_queue=true sends them to an
+        # SQS queue instead, which needs an SQS endpoint in the sandbox VPC.
+        detonator_env["RESULT_SINK"] = "log"
+        if str(self.node.try_get_context("detonation_results_queue")).lower() == "true":
+            if "sqs" not in sandbox_endpoints:
+                Annotations.of(self).add_warning_v2(
+                    "ResultsQueueWithoutSqsEndpoint",
+                    "detonation_results_queue is on but the sandbox VPC has no sqs endpoint; "
+                    "add it with -c vpc_endpoints='{\"<env>\": {\"sandbox\": [\"s3\", \"sqs\"]}}'"
+                )
+            self.detonation_results_queue = sqs.Queue(
+                self, "DetonationResultsQueue",
+                queue_name=f"{project_name}-{environment}-detonation-results",
+                encryption=sqs.QueueEncryption.SQS_MANAGED,
+                enforce_ssl=True,
+                retention_period=Duration.days(4)
+            )
+            self.detonation_results_queue.grant_send_messages(sandbox_role)
+            detonator_env["RESULT_SINK"] = "sqs"
+            detonator_env["RESULTS_QUEUE_URL"] = self.detonation_results_queue.queue_url
+        
         # Script Detonator Lambda - INSIDE Sandbox VPC, no internet
         self.script_detonator = lambda_.Function(
             self, "ScriptDetonator",
@@ -85,23 +356,61 @@ class LambdaStack(Stack):
             runtime=lambda_.Runtime.PYTHON_3_11,
             handler="script_detonator.lambda_handler",
             code=lambda_.Code.from_asset("lambda/script_detonator"),
+            layers=[self.common_layer],
             role=sandbox_role,
-            timeout=Duration.minutes(5),
-            memory_size=1024,
+            **profile_settings(detonator_profile),
             vpc=sandbox_vpc,
             vpc_subnets=ec2.SubnetSelection(
                 subnet_type=ec2.SubnetType.PRIVATE_ISOLATED
             ),
             security_groups=[sandbox_lambda_sg],
             allow_public_subnet=False,
-            environment={
-                "ENVIRONMENT": environment,
-                "MAIN_VPC_CIDR": main_vpc.vpc_cidr_block
-            }
+            environment=detonator_env
+        )
+        self.script_detonator_alias = live_alias(
+            self, "ScriptDetonatorLiveAlias", self.script_detonator, detonator_profile
+        )
+        
+        # ====================================================================
+        # DETONATION QUEUE - Asynchronous, batched detonations
+        # ====================================================================
+        # Callers enqueue instead of blocking on a synchronous invoke; the
+        # event source turns bursts into batches and caps the concurrency.
+        self.detonation_dlq = sqs.Queue(
+            self, "DetonationDLQ",
+            queue_name=f"{project_name}-{environment}-detonation-dlq",
+            encryption=sqs.QueueEncryption.SQS_MANAGED,
+            enforce_ssl=True,
+            retention_period=Duration.days(14)
+        )
+        self.detonation_queue = sqs.Queue(
+            self, "DetonationQueue",
+            queue_name=f"{project_name}-{environment}-detonation",
+            encryption=sqs.QueueEncryption.SQS_MANAGED,
+            enforce_ssl=True,
+            # AWS guidance for Lambda consumers: six times the function timeout
+            visibility_timeout=Duration.seconds(6 * detonator_profile["timeout_seconds"]),
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=3,
+                queue=self.detonation_dlq
+            )
         )
+        # On the alias, so queued work uses the provisioned environments too
+        self.script_detonator_alias.add_event_source(lambda_event_sources.SqsEventSource(
+            self.detonation_queue,
+            # Messages of a batch run concurrently in one invocation
+            batch_size=10,
+            max_batching_window=Duration.seconds(2),
+            report_batch_item_failures=True,
+            max_concurrency=2 if environment == "dev" else 10
+        ))
         
         # ====================================================================
         # OUTPUTS
         # ====================================================================
         CfnOutput(self, "AIScriptGeneratorARN", value=self.ai_script_generator.function_arn)
         CfnOutput(self, "ScriptDetonatorARN", value=self.script_detonator.function_arn)
+        CfnOutput(self, "AIScriptGeneratorLiveAliasARN", value=self.ai_script_generator_alias.function_arn)
+        CfnOutput(self, "ScriptDetonatorLiveAliasARN", value=self.script_detonator_alias.function_arn)
+        CfnOutput(self, "DetonationQueueURL", value=self.detonation_queue.queue_url)
+        CfnOutput(self, "DetonationDLQURL", value=self.detonation_dlq.queue_url)
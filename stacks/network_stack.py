@@ -1,10 +1,13 @@
 from aws_cdk import (
+    Annotations,
     Stack,
+    Token,
     aws_ec2 as ec2,
     Tags,
     CfnOutput
 )
 from constructs import Construct
+from stacks import shared_params, vpc_endpoints
 
 class NetworkStack(Stack):
     """
@@ -16,7 +19,7 @@ class NetworkStack(Stack):
                  environment: str, project_name: str, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
         
-        self.environment = environment
+        self.environment_name = environment  # Stack.environment is the account/region string
         self.project_name = project_name
         
         # ====================================================================
@@ -148,9 +151,90 @@ class NetworkStack(Stack):
             description="Allow outbound only to Main VPC"
         )
         
+        # ====================================================================
+        # VPC ENDPOINTS - AWS APIs without NAT (see vpc_endpoints)
+        # ====================================================================
+        self.endpoint_selection = vpc_endpoints.resolve(
+            environment, self.node.try_get_context("vpc_endpoints")
+        )
+        main_services = self.endpoint_selection["main"]
+        sandbox_services = self.endpoint_selection["sandbox"]
+        
+        self.main_endpoints_sg = None
+        if set(main_services) & set(vpc_endpoints.INTERFACES):
+            self.main_endpoints_sg = ec2.SecurityGroup(
+                self, "MainEndpointsSG",
+                vpc=self.main_vpc,
+                description="Interface VPC endpoints in the main VPC",
+                allow_all_outbound=False
+            )
+            self.main_endpoints_sg.add_ingress_rule(
+                peer=ec2.Peer.ipv4(self.main_vpc.vpc_cidr_block),
+                connection=ec2.Port.tcp(443),
+                description="HTTPS from the main VPC"
+            )
+        self.main_endpoints = vpc_endpoints.add_endpoints(
+            self, "Main", self.main_vpc, main_services,
+            ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS),
+            self.main_endpoints_sg, vpc_endpoints.main_policy
+        )
+        
+        # Sandbox endpoints answer the detonator's security group only, and
+        # the detonator reaches nothing else on 443 outside the main VPC
+        self.sandbox_endpoints_sg = None
+        if set(sandbox_services) & set(vpc_endpoints.INTERFACES):
+            self.sandbox_endpoints_sg = ec2.SecurityGroup(
+                self, "SandboxEndpointsSG",
+                vpc=self.sandbox_vpc,
+                description="Interface VPC endpoints in the sandbox VPC",
+                allow_all_outbound=False
+            )
+            self.sandbox_endpoints_sg.add_ingress_rule(
+                peer=self.sandbox_lambda_sg,
+                connection=ec2.Port.tcp(443),
+                description="HTTPS from Sandbox Lambda functions"
+            )
+            self.sandbox_lambda_sg.add_egress_rule(
+                peer=self.sandbox_endpoints_sg,
+                connection=ec2.Port.tcp(443),
+                description="AWS APIs through the sandbox interface endpoints"
+            )
+        if "s3" in sandbox_services:
+            # Gateway traffic goes to S3's public addresses; the prefix list
+            # is read at synth time (cached in cdk.context.json)
+            if Token.is_unresolved(self.account) or Token.is_unresolved(self.region):
+                Annotations.of(self).add_warning_v2(
+                    "SandboxS3PrefixList",
+                    "Sandbox S3 gateway needs an explicit account and region to look up the S3 prefix "
+                    "list; the detonator security group will not allow S3 until they are set"
+                )
+            else:
+                s3_prefix_list = ec2.PrefixList.from_lookup(
+                    self, "S3PrefixList", prefix_list_name=f"com.amazonaws.{self.region}.s3"
+                )
+                self.sandbox_lambda_sg.add_egress_rule(
+                    peer=ec2.Peer.prefix_list(s3_prefix_list.prefix_list_id),
+                    connection=ec2.Port.tcp(443),
+                    description="S3 through the sandbox gateway endpoint"
+                )
+        self.sandbox_endpoints = vpc_endpoints.add_endpoints(
+            self, "Sandbox", self.sandbox_vpc, sandbox_services,
+            ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_ISOLATED),
+            self.sandbox_endpoints_sg, vpc_endpoints.sandbox_policy
+        )
+        
         # ====================================================================
         # OUTPUTS
         # ====================================================================
         CfnOutput(self, "MainVPCId", value=self.main_vpc.vpc_id)
         CfnOutput(self, "SandboxVPCId", value=self.sandbox_vpc.vpc_id)
         CfnOutput(self, "VPCPeeringId", value=self.vpc_peering.ref)
+        
+        # For stacks synthesized without this one (-c stack_dependencies=lookup)
+        shared_params.publish(self, project_name, environment, {
+            shared_params.MAIN_VPC_ID: self.main_vpc.vpc_id,
+            shared_params.SANDBOX_VPC_ID: self.sandbox_vpc.vpc_id,
+            shared_params.ECS_TASKS_SG_ID: self.ecs_tasks_sg.security_group_id,
+            shared_params.ALB_SG_ID: self.alb_sg.security_group_id,
+            shared_params.SANDBOX_LAMBDA_SG_ID: self.sandbox_lambda_sg.security_group_id,
+        })
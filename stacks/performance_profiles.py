@@ -0,0 +1,187 @@
+"""
+Per-environment performance profiles for the scanner Lambda functions.
+
+A profile says, for each function, how much memory, CPU architecture,
+timeout and /tmp it gets, and how its concurrency is managed:
+
+    memory_mb                 128-10240 (CPU scales with memory; 1769 MB = 1 vCPU)
+    architecture              "arm64" (Graviton, ~20% cheaper per GB-s) or "x86_64"
+    timeout_seconds           1-900
+    ephemeral_storage_mb      512-10240
+    reserved_concurrency      hard cap on concurrent executions, or None
+    provisioned_concurrency   pre-initialised environments on the "live" alias
+                              (0 = none, every cold start is paid on request)
+    max_provisioned_concurrency  autoscaling ceiling for provisioned concurrency;
+                              equal to provisioned_concurrency disables scaling
+    target_utilization        provisioned concurrency utilisation to scale at
+
+Defaults live in PROFILES. Any field can be overridden per environment from
+CDK context, either in cdk.json or on the command line as JSON:
+
+    cdk synth -c performance_profiles='{"prod": {"generator": {"memory_mb": 3008}}}'
+
+Invalid profiles raise ValueError at synth time.
+"""
+
+import json
+
+FUNCTIONS = ("generator", "detonator")
+ARCHITECTURES = ("arm64", "x86_64")
+
+# Dev is sized for cost: small memory, no provisioned capacity. Prod keeps
+# warm environments on the interactive scan path and scales them with load.
+PROFILES = {
+    "dev": {
+        "generator": {
+            "memory_mb": 512,
+            "architecture": "arm64",
+            "timeout_seconds": 300,
+            "ephemeral_storage_mb": 512,
+            "reserved_concurrency": None,
+            "provisioned_concurrency": 0,
+        },
+        "detonator": {
+            "memory_mb": 1024,
+            "architecture": "arm64",
+            "timeout_seconds": 300,
+            "ephemeral_storage_mb": 512,
+            "reserved_concurrency": None,
+            "provisioned_concurrency": 0,
+        },
+    },
+    "staging": {
+        "generator": {
+            "memory_mb": 1024,
+            "architecture": "arm64",
+            "timeout_seconds": 300,
+            "ephemeral_storage_mb": 512,
+            "reserved_concurrency": 20,
+            "provisioned_concurrency": 0,
+        },
+        "detonator": {
+            "memory_mb": 1769,
+            "architecture": "arm64",
+            "timeout_seconds": 300,
+            "ephemeral_storage_mb": 1024,
+            "reserved_concurrency": 20,
+            "provisioned_concurrency": 0,
+        },
+    },
+    "prod": {
+        "generator": {
+            "memory_mb": 1024,
+            "architecture": "arm64",
+            "timeout_seconds": 300,
+            "ephemeral_storage_mb": 512,
+            "reserved_concurrency": 100,
+            "provisioned_concurrency": 2,
+            "max_provisioned_concurrency": 20,
+            "target_utilization": 0.7,
+        },
+        "detonator": {
+            # Scripts run in parallel child processes; 3538 MB = 2 vCPUs
+            "memory_mb": 3538,
+            "architecture": "arm64",
+            "timeout_seconds": 300,
+            "ephemeral_storage_mb": 2048,
+            "reserved_concurrency": 50,
+            "provisioned_concurrency": 2,
+            "max_provisioned_concurrency": 10,
+            "target_utilization": 0.7,
+        },
+    },
+}
+
+FIELD_DEFAULTS = {
+    "reserved_concurrency": None,
+    "provisioned_concurrency": 0,
+    "max_provisioned_concurrency": None,
+    "target_utilization": 0.7,
+}
+
+FIELDS = (
+    "memory_mb", "architecture", "timeout_seconds", "ephemeral_storage_mb",
+    "reserved_concurrency", "provisioned_concurrency", "max_provisioned_concurrency",
+    "target_utilization",
+)
+
+
+def _int_in_range(profile, name, field, low, high, optional=False):
+    value = profile[field]
+    if value is None and optional:
+        return
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise ValueError(f"{name}.{field} must be an integer between {low} and {high}, got {value!r}")
+
+
+def validate(name, profile):
+    """Raise ValueError unless `profile` (one function's settings) is deployable"""
+    unknown = set(profile) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"{name}: unknown performance profile fields {sorted(unknown)}")
+    missing = [field for field in FIELDS if field not in profile]
+    if missing:
+        raise ValueError(f"{name}: missing performance profile fields {missing}")
+
+    _int_in_range(profile, name, "memory_mb", 128, 10240)
+    _int_in_range(profile, name, "timeout_seconds", 1, 900)
+    _int_in_range(profile, name, "ephemeral_storage_mb", 512, 10240)
+    _int_in_range(profile, name, "reserved_concurrency", 0, 100000, optional=True)
+    _int_in_range(profile, name, "provisioned_concurrency", 0, 100000)
+    _int_in_range(profile, name, "max_provisioned_concurrency", 1, 100000, optional=True)
+    if profile["architecture"] not in ARCHITECTURES:
+        raise ValueError(f"{name}.architecture must be one of {ARCHITECTURES}, got {profile['architecture']!r}")
+
+    target = profile["target_utilization"]
+    if isinstance(target, bool) or not isinstance(target, (int, float)) or not 0.1 <= target <= 0.9:
+        raise ValueError(f"{name}.target_utilization must be between 0.1 and 0.9, got {target!r}")
+
+    provisioned = profile["provisioned_concurrency"]
+    ceiling = profile["max_provisioned_concurrency"]
+    reserved = profile["reserved_concurrency"]
+    if ceiling is not None and ceiling < provisioned:
+        raise ValueError(f"{name}.max_provisioned_concurrency ({ceiling}) is below "
+                         f"provisioned_concurrency ({provisioned})")
+    if ceiling is not None and not provisioned:
+        raise ValueError(f"{name}.max_provisioned_concurrency needs provisioned_concurrency > 0")
+    if reserved is not None and max(provisioned, ceiling or 0) > reserved:
+        raise ValueError(f"{name}: provisioned concurrency ({max(provisioned, ceiling or 0)}) cannot exceed "
+                         f"reserved_concurrency ({reserved})")
+    return profile
+
+
+def _parse_overrides(overrides):
+    if overrides is None:
+        return {}
+    if isinstance(overrides, str):
+        try:
+            overrides = json.loads(overrides)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"performance_profiles context is not valid JSON: {e}")
+    if not isinstance(overrides, dict):
+        raise ValueError("performance_profiles context must be an object keyed by environment")
+    return overrides
+
+
+def resolve(environment, overrides=None):
+    """
+    {function: profile} for `environment`: the built-in profile (dev's for an
+    unknown environment) with context overrides for that environment applied
+    field by field, validated.
+    """
+    environment_overrides = _parse_overrides(overrides).get(environment) or {}
+    if not isinstance(environment_overrides, dict):
+        raise ValueError(f"performance_profiles.{environment} must be an object keyed by function")
+    unknown = set(environment_overrides) - set(FUNCTIONS)
+    if unknown:
+        raise ValueError(f"performance_profiles.{environment}: unknown functions {sorted(unknown)}")
+
+    base = PROFILES.get(environment, PROFILES["dev"])
+    resolved = {}
+    for function in FUNCTIONS:
+        function_overrides = environment_overrides.get(function) or {}
+        if not isinstance(function_overrides, dict):
+            raise ValueError(f"performance_profiles.{environment}.{function} must be an object")
+        profile = {**FIELD_DEFAULTS, **base[function], **function_overrides}
+        resolved[function] = validate(f"{environment}.{function}", profile)
+    return resolved
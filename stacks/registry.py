@@ -0,0 +1,173 @@
+"""
+Which stacks app.py builds, in what order, and what each one needs.
+
+    cdk synth                                   # every stack
+    cdk synth -c stacks=lambda                  # lambda + network + database
+    cdk synth -c stacks=lambda -c stack_dependencies=lookup
+                                                # lambda only; upstream values from SSM
+
+Each stack lists the stacks it must have built alongside it (`requires`)
+and the ones whose values it can instead read from the SSM parameters in
+shared_params (`looks_up`). By default both kinds are built, which gives the
+dependency closure. With stack_dependencies=lookup only `requires` are built.
+Stack modules are imported when their stack is built, so an unselected
+stack costs nothing at synth.
+"""
+
+import time
+
+ORDER = ("network", "database", "redis", "ecs", "lambda", "frontend", "cicd")
+
+# stack -> (requires, looks_up)
+DEPENDENCIES = {
+    "network": ((), ()),
+    "database": ((), ("network",)),
+    "redis": (("network",), ()),
+    "ecs": (("network", "database", "redis"), ()),
+    "lambda": ((), ("network", "database")),
+    "frontend": (("ecs",), ()),
+    "cicd": ((), ()),
+}
+
+
+def parse(value):
+    """Stack names from the "stacks" context value (None/"all" = every stack)"""
+    if value is None or str(value).strip().lower() in ("", "all"):
+        return list(ORDER)
+    names = [name.strip().lower() for name in str(value).split(",") if name.strip()]
+    unknown = [name for name in names if name not in DEPENDENCIES]
+    if unknown:
+        raise ValueError(f"Unknown stacks {unknown}; choose from {', '.join(ORDER)}")
+    return names
+
+
+def select(requested, lookup=False):
+    """`requested` plus everything it depends on, in deployment order"""
+    selected = set()
+    pending = list(requested)
+    while pending:
+        name = pending.pop()
+        if name in selected:
+            continue
+        selected.add(name)
+        requires, looks_up = DEPENDENCIES[name]
+        pending.extend(requires)
+        if not lookup:
+            pending.extend(looks_up)
+    return [name for name in ORDER if name in selected]
+
+
+def _stack_id(project_name, environment, name):
+    return f"{project_name}-{environment}-{name}"
+
+
+# ============================================================================
+# BUILDERS - one per stack; `built` holds the stacks constructed so far
+# ============================================================================
+
+def _network(app, built, common):
+    from stacks.network_stack import NetworkStack
+    return NetworkStack(app, _stack_id(common["project_name"], common["environment"], "network"), **common)
+
+
+def _database(app, built, common):
+    from stacks.database_stack import DatabaseStack
+    network = built.get("network")
+    return DatabaseStack(
+        app, _stack_id(common["project_name"], common["environment"], "database"),
+        vpc=network.main_vpc if network else None,
+        ecs_security_group=network.ecs_tasks_sg if network else None,
+        **common
+    )
+
+
+def _redis(app, built, common):
+    from stacks.redis_stack import RedisStack
+    return RedisStack(
+        app, _stack_id(common["project_name"], common["environment"], "redis"),
+        vpc=built["network"].main_vpc,
+        ecs_security_group=built["network"].ecs_tasks_sg,
+        **common
+    )
+
+
+def _ecs(app, built, common):
+    from stacks.ecs_stack import EcsStack
+    return EcsStack(
+        app, _stack_id(common["project_name"], common["environment"], "ecs"),
+        vpc=built["network"].main_vpc,
+        ecs_security_group=built["network"].ecs_tasks_sg,
+        alb_security_group=built["network"].alb_sg,
+        rds_instance=built["database"].rds_instance,
+        redis_cluster=built["redis"].redis_cluster,
+        rds_secret=built["database"].rds_secret,
+        openai_secret=built["database"].openai_secret,
+        **common
+    )
+
+
+def _lambda(app, built, common):
+    from stacks.lambda_stack import LambdaStack
+    network = built.get("network")
+    database = built.get("database")
+    return LambdaStack(
+        app, _stack_id(common["project_name"], common["environment"], "lambda"),
+        main_vpc=network.main_vpc if network else None,
+        sandbox_vpc=network.sandbox_vpc if network else None,
+        ecs_security_group=network.ecs_tasks_sg if network else None,
+        sandbox_lambda_sg=network.sandbox_lambda_sg if network else None,
+        openai_secret=database.openai_secret if database else None,
+        **common
+    )
+
+
+def _frontend(app, built, common):
+    from stacks.frontend_stack import FrontendStack
+    return FrontendStack(
+        app, _stack_id(common["project_name"], common["environment"], "frontend"),
+        alb_dns=built["ecs"].alb.load_balancer_dns_name,
+        **common
+    )
+
+
+def _cicd(app, built, common):
+    from stacks.cicd_stack import CicdStack
+    return CicdStack(app, _stack_id(common["project_name"], common["environment"], "cicd"), **common)
+
+
+BUILDERS = {
+    "network": _network,
+    "database": _database,
+    "redis": _redis,
+    "ecs": _ecs,
+    "lambda": _lambda,
+    "frontend": _frontend,
+    "cicd": _cicd,
+}
+
+
+def build(app, names, env, tags, environment, project_name, timings=None):
+    """
+    Construct `names` (already in order, from select()) and wire
+    add_dependency between the ones built together. Returns {name: stack};
+    construction seconds per stack go into `timings` when given.
+    """
+    common = dict(env=env, tags=tags, environment=environment, project_name=project_name)
+    built = {}
+    for name in names:
+        started = time.perf_counter()
+        try:
+            stack = BUILDERS[name](app, built, common)
+        except ModuleNotFoundError as e:
+            if not (e.name or "").startswith("stacks."):
+                raise
+            raise ValueError(f"The {name} stack is selected but {e.name} is not in this tree; "
+                             f"pick stacks with -c stacks=...") from e
+        requires, looks_up = DEPENDENCIES[name]
+        for dependency in requires + looks_up:
+            if dependency in built:
+                stack.add_dependency(built[dependency])
+        built[name] = stack
+        if timings is not None:
+            timings[name] = time.perf_counter() - started
+    return built
@@ -0,0 +1,69 @@
+"""
+Cross-stack values published as SSM parameters, so a stack can be
+synthesized without building the stacks it depends on.
+
+Producer stacks call publish() for the values they hand to others:
+
+    /<project>/<environment>/network/main-vpc-id
+    /<project>/<environment>/network/ecs-tasks-sg-id
+    ...
+
+When app.py builds a consumer without its producer (-c stacks=lambda
+-c stack_dependencies=lookup), the consumer resolves what it was not
+handed with the helpers below instead. VPCs are read at synth time
+(context lookups cached in cdk.context.json, so they need credentials
+the first time). Everything else is a deploy-time SSM reference.
+"""
+
+from aws_cdk import (
+    aws_ec2 as ec2,
+    aws_secretsmanager as secretsmanager,
+    aws_ssm as ssm
+)
+
+# (producer, key) pairs; the producer stack publishes each of these
+MAIN_VPC_ID = ("network", "main-vpc-id")
+SANDBOX_VPC_ID = ("network", "sandbox-vpc-id")
+ECS_TASKS_SG_ID = ("network", "ecs-tasks-sg-id")
+ALB_SG_ID = ("network", "alb-sg-id")
+SANDBOX_LAMBDA_SG_ID = ("network", "sandbox-lambda-sg-id")
+OPENAI_SECRET_ARN = ("database", "openai-secret-arn")
+RDS_SECRET_ARN = ("database", "rds-secret-arn")
+RDS_ENDPOINT = ("database", "rds-endpoint")
+RDS_PROXY_ENDPOINT = ("database", "rds-proxy-endpoint")
+
+
+def parameter_name(project_name, environment, param):
+    producer, key = param
+    return f"/{project_name}/{environment}/{producer}/{key}"
+
+
+def publish(scope, project_name, environment, values):
+    """One String parameter per {(producer, key): value}"""
+    for param, value in values.items():
+        ssm.StringParameter(
+            scope, f"Param-{param[0]}-{param[1]}",
+            parameter_name=parameter_name(project_name, environment, param),
+            string_value=value
+        )
+
+
+def vpc(scope, construct_id, project_name, environment, param):
+    """Imported VPC, looked up by the id its producer published"""
+    vpc_id = ssm.StringParameter.value_from_lookup(scope, parameter_name(project_name, environment, param))
+    return ec2.Vpc.from_lookup(scope, construct_id, vpc_id=vpc_id)
+
+
+def security_group(scope, construct_id, project_name, environment, param):
+    return ec2.SecurityGroup.from_security_group_id(
+        scope, construct_id,
+        ssm.StringParameter.value_for_string_parameter(scope, parameter_name(project_name, environment, param)),
+        mutable=False
+    )
+
+
+def secret(scope, construct_id, project_name, environment, param):
+    return secretsmanager.Secret.from_secret_complete_arn(
+        scope, construct_id,
+        ssm.StringParameter.value_for_string_parameter(scope, parameter_name(project_name, environment, param))
+    )
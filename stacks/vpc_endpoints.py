@@ -0,0 +1,194 @@
+"""
+Per-environment VPC endpoints for the main and sandbox VPCs.
+
+Without endpoints, AWS API calls from the main VPC's private subnets leave
+through the NAT gateways (paying NAT data processing on every byte), and the
+sandbox VPC, which has no NAT, cannot reach AWS at all. Services:
+
+    s3, dynamodb         gateway endpoints (route table entries, free)
+    secretsmanager       interface endpoints (an ENI per AZ, billed per
+    logs                 hour and GB), reached through a security group
+    ecr                  that admits HTTPS from inside the VPC only; "ecr"
+    sqs                  is the API and the Docker registry pair, and needs
+    sts                  the s3 gateway for image layers
+
+The sandbox takes only SANDBOX_SERVICES, each behind an endpoint policy that
+allows just what the detonator does with it (S3 PutObject for log spill, SQS
+SendMessage for queued verdicts, CloudWatch Logs writes) on resources of
+this account, so a detonated script cannot use them to read secrets or
+reach other accounts. Main VPC endpoints are limited to principals and
+resources of this account.
+
+Defaults live in ENDPOINTS. Overrides replace a VPC's list per environment:
+
+    cdk synth -c vpc_endpoints='{"prod": {"sandbox": ["s3", "sqs"]}}'
+
+Invalid selections raise ValueError at synth time.
+"""
+
+import json
+
+from aws_cdk import (
+    Stack,
+    aws_ec2 as ec2,
+    aws_iam as iam
+)
+
+VPCS = ("main", "sandbox")
+
+GATEWAYS = {
+    "s3": ec2.GatewayVpcEndpointAwsService.S3,
+    "dynamodb": ec2.GatewayVpcEndpointAwsService.DYNAMODB,
+}
+
+INTERFACES = {
+    "secretsmanager": (ec2.InterfaceVpcEndpointAwsService.SECRETS_MANAGER,),
+    "logs": (ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS,),
+    "ecr": (ec2.InterfaceVpcEndpointAwsService.ECR, ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER),
+    "sqs": (ec2.InterfaceVpcEndpointAwsService.SQS,),
+    "sts": (ec2.InterfaceVpcEndpointAwsService.STS,),
+}
+
+SERVICES = tuple(GATEWAYS) + tuple(INTERFACES)
+
+# What the detonator itself talks to; actions allowed through each endpoint
+SANDBOX_SERVICES = {
+    "s3": ["s3:PutObject"],
+    "sqs": ["sqs:SendMessage", "sqs:GetQueueUrl"],
+    "logs": ["logs:CreateLogStream", "logs:PutLogEvents"],
+}
+
+# Dev takes only the free gateways. Staging and prod move the orchestrator's
+# AWS traffic off NAT; the sandbox gets S3 for log spill - add "sqs" with
+# -c detonation_results_queue=true.
+ENDPOINTS = {
+    "dev": {
+        "main": ["s3", "dynamodb"],
+        "sandbox": ["s3"],
+    },
+    "staging": {
+        "main": ["s3", "dynamodb", "secretsmanager", "logs", "ecr", "sts"],
+        "sandbox": ["s3"],
+    },
+    "prod": {
+        "main": ["s3", "dynamodb", "secretsmanager", "logs", "ecr", "sqs", "sts"],
+        "sandbox": ["s3"],
+    },
+}
+
+
+def validate(name, selection):
+    """Raise ValueError unless `selection` ({vpc: [service]}) is deployable"""
+    for vpc_name, services in selection.items():
+        if not isinstance(services, list) or not all(isinstance(s, str) for s in services):
+            raise ValueError(f"{name}.{vpc_name} must be a list of service names")
+        unknown = sorted(set(services) - set(SERVICES))
+        if unknown:
+            raise ValueError(f"{name}.{vpc_name}: unknown VPC endpoint services {unknown} "
+                             f"(choose from {', '.join(SERVICES)})")
+        if len(set(services)) != len(services):
+            raise ValueError(f"{name}.{vpc_name}: services listed twice")
+        if "ecr" in services and "s3" not in services:
+            raise ValueError(f"{name}.{vpc_name}: ecr needs the s3 gateway (image layers are served from S3)")
+    not_allowed = sorted(set(selection.get("sandbox", [])) - set(SANDBOX_SERVICES))
+    if not_allowed:
+        raise ValueError(f"{name}.sandbox: {not_allowed} would give detonated scripts a way out of the "
+                         f"sandbox (allowed: {', '.join(SANDBOX_SERVICES)})")
+    return selection
+
+
+def _parse_overrides(overrides):
+    if overrides is None:
+        return {}
+    if isinstance(overrides, str):
+        try:
+            overrides = json.loads(overrides)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"vpc_endpoints context is not valid JSON: {e}")
+    if not isinstance(overrides, dict):
+        raise ValueError("vpc_endpoints context must be an object keyed by environment")
+    return overrides
+
+
+def resolve(environment, overrides=None):
+    """
+    {vpc: [service]} for `environment`: the built-in selection (dev's for an
+    unknown environment) with a VPC's list replaced where the context has
+    one, validated.
+    """
+    environment_overrides = _parse_overrides(overrides).get(environment) or {}
+    if not isinstance(environment_overrides, dict):
+        raise ValueError(f"vpc_endpoints.{environment} must be an object keyed by VPC")
+    unknown = set(environment_overrides) - set(VPCS)
+    if unknown:
+        raise ValueError(f"vpc_endpoints.{environment}: unknown VPCs {sorted(unknown)}")
+
+    base = ENDPOINTS.get(environment, ENDPOINTS["dev"])
+    selection = {vpc_name: environment_overrides.get(vpc_name, list(base[vpc_name])) for vpc_name in VPCS}
+    return validate(f"vpc_endpoints.{environment}", selection)
+
+
+def _same_account(scope):
+    account = Stack.of(scope).account
+    return {"StringEquals": {"aws:PrincipalAccount": account, "aws:ResourceAccount": account}}
+
+
+def main_policy(scope, service):
+    """Anything, as long as both caller and resource belong to this account"""
+    statements = [iam.PolicyStatement(
+        principals=[iam.AnyPrincipal()],
+        actions=["*"],
+        resources=["*"],
+        conditions=_same_account(scope)
+    )]
+    if service == "s3":
+        # ECR image layers live in an AWS-owned bucket
+        statements.append(iam.PolicyStatement(
+            principals=[iam.AnyPrincipal()],
+            actions=["s3:GetObject"],
+            resources=[f"arn:aws:s3:::prod-{Stack.of(scope).region}-starport-layer-bucket/*"]
+        ))
+    return statements
+
+
+def sandbox_policy(scope, service):
+    """Only the detonator's own calls, only on this account's resources"""
+    return [iam.PolicyStatement(
+        principals=[iam.AnyPrincipal()],
+        actions=SANDBOX_SERVICES[service],
+        resources=["*"],
+        conditions=_same_account(scope)
+    )]
+
+
+def add_endpoints(scope, id_prefix, vpc, services, subnets, security_group, policy):
+    """
+    Endpoints for `services` in `vpc`: gateways on the route tables of
+    `subnets`, interfaces in `subnets` behind `security_group`, each with
+    the statements policy(scope, service) returns. Returns {service: [endpoint]}.
+    """
+    endpoints = {}
+    for service in services:
+        if service in GATEWAYS:
+            created = [vpc.add_gateway_endpoint(
+                f"{id_prefix}{service.capitalize()}Gateway",
+                service=GATEWAYS[service],
+                subnets=[subnets]
+            )]
+        else:
+            created = [
+                vpc.add_interface_endpoint(
+                    f"{id_prefix}{aws_service.short_name.replace('.', '-').title().replace('-', '')}Endpoint",
+                    service=aws_service,
+                    subnets=subnets,
+                    security_groups=[security_group],
+                    private_dns_enabled=True,
+                    open=False
+                )
+                for aws_service in INTERFACES[service]
+            ]
+        for endpoint in created:
+            for statement in policy(scope, service):
+                endpoint.add_to_policy(statement)
+        endpoints[service] = created
+    return endpoints
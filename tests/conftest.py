@@ -0,0 +1,149 @@
+"""
+Shared fixtures. Stacks are synthesized from the repository root, since the
+Lambda assets are relative paths; each (environment, context) pair is built
+once per session.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+os.environ.setdefault("JSII_SILENCE_WARNING_DEPRECATED_NODE_VERSION", "1")
+
+ACCOUNT = "123456789012"
+REGION = "us-east-1"
+PROJECT = "scanner"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def repo_root():
+    previous = os.getcwd()
+    os.chdir(REPO_ROOT)
+    yield REPO_ROOT
+    os.chdir(previous)
+
+
+@pytest.fixture(scope="session")
+def synth(repo_root):
+    """synth(environment, **context) -> {stack name: Stack} for lambda and what it needs"""
+    import aws_cdk as cdk
+    from stacks import registry
+
+    built = {}
+
+    def _synth(environment, **context):
+        key = (environment, json.dumps(context, sort_keys=True))
+        if key not in built:
+            app = cdk.App(context=context)
+            built[key] = registry.build(
+                app, registry.select(["lambda"]), cdk.Environment(account=ACCOUNT, region=REGION),
+                {}, environment, PROJECT
+            )
+        return built[key]
+
+    return _synth
+
+
+@pytest.fixture(scope="session")
+def stub_llm():
+    """pipeline.stub_openai for the whole session (the generator's OpenAI client is cached per process)"""
+    from pipeline.stub_openai import StubOpenAI
+
+    with StubOpenAI() as stub:
+        yield stub
+
+
+GENERATOR_ENV = {
+    "OPENAI_API_KEY": "stub",
+    "MODEL": "gpt-4",
+    "MODEL_FAST": "",
+    "SCRIPT_CACHE_BACKEND": "memory",
+    "SEMANTIC_CACHE": "false",
+    "PREFLIGHT_SCRIPTS": "true",
+    "STREAM_GENERATION": "false",
+    "TIMING_METRICS": "false",
+    "LLM_RATE_LIMIT_BACKEND": "none",
+    "BATCH_TIME_RESERVE_MS": "0",
+}
+
+
+@pytest.fixture
+def generator(stub_llm, monkeypatch):
+    """
+    The generator's lambda_handler, offline against stub_llm, with empty
+    caches and a single tier (set MODEL_FAST to test routing). Tests change
+    stub_llm.behaviors / latency_ms; both are reset afterwards.
+    """
+    from pipeline import invokers
+
+    monkeypatch.delenv("OPENAI_SECRET_ARN", raising=False)
+    for name, value in GENERATOR_ENV.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv("OPENAI_BASE_URL", stub_llm.base_url)
+    handler = invokers.load_handler("generator")
+
+    import script_cache
+    import semantic_cache
+    from scanner_common import rate_limit
+    script_cache._backend, script_cache._backend_loaded = None, False
+    semantic_cache._indexes.clear()
+    rate_limit._limiter = None
+    stub_llm.behaviors.clear()
+    stub_llm.default_behavior = "good"
+    stub_llm.latency_ms = 0
+    yield handler
+    stub_llm.behaviors.clear()
+    stub_llm.default_behavior = "good"
+    stub_llm.latency_ms = 0
+    rate_limit._limiter = None
+
+
+def invoke(handler, event, timeout_ms=300000):
+    """(status code, parsed body) of one in-process invocation"""
+    from pipeline.invokers import LocalContext
+
+    response = handler(event, LocalContext("test", timeout_ms))
+    body = response["body"]
+    return response["statusCode"], json.loads(body) if isinstance(body, str) else body
+
+
+DETONATOR_ENV = {
+    "RESULT_CACHE_BACKEND": "none",
+    "DETONATOR_USE_ZYGOTE": "true",
+    "DETONATOR_PREFLIGHT": "true",
+    "TIMING_METRICS": "false",
+}
+
+
+@pytest.fixture
+def detonator(monkeypatch):
+    """The detonator's lambda_handler in-process (zygote on, result cache off, no log spill)"""
+    from pipeline import invokers
+
+    for name, value in DETONATOR_ENV.items():
+        monkeypatch.setenv(name, value)
+    for name in ("LOG_SPILL_BUCKET", "LOG_SPILL_DIR", "DETONATOR_TIME_RESERVE_MS"):
+        monkeypatch.delenv(name, raising=False)
+    handler = invokers.load_handler("detonator")
+    import result_cache
+    result_cache._backend, result_cache._backend_loaded = None, False
+    return handler
+
+
+class FakeContext:
+    """Lambda context with a fixed remaining time"""
+
+    function_name = "test"
+    aws_request_id = "test-request"
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
@@ -0,0 +1,85 @@
+"""Batch mode of the detonator (lambda/script_detonator/batch_detonation.py)"""
+
+import pytest
+
+from tests.conftest import invoke
+
+TARGET = "http://127.0.0.1:9/"
+QUICK = "import sys\nprint('done')\nsys.exit(1)\n"
+
+
+def batch(detonator, scripts, **extra):
+    event = {"scan_id": "batch", "scripts": [dict({"target_url": TARGET}, **s) for s in scripts]}
+    event.update(extra)
+    return invoke(detonator, event)
+
+
+def by_id(body):
+    return {r["id"]: r for r in body["results"]}
+
+
+@pytest.mark.parametrize("max_workers", ["many", 0, -2, 1.5, True, [2]])
+def test_bad_max_workers_is_a_400(detonator, max_workers):
+    status, body = batch(detonator, [{"script": QUICK}], max_workers=max_workers)
+    assert status == 400
+    assert "max_workers" in body["error"]
+
+
+def test_max_workers_is_clamped_to_the_cap(detonator, monkeypatch):
+    monkeypatch.setenv("DETONATOR_MAX_WORKERS", "2")
+    status, body = batch(detonator, [{"script": QUICK}] * 3, max_workers=500)
+    assert status == 200
+    assert body["summary"]["workers"] <= 2
+    status, body = batch(detonator, [{"script": QUICK}] * 3, max_workers="1")
+    assert body["summary"]["workers"] == 1
+
+
+def test_one_item_timing_out_does_not_sink_the_others(detonator):
+    status, body = batch(detonator, [
+        {"id": "slow", "script": "import time\ntime.sleep(30)\n", "timeout": 1},
+        {"id": "a", "script": QUICK},
+        {"id": "b", "script": "import sys\nsys.exit(0)\n"},
+    ], max_workers=3)
+    assert status == 200
+    results = by_id(body)
+    assert results["slow"]["status"] == "timeout"
+    assert results["slow"]["error"] == "Script execution timeout"
+    assert results["a"]["status"] == "ok" and results["a"]["exit_code"] == 1
+    assert results["b"]["status"] == "ok" and results["b"]["vulnerable"] is True
+    assert body["summary"]["timed_out"] == 1 and body["summary"]["completed"] == 2
+
+
+def test_memory_rlimit_applies_per_child(detonator, monkeypatch):
+    monkeypatch.setenv("SCRIPT_MAX_MEMORY_MB", "256")
+    status, body = batch(detonator, [
+        {"id": "hog", "script": "import sys\nblock = bytearray(1024 ** 3)\nsys.exit(0)\n"},
+        {"id": "fine", "script": "import sys\nblock = bytearray(16 * 1024 ** 2)\nsys.exit(0)\n"},
+    ])
+    results = by_id(body)
+    assert results["hog"]["exit_code"] != 0
+    assert "MemoryError" in results["hog"]["stderr"]
+    assert results["fine"]["exit_code"] == 0
+
+
+def test_cpu_rlimit_applies_per_child(detonator, monkeypatch):
+    monkeypatch.setenv("SCRIPT_CPU_SECONDS", "1")
+    status, body = batch(detonator, [
+        {"id": "spin", "script": "while True:\n    pass\n", "timeout": 30},
+        {"id": "fine", "script": QUICK},
+    ])
+    results = by_id(body)
+    # Killed by SIGXCPU after ~1s of CPU, long before its 30s timeout
+    assert results["spin"]["status"] != "timeout"
+    assert results["spin"]["exit_code"] not in (0, 1)
+    assert results["spin"]["elapsed_ms"] < 10000
+    assert results["fine"]["status"] == "ok"
+
+
+def test_fan_out_runs_each_host_once(detonator):
+    status, body = invoke(detonator, {
+        "scan_id": "fan", "script": "import os, sys\nprint(os.environ['TARGET_URL'])\nsys.exit(1)\n",
+        "target_urls": ["http://10.0.0.1/", "HTTP://10.0.0.1", "http://10.0.0.2/"],
+    })
+    assert status == 200
+    assert sorted(body["verdicts"]) == ["http://10.0.0.1/", "http://10.0.0.2/"]
+    assert sorted(r["stdout"].strip() for r in body["results"]) == ["http://10.0.0.1/", "http://10.0.0.2/"]
@@ -0,0 +1,81 @@
+"""Batch mode of the generator (lambda/ai_script_generator/batch_generation.py) against pipeline.stub_openai"""
+
+from tests.conftest import invoke
+
+VULNERABILITY = "SQL injection in /item id parameter"
+
+
+def finding(i, vulnerability=VULNERABILITY, host=None):
+    return {"id": f"f-{i}", "vulnerability": vulnerability, "target_url": host or f"http://10.0.0.{i}/"}
+
+
+def test_every_finding_gets_a_result(generator, stub_llm):
+    status, body = invoke(generator, {"findings": [finding(1), finding(2, "Reflected XSS in search parameter q")]})
+    assert status == 200
+    assert [r["status"] for r in body["results"]] == ["ok", "ok"]
+    assert [r["id"] for r in body["results"]] == ["f-1", "f-2"]
+    assert all(r["target_agnostic"] for r in body["results"])
+    assert body["summary"]["succeeded"] == 2 and not body["partial"]
+
+
+def test_malformed_findings_are_per_item_errors(generator):
+    status, body = invoke(generator, {"findings": ["bad", finding(1), 42, None, {"id": "x"}]})
+    assert status == 200
+    results = body["results"]
+    assert [r["status"] for r in results] == ["error", "ok", "error", "error", "error"]
+    assert results[0] == {"index": 0, "id": 0, "status": "error", "error": "Finding must be a JSON object"}
+    assert results[4]["error"] == "Missing vulnerability description"
+    assert body["summary"]["failed"] == 4
+
+
+def test_only_malformed_findings(generator):
+    status, body = invoke(generator, {"findings": ["bad"]})
+    assert status == 200
+    assert body["results"][0]["status"] == "error"
+
+
+def test_findings_must_be_a_non_empty_list(generator):
+    assert invoke(generator, {"findings": []})[0] == 400
+
+
+def test_identical_findings_share_one_llm_request(generator, stub_llm):
+    before = stub_llm.stats()["requests"]
+    findings = [finding(i) for i in range(6)]
+    status, body = invoke(generator, {"findings": findings, "max_concurrency": 4})
+    assert status == 200
+    assert stub_llm.stats()["requests"] - before == 1
+    results = body["results"]
+    assert all(r["status"] == "ok" for r in results)
+    assert len({r["script"] for r in results}) == 1
+    assert body["summary"]["coalesced"] == 5
+    assert sum(1 for r in results if not r["coalesced"]) == 1
+
+
+def test_pinned_script_is_not_shared_across_hosts(generator, stub_llm):
+    stub_llm.default_behavior = "hardcoded"
+    before = stub_llm.stats()["requests"]
+    status, body = invoke(generator, {"findings": [finding(1), finding(2)], "max_concurrency": 2})
+    assert stub_llm.stats()["requests"] - before == 2
+    assert body["summary"]["coalesced"] == 0
+    assert not any(r["target_agnostic"] for r in body["results"])
+
+
+def test_findings_past_the_time_budget_are_skipped(generator, stub_llm):
+    invoke(generator, {"findings": [finding(0, "Warm the client up")]})
+    stub_llm.latency_ms = 400
+    findings = [finding(i, f"{VULNERABILITY} variant {i}") for i in range(3)]
+    status, body = invoke(generator, {"findings": findings, "max_concurrency": 1}, timeout_ms=700)
+    assert status == 200
+    statuses = [r["status"] for r in body["results"]]
+    assert statuses[0] == "ok"
+    assert statuses[1:] == ["skipped", "skipped"]
+    assert body["results"][1]["error"] == "Time budget exhausted"
+    assert body["partial"] and body["summary"]["skipped"] == 2
+
+
+def test_cache_hits_need_no_llm_request(generator, stub_llm):
+    invoke(generator, {"findings": [finding(1)]})
+    before = stub_llm.stats()["requests"]
+    status, body = invoke(generator, {"findings": [finding(2, host="http://other/")]})
+    assert stub_llm.stats()["requests"] == before
+    assert body["results"][0]["cache_hit"] and body["results"][0]["cache_type"] == "exact"
@@ -0,0 +1,146 @@
+"""Speculative candidates: generation (index.py, router.route_candidates) and racing (race_detonation.py)"""
+
+import pytest
+
+from tests.conftest import invoke
+
+FINDING = {"vulnerability": "SQL injection in /item id parameter", "target_url": "http://10.0.0.1/"}
+
+VALID = "import sys\nprint('probed')\nsys.exit(1)\n"
+NO_EXIT = "print('probed')\n"
+
+
+# ---------------------------------------------------------------- generator
+
+@pytest.mark.parametrize("candidates", ["abc", 0, -1, 5, 2.5, True, [2], {"n": 2}])
+def test_bad_candidate_count_is_a_400(generator, candidates):
+    status, body = invoke(generator, dict(FINDING, candidates=candidates))
+    assert status == 400
+    assert "candidates" in body["error"]
+
+
+@pytest.mark.parametrize("candidates, expected", [("3", 3), (2.0, 2), (4, 4), (None, 1)])
+def test_candidate_count_accepts_whole_numbers(generator, candidates, expected):
+    candidate_count = generator.__globals__["candidate_count"]
+    assert candidate_count({"candidates": candidates}) == expected
+
+
+def test_candidates_come_back_as_alternatives(generator, stub_llm):
+    status, body = invoke(generator, dict(FINDING, candidates=3))
+    assert status == 200
+    assert body["candidates_requested"] == 3
+    assert [c["index"] for c in body["scripts"]] == [0, 1, 2]
+    assert len({c["script"] for c in body["scripts"]}) == 3
+    assert body["candidates_valid"] == 3
+
+
+def test_speculative_mode_skips_the_script_cache(generator, stub_llm):
+    assert invoke(generator, dict(FINDING))[1]["cache_hit"] is False
+    assert invoke(generator, dict(FINDING))[1]["cache_hit"] is True
+    before = stub_llm.stats()["requests"]
+    status, body = invoke(generator, dict(FINDING, candidates=2))
+    assert status == 200
+    assert body["cache_hit"] is False
+    assert body["candidates_requested"] == 2 and len(body["scripts"]) == 2
+    assert stub_llm.stats()["requests"] == before + 1
+
+
+# ---------------------------------------------------------------- router.route_candidates
+
+@pytest.fixture
+def router(generator, monkeypatch):
+    monkeypatch.setenv("MODEL_FAST", "fast-model")
+    monkeypatch.setenv("MODEL", "large-model")
+    import router
+    return router
+
+
+def scripted(by_model):
+    calls = []
+
+    def generate_many(model):
+        calls.append(model)
+        return list(by_model[model]), {"mode": "candidates"}
+    return generate_many, calls
+
+
+def test_fast_tier_with_a_valid_candidate_is_kept(router):
+    generate_many, calls = scripted({"fast-model": [NO_EXIT, VALID], "large-model": [VALID]})
+    candidates, routing = router.route_candidates(generate_many, FINDING["vulnerability"])
+    assert calls == ["fast-model"]
+    assert [c["valid"] for c in candidates] == [False, True]
+    assert routing["tier"] == "fast" and not routing["escalated"]
+    assert routing["attempts"][0]["valid"] == 1
+
+
+def test_no_valid_fast_candidate_escalates(router):
+    generate_many, calls = scripted({"fast-model": [NO_EXIT, NO_EXIT], "large-model": [VALID, NO_EXIT]})
+    candidates, routing = router.route_candidates(generate_many, FINDING["vulnerability"])
+    assert calls == ["fast-model", "large-model"]
+    assert routing["tier"] == "large" and routing["escalated"]
+    assert routing["escalation_reason"] == "no_valid_candidate"
+    assert [c["valid"] for c in candidates] == [True, False]
+
+
+def test_pinned_candidates_are_not_valid(router):
+    pinned = "import sys\nTARGET = 'http://10.0.0.1/'\nsys.exit(1)\n"
+    generate_many, calls = scripted({"fast-model": [pinned], "large-model": [VALID]})
+    candidates, routing = router.route_candidates(generate_many, "x", targets=["http://10.0.0.1/"])
+    assert calls == ["fast-model", "large-model"]
+    assert candidates[0]["script"] == VALID
+
+
+def test_hard_category_candidates_skip_the_fast_tier(router):
+    generate_many, calls = scripted({"fast-model": [VALID], "large-model": [VALID]})
+    _, routing = router.route_candidates(generate_many, "Insecure deserialization", category="deserialization")
+    assert calls == ["large-model"]
+    assert routing["escalation_reason"] == "hard_category"
+
+
+# ---------------------------------------------------------------- race_detonation
+
+WINS = "import sys\nprint('vulnerable')\nsys.exit(0)\n"
+SLOW = "import sys, time\ntime.sleep(20)\nsys.exit(1)\n"
+CRASHES = "raise RuntimeError('boom')\n"
+
+
+def race(detonator, candidates, **extra):
+    event = {"scan_id": "race", "target_url": "http://127.0.0.1:9/", "candidates": candidates}
+    event.update(extra)
+    return invoke(detonator, event)
+
+
+def test_first_conclusive_candidate_wins_and_the_rest_are_killed(detonator):
+    status, body = race(detonator, [SLOW, WINS, SLOW])
+    assert status == 200
+    assert body["vulnerable"] is True
+    assert body["race"]["winner_index"] == 1
+    assert body["race"]["cancelled_running"] + body["race"]["cancelled_before_start"] == 2
+    assert body["race"]["elapsed_ms"] < 10000
+
+
+def test_uncaught_exception_is_not_conclusive(detonator):
+    status, body = race(detonator, [CRASHES, "import sys\nsys.exit(1)\n"])
+    assert status == 200
+    assert body["race"]["winner_index"] == 1
+    assert body["vulnerable"] is False
+    crashed = next(r for r in body["results"] if r["index"] == 0)
+    assert crashed["conclusive"] is False
+
+
+def test_no_conclusive_candidate(detonator):
+    status, body = race(detonator, [CRASHES, "import sys\nprint('no verdict')\nsys.exit(3)\n"])
+    assert status == 200
+    assert body["winner"] is None
+    assert body["error"] == "No candidate produced a conclusive verdict"
+
+
+def test_dict_candidates_are_accepted(detonator):
+    status, body = race(detonator, [{"script": WINS, "id": "a"}])
+    assert body["race"]["winner_id"] == "a"
+
+
+@pytest.mark.parametrize("candidates, extra", [([], {}), ([WINS] * 9, {}), ([WINS], {"timeout": "soon"})])
+def test_bad_race_requests_are_400s(detonator, candidates, extra):
+    status, _ = race(detonator, candidates, **extra)
+    assert status == 400
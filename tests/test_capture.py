@@ -0,0 +1,87 @@
+"""Spill files in lambda/script_detonator/capture.py"""
+
+import gzip
+import os
+import sys
+
+import pytest
+
+from tests.conftest import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "lambda", "script_detonator"))
+
+import capture  # noqa: E402
+
+
+@pytest.fixture
+def spill_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv("LOG_SPILL_BUCKET", raising=False)
+    monkeypatch.setenv("LOG_SPILL_DIR", str(tmp_path / "spill"))
+    return tmp_path / "spill"
+
+
+def spilled_file(tmp_path, data, **limits):
+    path = str(tmp_path / "stdout.log.gz")
+    stream = capture.BoundedStream("stdout", head_bytes=8, tail_bytes=8, spill_path=path, **limits)
+    stream.write(data)
+    return stream, stream.close()
+
+
+@pytest.mark.parametrize("scan_id", ["scan-2026_10", "abc123"])
+def test_safe_scan_id_is_kept(scan_id):
+    assert capture.spill_prefix(scan_id) == scan_id
+
+
+@pytest.mark.parametrize("scan_id", ["../../etc", "a/b", "..", "", "scan 1", "x" * 100, 42])
+def test_unsafe_scan_id_becomes_one_segment(scan_id):
+    prefix = capture.spill_prefix(scan_id)
+    assert prefix and len(prefix) <= 64
+    assert all(c.isalnum() or c in "_-" for c in prefix)
+
+
+def test_cleaned_ids_do_not_collide():
+    assert capture.spill_prefix("a/b") != capture.spill_prefix("a?b")
+
+
+def test_publish_spill_stays_inside_the_spill_dir(tmp_path, spill_dir):
+    stream, path = spilled_file(tmp_path, b"x" * 100)
+    destination = capture.publish_spill(path, "../../outside", "stdout")
+    assert os.path.realpath(destination).startswith(os.path.realpath(spill_dir) + os.sep)
+    assert not os.path.exists(path)
+    assert not (tmp_path / "outside").exists()
+
+
+def test_spill_stops_at_the_byte_limit_with_a_marker(tmp_path):
+    path = str(tmp_path / "stdout.log.gz")
+    stream = capture.BoundedStream("stdout", head_bytes=8, tail_bytes=8, spill_path=path, spill_max_bytes=40)
+    stream.write(b"a" * 30)
+    stream.write(b"a" * 10 + b"b" * 20)
+    stream.write(b"b" * 40)
+    assert stream.close() == path
+    assert stream.spill_truncated
+    assert stream.total_bytes == 100
+    with gzip.open(path, "rb") as f:
+        content = f.read()
+    assert content == b"a" * 40 + capture.SPILL_TRUNCATION_MARKER % 40
+
+
+def test_spill_under_the_limit_is_complete(tmp_path):
+    path = str(tmp_path / "stdout.log.gz")
+    stream = capture.BoundedStream("stdout", head_bytes=8, tail_bytes=8, spill_path=path, spill_max_bytes=1000)
+    for _ in range(10):
+        stream.write(b"0123456789")
+    assert stream.close() == path
+    assert not stream.spill_truncated
+    with gzip.open(path, "rb") as f:
+        assert f.read() == b"0123456789" * 10
+
+
+def test_spill_limit_from_env(monkeypatch, spill_dir):
+    monkeypatch.setenv("LOG_SPILL_MAX_BYTES", "16")
+    stdout, stderr = capture.open_streams(limits=(4, 4))
+    stdout.write(b"z" * 32)
+    assert stdout.spill_max_bytes == 16 and stdout.spill_truncated
+    for stream in (stdout, stderr):
+        path = stream.close()
+        if path:
+            os.unlink(path)
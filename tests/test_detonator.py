@@ -0,0 +1,64 @@
+"""Single-script mode of the detonator (lambda/script_detonator/index.py)"""
+
+import json
+import time
+
+import pytest
+
+from tests.conftest import FakeContext, invoke
+
+TARGET = "http://127.0.0.1:9/"
+EXIT_1 = "import sys\nprint('probed')\nsys.exit(1)\n"
+SLEEPER = "import time\ntime.sleep(30)\n"
+
+
+def test_script_runs(detonator):
+    status, body = invoke(detonator, {"script": EXIT_1, "target_url": TARGET, "timeout": 10})
+    assert status == 200
+    assert body["exit_code"] == 1 and not body["vulnerable"]
+    assert body["stdout"] == "probed\n"
+
+
+@pytest.mark.parametrize("timeout", ["abc", 0, -1, "0", [1], {"s": 1}, True, float("nan")])
+def test_bad_timeout_is_a_400(detonator, timeout):
+    status, body = invoke(detonator, {"script": EXIT_1, "target_url": TARGET, "timeout": timeout})
+    assert status == 400
+    assert "timeout" in body["error"]
+
+
+@pytest.mark.parametrize("timeout", [None, "5", 5, 2.5])
+def test_good_timeouts_are_accepted(detonator, timeout):
+    event = {"script": EXIT_1, "target_url": TARGET}
+    if timeout is not None:
+        event["timeout"] = timeout
+    assert invoke(detonator, event)[0] == 200
+
+
+def test_timeout_kills_the_script(detonator):
+    started = time.monotonic()
+    status, body = invoke(detonator, {"script": SLEEPER, "target_url": TARGET, "timeout": 0.5})
+    assert status == 408
+    assert body["timed_out"]
+    assert time.monotonic() - started < 5
+
+
+def test_deadline_is_the_remaining_time_minus_the_reserve(detonator, monkeypatch):
+    monkeypatch.setenv("DETONATOR_TIME_RESERVE_MS", "3000")
+    response = detonator({"script": SLEEPER, "target_url": TARGET, "timeout": 60}, FakeContext(3800))
+    assert response["statusCode"] == 408
+    body = json.loads(response["body"])
+    # 3.8s left, 3s kept back: the script gets about 0.8s, not the 60s it asked for
+    assert 600 <= body["elapsed_ms"] < 3000
+
+
+@pytest.mark.parametrize("remaining_ms, requested, expected", [
+    (60000, 10, 10.0),      # plenty of time: what was asked for
+    (10000, 60, 7.0),       # clamped to remaining minus the 3s reserve
+    (2000, 60, 0.0),        # less left than the reserve
+    (600000, 1000, 240.0),  # never past MAX_SCRIPT_SECONDS
+    (None, 30, 30.0),       # no context (local runs)
+])
+def test_time_budget(detonator, remaining_ms, requested, expected):
+    import execution
+    context = None if remaining_ms is None else FakeContext(remaining_ms)
+    assert execution.time_budget(context, requested, reserve_ms=3000) == pytest.approx(expected)
@@ -0,0 +1,153 @@
+"""Synth-time checks of the Lambda functions against stacks/performance_profiles.py"""
+
+import json
+
+import pytest
+from aws_cdk.assertions import Annotations, Match, Template
+
+from stacks import lambda_stack, performance_profiles
+from tests.conftest import PROJECT
+
+FUNCTION_NAMES = {
+    "generator": "ai-script-generator",
+    "detonator": "script-detonator",
+}
+
+
+def lambda_template(synth, environment, **context):
+    return Template.from_stack(synth(environment, **context)["lambda"])
+
+
+def scanner_functions(template):
+    return {
+        logical_id: resource for logical_id, resource in template.find_resources("AWS::Lambda::Function").items()
+        if resource["Properties"].get("FunctionName", "").startswith(f"{PROJECT}-")
+    }
+
+
+def test_dev_has_no_provisioned_concurrency(synth):
+    template = lambda_template(synth, "dev")
+    template.resource_count_is("AWS::Lambda::Alias", 2)
+    template.all_resources_properties("AWS::Lambda::Alias", {
+        "Name": "live",
+        "ProvisionedConcurrencyConfig": Match.absent(),
+    })
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 0)
+
+
+def test_prod_live_alias_is_provisioned_and_autoscaled(synth):
+    template = lambda_template(synth, "prod")
+    profiles = performance_profiles.PROFILES["prod"]
+    for function in performance_profiles.FUNCTIONS:
+        template.has_resource_properties("AWS::Lambda::Alias", {
+            "Name": "live",
+            "FunctionName": {"Ref": Match.string_like_regexp(
+                "AIScriptGenerator" if function == "generator" else "ScriptDetonator"
+            )},
+            "ProvisionedConcurrencyConfig": {
+                "ProvisionedConcurrentExecutions": profiles[function]["provisioned_concurrency"],
+            },
+        })
+        template.has_resource_properties("AWS::ApplicationAutoScaling::ScalableTarget", {
+            "ScalableDimension": "lambda:function:ProvisionedConcurrency",
+            "MinCapacity": profiles[function]["provisioned_concurrency"],
+            "MaxCapacity": profiles[function]["max_provisioned_concurrency"],
+        })
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 2)
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalingPolicy", {
+        "TargetTrackingScalingPolicyConfiguration": Match.object_like({
+            "TargetValue": profiles["generator"]["target_utilization"],
+        }),
+    })
+
+
+@pytest.mark.parametrize("environment", ["dev", "staging", "prod"])
+def test_functions_run_on_arm64(synth, environment):
+    functions = scanner_functions(lambda_template(synth, environment))
+    assert len(functions) == 2
+    for resource in functions.values():
+        assert resource["Properties"]["Architectures"] == ["arm64"]
+
+
+@pytest.mark.parametrize("environment", ["dev", "staging", "prod"])
+@pytest.mark.parametrize("function", performance_profiles.FUNCTIONS)
+def test_memory_and_reserved_concurrency_follow_the_profile(synth, environment, function):
+    profile = performance_profiles.PROFILES[environment][function]
+    reserved = profile["reserved_concurrency"]
+    lambda_template(synth, environment).has_resource_properties("AWS::Lambda::Function", {
+        "FunctionName": f"{PROJECT}-{environment}-{FUNCTION_NAMES[function]}",
+        "MemorySize": profile["memory_mb"],
+        "Timeout": profile["timeout_seconds"],
+        "EphemeralStorage": {"Size": profile["ephemeral_storage_mb"]},
+        "ReservedConcurrentExecutions": Match.absent() if reserved is None else reserved,
+    })
+
+
+def test_context_override_is_applied(synth):
+    overrides = {"prod": {"generator": {"memory_mb": 3008}}}
+    lambda_template(synth, "prod", performance_profiles=json.dumps(overrides)).has_resource_properties(
+        "AWS::Lambda::Function", {"FunctionName": f"{PROJECT}-prod-ai-script-generator", "MemorySize": 3008}
+    )
+
+
+@pytest.mark.parametrize("overrides", [
+    {"prod": {"generator": {"memory_mb": 64}}},
+    {"prod": {"detonator": {"architecture": "sparc"}}},
+    {"prod": {"generator": {"provisioned_concurrency": 200}}},
+    {"prod": {"generator": {"memroy_mb": 1024}}},
+    {"prod": {"orchestrator": {}}},
+])
+def test_invalid_profile_override_fails_synth(synth, overrides):
+    with pytest.raises(ValueError):
+        synth("prod", performance_profiles=json.dumps(overrides))
+
+
+def test_unparseable_profile_override_fails_synth(synth):
+    with pytest.raises(ValueError, match="not valid JSON"):
+        synth("prod", performance_profiles="{memory_mb: 64")
+
+
+def generator_environment(synth, environment, **context):
+    functions = lambda_template(synth, environment, **context).find_resources("AWS::Lambda::Function", {
+        "Properties": {"FunctionName": f"{PROJECT}-{environment}-ai-script-generator"},
+    })
+    (resource,) = functions.values()
+    return resource["Properties"]["Environment"]["Variables"]
+
+
+@pytest.mark.parametrize("environment", ["staging", "prod"])
+def test_llm_rate_limits_split_the_account_quota_across_reserved_concurrency(synth, environment):
+    containers = performance_profiles.PROFILES[environment]["generator"]["reserved_concurrency"]
+    limits = json.loads(generator_environment(synth, environment)["LLM_RATE_LIMITS"])
+    assert set(limits) == set(lambda_stack.DEFAULT_LLM_RATE_LIMITS)
+    for model, quota in lambda_stack.DEFAULT_LLM_RATE_LIMITS.items():
+        for key, value in quota.items():
+            assert limits[model][key] == pytest.approx(value / containers, abs=0.001)
+
+
+def test_llm_rate_limits_without_reserved_concurrency_warn(synth):
+    limits = json.loads(generator_environment(synth, "dev")["LLM_RATE_LIMITS"])
+    assert limits == lambda_stack.DEFAULT_LLM_RATE_LIMITS
+    Annotations.from_stack(synth("dev")["lambda"]).has_warning(
+        "*", Match.string_like_regexp("no reserved concurrency")
+    )
+
+
+def test_llm_rate_limits_context_replaces_the_defaults(synth):
+    overrides = json.dumps({"gpt-4": {"rpm": 1000}})
+    limits = json.loads(generator_environment(synth, "prod", llm_rate_limits=overrides)["LLM_RATE_LIMITS"])
+    assert limits == {"gpt-4": {"rpm": 10.0}}
+
+
+@pytest.mark.parametrize("overrides", [
+    "not json",
+    ["gpt-4"],
+    {"gpt-4": 500},
+    {"gpt-4": {}},
+    {"gpt-4": {"rpm": 0}},
+    {"gpt-4": {"rpm": "500"}},
+    {"gpt-4": {"rpd": 500}},
+])
+def test_invalid_llm_rate_limits_fail_synth(overrides):
+    with pytest.raises(ValueError):
+        lambda_stack.container_rate_limits(overrides, 10)
@@ -0,0 +1,110 @@
+"""Static pre-flight checks (lambda/common/python/scanner_common/preflight.py)"""
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+from tests.conftest import REPO_ROOT, invoke
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "lambda", "common", "python"))
+
+from scanner_common import preflight  # noqa: E402
+
+CLEAN = """import json
+import os
+import sys
+import urllib.request
+
+TARGET = os.environ["TARGET_URL"]
+try:
+    body = urllib.request.urlopen(TARGET, timeout=5).read()
+except Exception as e:
+    print(json.dumps({"error": str(e)}))
+    sys.exit(1)
+sys.exit(0 if b"root:" in body else 1)
+"""
+
+
+def codes(check):
+    return [reason["code"] for reason in check["reasons"]]
+
+
+def test_clean_script_passes():
+    check = preflight.preflight(CLEAN, require_exit=True)
+    assert check == {"ok": True, "reasons": [], "imports": ["json", "os", "sys", "urllib"]}
+
+
+def test_disallowed_import_is_reported_with_its_line():
+    check = preflight.preflight("import sys\nimport requests\nsys.exit(1)\n")
+    assert not check["ok"]
+    (reason,) = check["reasons"]
+    assert reason["code"] == "missing_module"
+    assert reason["module"] == "requests" and reason["line"] == 2
+
+
+def test_extra_modules_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("DETONATOR_EXTRA_MODULES", "requests, lxml")
+    assert preflight.preflight("import requests\nfrom lxml import etree\n")["ok"]
+    assert preflight.preflight("import scanner_probe\n")["ok"]
+
+
+def test_syntax_error_stops_the_check():
+    check = preflight.preflight("import sys\ndef probe(:\n    pass\n")
+    assert not check["ok"]
+    assert codes(check) == ["syntax_error"]
+    assert check["reasons"][0]["line"] == 2
+    assert check["imports"] == []
+
+
+@pytest.mark.parametrize("script, call", [
+    ("import os\nos.system('id')\n", "os.system"),
+    ("from subprocess import run\nrun(['id'])\n", "subprocess.run"),
+    ("import shutil as sh\nsh.rmtree('/tmp/x')\n", "shutil.rmtree"),
+    ("eval('1')\n", "eval"),
+])
+def test_destructive_calls_are_flagged(script, call):
+    check = preflight.preflight(script)
+    assert codes(check) == ["destructive_call"]
+    assert check["reasons"][0]["call"] == call
+
+
+@pytest.mark.parametrize("script, ok", [
+    ("print('x')\n", False),
+    ("import sys\nsys.exit(1)\n", True),
+    ("raise SystemExit(0)\n", True),
+    ("import scanner_probe as probe\nprobe.verdict(True, 'found')\n", True),
+])
+def test_exit_code_contract(script, ok):
+    check = preflight.preflight(script, require_exit=True)
+    assert check["ok"] is ok
+    assert ("missing_exit" in codes(check)) is not ok
+
+
+def test_empty_script():
+    assert codes(preflight.preflight("")) == ["empty_script"]
+
+
+@pytest.mark.skipif(importlib.util.find_spec("requests") is not None,
+                    reason="requests is importable here, so the detonator would allow it")
+def test_detonator_answers_422_for_a_disallowed_import(detonator):
+    status, body = invoke(detonator, {"scan_id": "pf", "target_url": "http://127.0.0.1:9/",
+                                      "script": "import sys\nimport requests\nsys.exit(1)\n"})
+    assert status == 422
+    assert body["script_executed"] is False and body["vulnerable"] is False
+    assert codes(body["preflight"]) == ["missing_module"]
+    assert body["preflight"]["reasons"][0]["module"] == "requests"
+
+
+def test_detonator_answers_422_for_a_syntax_error(detonator):
+    status, body = invoke(detonator, {"scan_id": "pf", "script": "def probe(:\n"})
+    assert status == 422
+    assert codes(body["preflight"]) == ["syntax_error"]
+
+
+def test_detonator_runs_a_clean_script(detonator):
+    status, body = invoke(detonator, {"scan_id": "pf", "target_url": "http://127.0.0.1:9/", "script": CLEAN})
+    assert status == 200
+    assert body["script_executed"] is True
+    assert body["exit_code"] == 1
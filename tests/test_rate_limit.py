@@ -0,0 +1,121 @@
+"""Token buckets of lambda/common/python/scanner_common/rate_limit.py, driven by a fake clock"""
+
+import os
+import sys
+
+import pytest
+
+from tests.conftest import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "lambda", "common", "python"))
+
+from scanner_common import rate_limit  # noqa: E402
+
+
+class FakeClock:
+    """Stands in for the time module inside rate_limit; sleep() just moves the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    rate_limit._deadline.set(None)
+    return clock
+
+
+def drive(clock, limiter, tokens, minutes, model="gpt-4"):
+    """One caller back to back for `minutes`; returns the (time, tokens) of every admitted call"""
+    admitted = []
+    end = clock.now + minutes * 60
+    while clock.now < end:
+        try:
+            limiter.call(model, tokens, lambda: admitted.append((clock.now, tokens)))
+        except rate_limit.Overloaded:
+            clock.sleep(1)
+    return [(at, n) for at, n in admitted if at < end]
+
+
+def per_minute(admitted, start, minutes):
+    totals = [0] * minutes
+    for at, tokens in admitted:
+        totals[int((at - start) // 60)] += tokens
+    return totals
+
+
+def limiter(clock, tpm, **kwargs):
+    return rate_limit.RateLimiter(rate_limit.MemoryBuckets(clock=clock.time), {"gpt-4": {"tpm": tpm}}, **kwargs)
+
+
+def assert_within_tpm(admitted, start, tpm, tokens, minutes):
+    """
+    Tokens admitted by any time t never exceed the new bucket's burst plus
+    tpm/60 per second since start, so the rate per minute stays at tpm. A
+    single calendar minute can hold one request more, paid for by the
+    previous minute's refill.
+    """
+    rate = tpm / 60
+    burst = max(rate * rate_limit.DEFAULT_BURST_SECONDS, 1.0)
+    total = 0
+    for at, n in admitted:
+        total += n
+        assert total <= burst + rate * (at - start) + 1e-6
+    assert total - burst <= tpm * minutes
+    assert max(per_minute(admitted, start, minutes)) <= tpm + tokens
+
+
+@pytest.mark.parametrize("tpm, tokens", [
+    (6000, 500),     # requests well inside the burst
+    (6000, 2300),    # requests bigger than the 10s burst
+    (1200, 2300),    # requests bigger than a whole minute of budget
+])
+def test_admitted_tokens_per_minute_stay_within_tpm(clock, tpm, tokens):
+    start = clock.now
+    admitted = drive(clock, limiter(clock, tpm), tokens, minutes=30)
+    assert_within_tpm(admitted, start, tpm, tokens, 30)
+    # ... and the limiter does not throttle far below it either
+    assert sum(n for _, n in admitted) >= tpm * 30 * 0.9 - tokens
+
+
+def test_per_container_share_smaller_than_one_request(clock):
+    # gpt-4 at 10000 tpm over 100 containers: ~100 tpm each, requests of ~2300 tokens
+    start = clock.now
+    admitted = drive(clock, limiter(clock, 100), 2300, minutes=60)
+    assert_within_tpm(admitted, start, 100, 2300, 60)
+    assert sum(tokens for _, tokens in admitted) <= 100 * 60
+    assert len(admitted) >= 1
+
+
+def test_request_over_max_request_tokens_is_charged_in_full(clock):
+    start = clock.now
+    admitted = drive(clock, limiter(clock, 600, max_request_tokens=1000), 3000, minutes=20)
+    assert_within_tpm(admitted, start, 600, 3000, 20)
+
+
+def test_capacity_holds_the_largest_request():
+    buckets = rate_limit.RateLimiter(limits={"gpt-4": {"rpm": 6, "tpm": 100}}).bucket_limits("gpt-4")
+    capacity, rate, initial = buckets["tokens"]
+    assert capacity == rate_limit.DEFAULT_MAX_REQUEST_TOKENS
+    assert rate == pytest.approx(100 / 60)
+    assert initial == pytest.approx(100 / 60 * rate_limit.DEFAULT_BURST_SECONDS)
+    assert buckets["requests"] == (1.0, pytest.approx(0.1), 1.0)
+
+
+def test_wait_past_the_budget_is_shed(clock):
+    limits = limiter(clock, 60, max_wait=5)
+    with pytest.raises(rate_limit.Overloaded) as shed:
+        limits.call("gpt-4", 2000, lambda: None)
+    assert shed.value.reason == "rate_limited"
+    assert shed.value.retry_after > 5
@@ -0,0 +1,91 @@
+"""Verdict cache of the detonator (lambda/script_detonator/result_cache.py)"""
+
+import pytest
+
+from tests.conftest import invoke
+
+SCRIPT = "import sys\nprint('checked')\nsys.exit(1)\n"
+REFORMATTED = "import sys\n\n# same checks, different layout\nprint( 'checked' )\nsys.exit( 1 )\n"
+TARGET = "http://10.0.0.1:8080/"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class Result:
+    """The parts of execution.ExecutionResult the cache stores"""
+
+    def __init__(self, returncode=1, timed_out=False, cancelled=False):
+        self.returncode = returncode
+        self.timed_out = timed_out
+        self.cancelled = cancelled
+
+    def output_digest(self):
+        return "digest"
+
+    def probe_report(self):
+        return None
+
+
+@pytest.fixture
+def cache(detonator):
+    import result_cache
+    return result_cache
+
+
+@pytest.fixture
+def clock(cache, monkeypatch):
+    from scanner_common.cache_backends import MemoryBackend
+    fake = Clock()
+    monkeypatch.setattr(cache, "_backend", MemoryBackend(clock=fake))
+    monkeypatch.setattr(cache, "_backend_loaded", True)
+    return fake
+
+
+def test_same_fingerprint_and_target_share_a_key(cache):
+    assert cache.cache_key(SCRIPT, TARGET) == cache.cache_key(REFORMATTED, "HTTP://10.0.0.1:8080")
+    assert cache.cache_key(SCRIPT, TARGET).startswith(cache.KEY_PREFIX)
+
+
+def test_different_target_or_script_gets_another_key(cache):
+    key = cache.cache_key(SCRIPT, TARGET)
+    assert cache.cache_key(SCRIPT, "http://10.0.0.2:8080/") != key
+    assert cache.cache_key(SCRIPT, "http://10.0.0.1:8080/admin") != key
+    assert cache.cache_key(SCRIPT.replace("sys.exit(1)", "sys.exit(0)"), TARGET) != key
+
+
+def test_entries_expire_after_the_ttl(cache, clock, monkeypatch):
+    monkeypatch.setenv("RESULT_CACHE_TTL_SECONDS", "60")
+    cache.store(SCRIPT, TARGET, Result(returncode=0))
+    hit = cache.lookup(REFORMATTED, TARGET)
+    assert hit["vulnerable"] is True and hit["exit_code"] == 0
+    assert cache.lookup(SCRIPT, "http://10.0.0.2:8080/") is None
+    clock.now += 59
+    assert cache.lookup(SCRIPT, TARGET) is not None
+    clock.now += 1
+    assert cache.lookup(SCRIPT, TARGET) is None
+
+
+@pytest.mark.parametrize("result", [Result(timed_out=True), Result(cancelled=True)])
+def test_unfinished_runs_are_not_cached(cache, clock, result):
+    cache.store(SCRIPT, TARGET, result)
+    assert cache.lookup(SCRIPT, TARGET) is None
+
+
+def test_detonator_serves_repeats_from_the_cache(detonator, monkeypatch):
+    monkeypatch.setenv("RESULT_CACHE_BACKEND", "memory")
+    event = {"scan_id": "rc", "script": SCRIPT, "target_url": TARGET}
+    first = invoke(detonator, event)[1]
+    assert first["script_executed"] is True and first["result_cache_hit"] is False
+    again = invoke(detonator, dict(event, script=REFORMATTED))[1]
+    assert again["result_cache_hit"] is True and again["script_executed"] is False
+    assert again["output_digest"] == first["output_digest"]
+    other = invoke(detonator, dict(event, target_url="http://10.0.0.2:8080/"))[1]
+    assert other["result_cache_hit"] is False
+    forced = invoke(detonator, dict(event, force_rerun=True))[1]
+    assert forced["script_executed"] is True
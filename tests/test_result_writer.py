@@ -0,0 +1,197 @@
+"""Batched, retried writes of lambda/common/python/scanner_common/result_writer.py against a fake connection"""
+
+import os
+import sys
+from contextlib import contextmanager
+
+import psycopg
+import pytest
+from psycopg import errors
+
+from tests.conftest import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "lambda", "common", "python"))
+
+from scanner_common import result_writer  # noqa: E402
+from scanner_common.result_writer import COLUMNS, ResultWriter  # noqa: E402
+
+
+class FakeDatabase:
+    """
+    Rows by result_id plus every statement seen. failures is a queue of
+    (phase, exception) raised at the next matching phase: "execute",
+    "copy" or "commit" (after the writes of the transaction went through,
+    i.e. a commit lost in flight).
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.statements = []
+        self.connections = 0
+        self.failures = []
+
+    def fail(self, phase):
+        if self.failures and self.failures[0][0] == phase:
+            raise self.failures.pop(0)[1]
+
+
+class FakeCursor:
+    def __init__(self, row=None):
+        self.row = row
+
+    def fetchone(self):
+        return self.row
+
+
+class FakeCopy:
+    def __init__(self, pending):
+        self.pending = pending
+
+    def write_row(self, row):
+        self.pending.append(tuple(row))
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self.closed = False
+        self.pending = None
+        db.connections += 1
+
+    @contextmanager
+    def transaction(self):
+        self.pending = []
+        try:
+            yield
+        except BaseException:
+            self.pending = None
+            raise
+        rows, self.pending = self.pending, None
+        for row in rows:
+            self.db.rows.setdefault(row[0], row)
+        self.db.fail("commit")
+
+    def execute(self, statement, params=()):
+        text = statement.as_string(None)
+        self.db.statements.append(text)
+        self.db.fail("execute")
+        if text.startswith("SELECT 1"):
+            return FakeCursor((1,) if params[0] in self.db.rows else None)
+        if text.startswith("INSERT"):
+            width = len(COLUMNS)
+            self.pending.extend(tuple(params[i:i + width]) for i in range(0, len(params), width))
+        return FakeCursor()
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    @contextmanager
+    def copy(self, statement):
+        self.db.statements.append(statement.as_string(None))
+        self.db.fail("copy")
+        yield FakeCopy(self.pending)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(psycopg, "connect", lambda *args, **kwargs: FakeConnection(database))
+    return database
+
+
+def writer(**kwargs):
+    kwargs.setdefault("backoff_seconds", 0)
+    return ResultWriter("postgresql://fake/scanner", **kwargs)
+
+
+def verdicts(n):
+    return [{"id": str(i), "target_url": f"http://10.0.0.{i}/", "exit_code": 0, "vulnerable": True}
+            for i in range(n)]
+
+
+def test_insert_writes_multi_row_batches(db):
+    w = writer(batch_size=4)
+    for entry in verdicts(10):
+        w.add("scan-1", entry)
+    assert w.pending() == 2
+    assert w.flush() == 2
+    inserts = [s for s in db.statements if s.startswith("INSERT")]
+    assert len(inserts) == 3
+    assert inserts[0].count("), (") == 3
+    assert "ON CONFLICT DO NOTHING" in inserts[0]
+    assert len(db.rows) == 10
+    assert w.stats["batches"] == 3 and w.stats["rows_written"] == 10
+    assert db.connections == 1
+
+
+def test_copy_writes_one_statement_per_batch(db):
+    w = writer(method="copy", batch_size=100)
+    for entry in verdicts(5):
+        w.add("scan-1", entry)
+    assert w.flush() == 5
+    assert db.statements == [s for s in db.statements if s.startswith("COPY")]
+    assert len(db.statements) == 1
+    assert {row[1] for row in db.rows.values()} == {"scan-1"}
+
+
+@pytest.mark.parametrize("failure", [
+    psycopg.OperationalError("server closed the connection unexpectedly"),
+    errors.ReadOnlySqlTransaction("cannot execute INSERT in a read-only transaction"),
+    errors.AdminShutdown("terminating connection due to administrator command"),
+])
+def test_failover_reconnects_and_retries(db, failure):
+    w = writer()
+    for entry in verdicts(3):
+        w.add("scan-1", entry)
+    db.failures.append(("execute", failure))
+    assert w.flush() == 3
+    assert len(db.rows) == 3
+    assert w.stats["retries"] == 1 and w.stats["reconnects"] == 1
+    assert db.connections == 2
+
+
+def test_lost_commit_is_not_written_twice(db):
+    w = writer()
+    for entry in verdicts(3):
+        w.add("scan-1", entry)
+    db.failures.append(("commit", psycopg.OperationalError("connection lost during COMMIT")))
+    assert w.flush() == 3
+    assert len(db.rows) == 3
+    assert [s.split()[0] for s in db.statements] == ["INSERT", "SELECT"]
+    assert w.stats["retries"] == 1 and w.stats["rows_written"] == 3
+
+
+def test_other_errors_keep_the_batch_buffered(db):
+    w = writer()
+    for entry in verdicts(2):
+        w.add("scan-1", entry)
+    db.failures.append(("execute", errors.UndefinedTable('relation "scan_results" does not exist')))
+    assert w.flush() == 0
+    assert w.pending() == 2 and w.stats["retries"] == 0
+    assert w.flush() == 2
+    assert len(db.rows) == 2
+
+
+def test_gives_up_after_max_retries(db):
+    w = writer(max_retries=2)
+    w.add("scan-1", verdicts(1)[0])
+    db.failures.extend(("execute", psycopg.OperationalError("down")) for _ in range(3))
+    assert w.flush() == 0
+    assert w.pending() == 1
+    assert w.stats["retries"] == 2
+    assert not db.rows
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        ResultWriter("postgresql://fake/scanner", method="upsert")
+
+
+def test_row_from_entry_marks_timeouts():
+    row = dict(zip(COLUMNS, result_writer.row_from_entry("scan-1", {"id": 7, "timed_out": True})))
+    assert row["status"] == "timeout" and row["timed_out"] is True
+    assert row["item_id"] == "7" and row["vulnerable"] is False
@@ -0,0 +1,76 @@
+"""Tiered routing (router.py) end to end through the generator and the stub LLM"""
+
+import pytest
+
+from tests.conftest import invoke
+
+FAST = "gpt-4o-mini"
+LARGE = "gpt-4"
+
+FINDING = {"vulnerability": "SQL injection in /item id parameter",
+           "target_url": "http://10.0.0.1/", "target_urls": ["http://10.0.0.2/"]}
+
+
+@pytest.fixture
+def tiered(generator, stub_llm, monkeypatch):
+    monkeypatch.setenv("MODEL_FAST", FAST)
+    monkeypatch.setenv("MODEL", LARGE)
+    return generator
+
+
+def generate(handler, stub, finding, fast_behavior):
+    """Run one finding with the fast model answering fast_behavior; returns (body, requests per model)"""
+    stub.behaviors[FAST] = fast_behavior
+    before = stub.stats()["by_model"]
+    status, body = invoke(handler, finding)
+    assert status == 200
+    after = stub.stats()["by_model"]
+    return body, {model: after.get(model, 0) - before.get(model, 0) for model in (FAST, LARGE)}
+
+
+def test_fast_tier_serves_a_good_script(tiered, stub_llm):
+    body, calls = generate(tiered, stub_llm, FINDING, "good")
+    assert body["tier"] == "fast" and body["model"] == FAST
+    assert body["routing"]["escalated"] is False
+    assert body["routing"]["escalation_reason"] is None
+    assert calls == {FAST: 1, LARGE: 0}
+
+
+@pytest.mark.parametrize("behavior, reason", [
+    ("no_exit", "missing_exit"),
+    ("hardcoded", "hardcoded_target"),
+    ("broken", "invalid_script"),
+])
+def test_fast_tier_escalates(tiered, stub_llm, behavior, reason):
+    body, calls = generate(tiered, stub_llm, FINDING, behavior)
+    assert body["tier"] == "large" and body["model"] == LARGE
+    assert body["routing"]["escalated"] is True
+    assert body["routing"]["escalation_reason"] == reason
+    assert [a["tier"] for a in body["routing"]["attempts"]] == ["fast", "large"]
+    assert body["target_agnostic"] is True
+    assert calls == {FAST: 1, LARGE: 1}
+
+
+def test_hard_category_skips_the_fast_tier(tiered, stub_llm):
+    body, calls = generate(tiered, stub_llm, dict(FINDING, category="deserialization"), "good")
+    assert body["tier"] == "large"
+    assert body["routing"]["escalation_reason"] == "hard_category"
+    assert [a["tier"] for a in body["routing"]["attempts"]] == ["large"]
+    assert calls == {FAST: 0, LARGE: 1}
+
+
+def test_hard_category_found_in_the_description(tiered, stub_llm):
+    finding = dict(FINDING, vulnerability="Insecure deserialization of the session cookie")
+    body, calls = generate(tiered, stub_llm, finding, "good")
+    assert body["routing"]["escalation_reason"] == "hard_category"
+    assert calls == {FAST: 0, LARGE: 1}
+
+
+def test_single_tier_never_escalates(generator, stub_llm, monkeypatch):
+    monkeypatch.setenv("MODEL_FAST", LARGE)
+    stub_llm.behaviors[LARGE] = "no_exit"
+    status, body = invoke(generator, FINDING)
+    assert status == 200
+    assert body["tier"] == "large"
+    assert body["routing"]["escalated"] is False
+    assert len(body["routing"]["attempts"]) == 1
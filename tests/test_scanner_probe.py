@@ -0,0 +1,147 @@
+"""Pooled HTTP probe helper for detonated scripts (lambda/script_detonator/scanner_probe.py)"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tests.conftest import invoke
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.paths.append(self.path)
+        body = f"{server.name} {self.path}".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        if server.mode == "close":
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+        # "drop": hang up without telling the client, like an idle timeout
+        if server.mode in ("close", "drop"):
+            self.close_connection = True
+
+
+class Target(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, name, mode="keep-alive"):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.name = name
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.paths = []
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+@pytest.fixture
+def targets():
+    started = []
+
+    def start(name, mode="keep-alive"):
+        server = Target(name, mode)
+        started.append(server)
+        return server
+    yield start
+    for server in started:
+        server.stop()
+
+
+@pytest.fixture
+def probe(detonator, monkeypatch):
+    import scanner_probe
+    monkeypatch.delenv("SCRIPT_DEADLINE", raising=False)
+    scanner_probe._pool.close()
+    yield scanner_probe
+    scanner_probe._pool.close()
+
+
+def test_sequential_probes_share_one_connection(probe, targets, monkeypatch):
+    server = targets("a")
+    monkeypatch.setenv("TARGET_URL", server.url)
+    responses = [probe.get(f"/item?id={i}") for i in range(20)]
+    assert all(r.ok for r in responses)
+    assert responses[3].text == "a /item?id=3"
+    assert server.connections == 1
+
+
+def test_concurrent_probes_reuse_a_bounded_set(probe, targets, monkeypatch):
+    server = targets("a")
+    monkeypatch.setenv("TARGET_URL", server.url)
+    for _ in range(3):
+        responses = probe.many([("GET", f"/p{i}") for i in range(8)], workers=4)
+        assert [r.text for r in responses] == [f"a /p{i}" for i in range(8)]
+    assert server.connections <= 8
+
+
+def test_connection_close_is_not_pooled(probe, targets, monkeypatch):
+    server = targets("a", mode="close")
+    monkeypatch.setenv("TARGET_URL", server.url)
+    assert all(probe.get("/").ok for _ in range(3))
+    assert server.connections == 3
+
+
+def test_dropped_idle_connection_is_retried_once(probe, targets, monkeypatch):
+    server = targets("a", mode="drop")
+    monkeypatch.setenv("TARGET_URL", server.url)
+    responses = [probe.get(f"/{i}") for i in range(3)]
+    assert [r.error for r in responses] == [None, None, None]
+    assert server.paths == ["/0", "/1", "/2"]
+
+
+def test_target_comes_from_the_environment(probe, targets, monkeypatch):
+    first, second = targets("a"), targets("b")
+    monkeypatch.setenv("TARGET_URL", first.url + "app/")
+    assert probe.url_for("login") == first.url + "app/login"
+    assert probe.get("login").text == "a /app/login"
+    monkeypatch.setenv("TARGET_URL", second.url)
+    assert probe.get("/login").text == "b /login"
+    assert probe.get(first.url + "abs").text == "a /abs"
+    monkeypatch.delenv("TARGET_URL")
+    assert "TARGET_URL" in probe.get("/login").error
+
+
+def test_past_the_deadline_nothing_is_sent(probe, targets, monkeypatch):
+    server = targets("a")
+    monkeypatch.setenv("TARGET_URL", server.url)
+    monkeypatch.setenv("SCRIPT_DEADLINE", "1")
+    assert probe.get("/").error == "script deadline reached"
+    assert server.paths == []
+
+
+def test_fanned_out_script_probes_each_host_it_is_given(detonator, targets):
+    first, second = targets("a"), targets("b")
+    script = ("import scanner_probe as probe\n"
+              "r = probe.get('/whoami')\n"
+              "probe.evidence('reached', r.text, r)\n"
+              "probe.verdict(False, 'checked')\n")
+    status, body = invoke(detonator, {"scan_id": "probe", "script": script,
+                                      "target_urls": [first.url, second.url]})
+    assert status == 200
+    details = sorted(r["probe"]["evidence"][0]["detail"] for r in body["results"])
+    assert details == ["a /whoami", "b /whoami"]
+    assert first.paths == second.paths == ["/whoami"]
+    assert all(r["probe"]["verdict"]["vulnerable"] is False for r in body["results"])
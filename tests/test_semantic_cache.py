@@ -0,0 +1,80 @@
+"""Near-duplicate lookups in lambda/ai_script_generator/semantic_cache.py"""
+
+import os
+import sys
+
+import pytest
+
+from tests.conftest import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "lambda", "ai_script_generator"))
+
+import semantic_cache  # noqa: E402
+
+SCRIPT = "import scanner_probe as probe\nprobe.verdict(False, 'nothing found')\n"
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setenv("SEMANTIC_CACHE", "true")
+    monkeypatch.setenv("SEMANTIC_CACHE_THRESHOLD", "0.85")
+    monkeypatch.setenv("SEMANTIC_CACHE_CAPACITY", "1000")
+    monkeypatch.setattr(semantic_cache, "_indexes", {})
+
+
+def test_rewording_of_the_same_finding_is_a_hit():
+    semantic_cache.add("SQL injection in /login username parameter", SCRIPT, "ns", "model", "large")
+    hit = semantic_cache.lookup("SQLi on /login, param username", "ns")
+    assert hit["script"] == SCRIPT
+    assert hit["similarity"] >= 0.85
+    assert hit["matched_vulnerability"] == "SQL injection in /login username parameter"
+
+
+def test_different_parameter_is_a_miss_despite_similar_wording():
+    a, b = "Reflected XSS in search parameter q", "Reflected XSS in search parameter name"
+    similarity = sum(w * semantic_cache.vectorize(b).get(k, 0.0) for k, w in semantic_cache.vectorize(a).items())
+    assert similarity >= semantic_cache.DEFAULT_THRESHOLD
+    semantic_cache.add(a, SCRIPT, "ns")
+    assert semantic_cache.lookup(b, "ns") is None
+    assert semantic_cache.lookup("Reflected cross site scripting on the search parameter q", "ns") is not None
+
+
+def test_different_path_is_a_miss():
+    semantic_cache.add("SQL injection in /item/0 id parameter", SCRIPT, "ns")
+    assert semantic_cache.lookup("SQL injection in /item/1 id parameter", "ns") is None
+    assert semantic_cache.lookup("SQLi in /item/0 id parameter", "ns") is not None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Reflected XSS in search parameter q", {("param", "q")}),
+    ("SQL injection in /item/3 id parameter", {("path", "/item/3"), ("param", "id")}),
+    ("SSRF via ?url= on /fetch", {("param", "url"), ("path", "/fetch")}),
+    ("Stored XSS in comment body", set()),
+])
+def test_anchors(text, expected):
+    assert semantic_cache.anchors(text) == expected
+
+
+def test_namespaces_are_separate():
+    semantic_cache.add("Reflected XSS in search parameter q", SCRIPT, "gpt-a")
+    assert semantic_cache.lookup("Reflected XSS in search parameter q", "gpt-b") is None
+
+
+def test_full_index_reuses_the_least_recently_used_row(monkeypatch):
+    monkeypatch.setenv("SEMANTIC_CACHE_CAPACITY", "2")
+    semantic_cache.add("SQL injection in /a id parameter", "a", "ns")
+    semantic_cache.add("SQL injection in /b id parameter", "b", "ns")
+    semantic_cache.lookup("SQL injection in /a id parameter", "ns")
+    semantic_cache.add("SQL injection in /c id parameter", "c", "ns")
+    assert semantic_cache.lookup("SQL injection in /b id parameter", "ns") is None
+    assert semantic_cache.lookup("SQL injection in /a id parameter", "ns")["script"] == "a"
+    assert semantic_cache.lookup("SQL injection in /c id parameter", "ns")["script"] == "c"
+    index = semantic_cache._indexes["ns"]
+    assert all(row in (0, 1) for rows in index.postings.values() for row in rows)
+
+
+def test_disabled_cache_stores_nothing(monkeypatch):
+    monkeypatch.setenv("SEMANTIC_CACHE", "false")
+    semantic_cache.add("Reflected XSS in search parameter q", SCRIPT, "ns")
+    assert semantic_cache._indexes == {}
+    assert semantic_cache.lookup("Reflected XSS in search parameter q", "ns") is None
@@ -0,0 +1,93 @@
+"""The detonator as an SQS consumer (lambda/script_detonator/sqs_detonation.py)"""
+
+import json
+
+import pytest
+
+from tests.conftest import FakeContext
+
+TARGET = "http://127.0.0.1:9/"
+NOT_VULNERABLE = "import sys\nprint('checked')\nsys.exit(1)\n"
+
+
+def record(message_id, body):
+    return {"messageId": message_id, "eventSource": "aws:sqs",
+            "body": body if isinstance(body, str) else json.dumps(body)}
+
+
+def request(**extra):
+    return dict({"script": NOT_VULNERABLE, "scan_id": "scan-q", "target_url": TARGET}, **extra)
+
+
+MIXED = [
+    record("good-1", request()),
+    record("good-2", request(script="import sys\nsys.exit(0)\n", timeout=30)),
+    record("sleeper", request(script="import time\ntime.sleep(30)\n", timeout=1)),
+    record("rejected", request(script="import requests\n")),
+    record("not-json", "{script: nope"),
+    record("not-object", ["a", "list"]),
+    record("timeout-text", request(timeout="soon")),
+    record("timeout-zero", request(timeout=0)),
+    record("timeout-negative", request(timeout=-5)),
+    record("timeout-bool", request(timeout=True)),
+    record("no-script", request(script="")),
+]
+
+# Malformed, bad timeouts and detonator errors are redelivered; completed runs,
+# timeouts and pre-flight rejections are settled
+EXPECTED_FAILURES = ["not-json", "not-object", "timeout-text", "timeout-zero", "timeout-negative",
+                     "timeout-bool", "no-script"]
+
+
+class RecordingSink:
+    def __init__(self, reject=()):
+        self.verdicts = []
+        self.reject = set(reject)
+
+    def send(self, verdicts):
+        self.verdicts.extend(verdicts)
+        return [v["id"] for v in verdicts if v["id"] in self.reject]
+
+
+@pytest.fixture
+def sqs(detonator):
+    import sqs_detonation
+    return sqs_detonation
+
+
+def failures(response):
+    return [f["itemIdentifier"] for f in response["batchItemFailures"]]
+
+
+def test_exactly_the_failed_messages_are_reported(detonator, monkeypatch, capsys):
+    monkeypatch.setenv("RESULT_SINK", "log")
+    response = detonator({"Records": MIXED}, FakeContext(120000))
+    assert sorted(failures(response)) == sorted(EXPECTED_FAILURES)
+    logged = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+    verdicts = {v["id"]: v for v in logged if v.get("event") == "detonation_verdict"}
+    assert set(verdicts) == {"good-1", "good-2", "sleeper", "rejected"}
+    assert verdicts["good-2"]["vulnerable"] is True
+    assert verdicts["sleeper"]["status"] == "timeout"
+    assert verdicts["rejected"]["status"] == "rejected"
+    assert all(v["scan_id"] == "scan-q" for v in verdicts.values())
+
+
+def test_sink_rejections_are_redelivered(sqs):
+    sink = RecordingSink(reject={"good-1"})
+    response = sqs.handle_sqs({"Records": MIXED[:2]}, FakeContext(120000), sink=sink)
+    assert failures(response) == ["good-1"]
+    assert {v["id"] for v in sink.verdicts} == {"good-1", "good-2"}
+
+
+def test_parse_records_keeps_message_ids(sqs):
+    items, failed = sqs.parse_records(MIXED)
+    assert [item["id"] for item in items] == ["good-1", "good-2", "sleeper", "rejected", "no-script"]
+    assert [item["index"] for item in items] == list(range(5))
+    assert items[1]["timeout"] == 30
+    assert failed == EXPECTED_FAILURES[:-1]
+
+
+def test_only_sqs_records_are_consumed(sqs):
+    assert sqs.is_sqs_event({"Records": [record("1", request())]})
+    assert not sqs.is_sqs_event({"Records": [{"eventSource": "aws:s3"}]})
+    assert not sqs.is_sqs_event({"Records": []})
@@ -0,0 +1,114 @@
+"""Incremental fence stripping and early hang-up (lambda/ai_script_generator/streaming.py)"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from tests.conftest import invoke
+
+SCRIPT = "import sys\nprint('probing')\nsys.exit(1)"
+
+
+@pytest.fixture
+def streaming(generator):
+    import streaming
+    return streaming
+
+
+def feed_all(stripper, chunks):
+    emitted = [stripper.feed(chunk) for chunk in chunks]
+    emitted.append(stripper.finish())
+    return emitted
+
+
+def test_closing_fence_split_across_chunks(streaming):
+    stripper = streaming.FenceStripper()
+    chunks = ["Here you go:\n``", "`pyth", "on\nimport sys\nprint('pro", "bing')\nsys.exit(1)\n`",
+              "`", "`\nThis script checks", " the target.\n"]
+    emitted = [stripper.feed(chunk) for chunk in chunks[:5]]
+    assert not stripper.done
+    emitted.append(stripper.feed(chunks[5]))
+    assert stripper.done
+    # Once done, the trailing explanation is ignored
+    assert stripper.feed(chunks[6]) == ""
+    emitted.append(stripper.finish())
+    assert stripper.script == SCRIPT
+    assert "".join(emitted).strip() == SCRIPT
+
+
+def test_missing_closing_fence_keeps_the_script(streaming):
+    stripper = streaming.FenceStripper()
+    feed_all(stripper, ["```python\n", "import sys\nprint('probing')\n", "sys.exit(1)"])
+    assert not stripper.done
+    assert stripper.script == SCRIPT
+
+
+def test_unfenced_response_is_the_script(streaming):
+    stripper = streaming.FenceStripper()
+    emitted = feed_all(stripper, ["import sys\n", "print('probing')\n", "sys.exit(1)\n"])
+    assert emitted[:-1] == ["", "", ""]
+    assert stripper.script == SCRIPT
+
+
+def test_long_preamble_is_released_as_code(streaming):
+    lines = [f"x{i} = {i}\n" for i in range(streaming.PREAMBLE_MAX_LINES + 2)]
+    stripper = streaming.FenceStripper()
+    feed_all(stripper, lines)
+    assert stripper.script == "".join(lines).strip()
+
+
+def test_matches_strip_code_fences(streaming):
+    from prompts import strip_code_fences
+    response = f"```python\n{SCRIPT}\n```\n"
+    stripper = streaming.FenceStripper()
+    feed_all(stripper, [response[i:i + 3] for i in range(0, len(response), 3)])
+    assert stripper.script == strip_code_fences(response) == SCRIPT
+
+
+class FakeStream:
+    """Chat completion chunks for one response; counts what was read"""
+
+    def __init__(self, text, size=4):
+        self.pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            self.read += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    def close(self):
+        self.closed = True
+
+
+def fake_client(stream):
+    create = lambda **kwargs: stream  # noqa: E731
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def test_stops_reading_at_the_closing_fence(streaming):
+    stream = FakeStream(f"```python\n{SCRIPT}\n```\n" + "More explanation follows. " * 50)
+    chunks = []
+    script, stats = streaming.stream_script(fake_client(stream), "gpt-4", "SQLi", "http://t/", chunks.append)
+    assert script == SCRIPT
+    assert stats["stopped_early"] is True and stats["mode"] == "stream"
+    assert stream.closed and stream.read < len(stream.pieces)
+    assert "".join(chunks).strip() == SCRIPT
+
+
+def test_without_a_closing_fence_reads_to_the_end(streaming):
+    stream = FakeStream(f"```python\n{SCRIPT}")
+    script, stats = streaming.stream_script(fake_client(stream), "gpt-4", "SQLi", "http://t/")
+    assert script == SCRIPT
+    assert stats["stopped_early"] is False
+    assert stream.closed and stream.read == len(stream.pieces)
+
+
+def test_generator_streams_from_the_stub(generator, stub_llm):
+    status, body = invoke(generator, {"vulnerability": "SQL injection in /item", "target_url": "http://10.0.0.1/",
+                                      "stream": True})
+    assert status == 200
+    assert body["generation"]["mode"] == "stream"
+    assert body["generation"]["stopped_early"] is True
+    assert not body["script"].startswith("```") and "sys.exit" in body["script"]
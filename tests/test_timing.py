@@ -0,0 +1,70 @@
+"""EMF output of lambda/common/python/scanner_common/timing.py"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from tests.conftest import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "lambda", "common", "python"))
+
+from scanner_common import timing  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def metrics_on(monkeypatch):
+    monkeypatch.setenv("TIMING_METRICS", "true")
+    monkeypatch.setenv("ENVIRONMENT", "prod")
+
+
+def invocation(capsys, mode=None, **properties):
+    extra = {"Mode": mode} if mode else {}
+    timing.start(None, SimpleNamespace(function_name="scanner-prod-ai-script-generator"), **extra)
+    with timing.span("llm_request"):
+        pass
+    timing.count("llm_calls")
+    for name, value in properties.items():
+        timing.set_property(name, value)
+    timing.finish({"statusCode": 200, "body": "{}"})
+    return json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+
+
+def test_every_invocation_uses_the_same_dimension_set(capsys):
+    documents = [
+        invocation(capsys),
+        invocation(capsys, mode="sqs"),
+        invocation(capsys, CacheHit=True),
+        invocation(capsys, CacheHit=False, Model="gpt-4"),
+    ]
+    for document in documents:
+        (directive,) = document["_aws"]["CloudWatchMetrics"]
+        assert directive["Dimensions"] == [["Function", "Environment", "Model", "CacheHit"]]
+        assert document["Function"] == "scanner-prod-ai-script-generator"
+        assert document["Environment"] == "prod"
+        assert {"llm_request_ms", "total_ms", "llm_calls"} <= {m["Name"] for m in directive["Metrics"]}
+    assert [(d["Model"], d["CacheHit"]) for d in documents] == [
+        ("none", "false"), ("none", "false"), ("none", "true"), ("gpt-4", "false"),
+    ]
+
+
+def test_missing_dimension_values_fall_back_to_defaults(capsys):
+    document = invocation(capsys, Model=None, CacheHit="")
+    assert document["Model"] == "none"
+    assert document["CacheHit"] == "false"
+
+
+def test_mode_is_a_property_not_a_dimension(capsys):
+    document = invocation(capsys, mode="sqs", CacheHit=False, Model="gpt-4")
+    assert document["Mode"] == "sqs"
+    (directive,) = document["_aws"]["CloudWatchMetrics"]
+    assert "Mode" not in directive["Dimensions"][0]
+    names = {m["Name"] for m in directive["Metrics"]}
+    assert not names & {"Mode", "CacheHit", "Model"}
+
+
+def test_property_cannot_overwrite_a_dimension(capsys):
+    document = invocation(capsys, Environment="other")
+    assert document["Environment"] == "prod"
@@ -0,0 +1,159 @@
+"""VPC endpoint selection (stacks/vpc_endpoints.py) and what NetworkStack synthesizes from it"""
+
+import json
+
+import pytest
+from aws_cdk.assertions import Match, Template
+
+from stacks import vpc_endpoints
+
+# ECR is two interface endpoints: the API and the Docker registry
+ENDPOINT_NAMES = {"ecr": ["ecr.api", "ecr.dkr"]}
+
+SANDBOX_SQS = json.dumps({"prod": {"sandbox": ["s3", "sqs"]}})
+
+
+def network_template(synth, environment, **context):
+    return Template.from_stack(synth(environment, **context)["network"])
+
+
+def _service_name(properties):
+    """Trailing service of the endpoint's ServiceName ("s3", "ecr.dkr", ...)"""
+    name = properties["ServiceName"]
+    if isinstance(name, dict):
+        # Gateways: {"Fn::Join": ["", ["com.amazonaws.", {"Ref": "AWS::Region"}, ".s3"]]}
+        return name["Fn::Join"][1][-1].lstrip(".")
+    return name.split("us-east-1.", 1)[-1]
+
+
+def endpoints_by_vpc(template):
+    """{vpc: {service name: properties}}"""
+    found = {"main": {}, "sandbox": {}}
+    for resource in template.find_resources("AWS::EC2::VPCEndpoint").values():
+        properties = resource["Properties"]
+        vpc = "sandbox" if properties["VpcId"]["Ref"].startswith("SandboxVPC") else "main"
+        found[vpc][_service_name(properties)] = properties
+    return found
+
+
+def expected_names(services):
+    return sorted(name for service in services for name in ENDPOINT_NAMES.get(service, [service]))
+
+
+@pytest.mark.parametrize("environment", ["dev", "staging", "prod"])
+def test_endpoint_count_and_type_per_vpc(synth, environment):
+    found = endpoints_by_vpc(network_template(synth, environment))
+    for vpc in vpc_endpoints.VPCS:
+        services = vpc_endpoints.ENDPOINTS[environment][vpc]
+        assert sorted(found[vpc]) == expected_names(services)
+        for service in services:
+            kind = "Gateway" if service in vpc_endpoints.GATEWAYS else "Interface"
+            for name in ENDPOINT_NAMES.get(service, [service]):
+                assert found[vpc][name]["VpcEndpointType"] == kind
+
+
+def test_dev_has_gateways_only(synth):
+    template = network_template(synth, "dev")
+    template.resource_count_is("AWS::EC2::VPCEndpoint", 3)
+    template.all_resources_properties("AWS::EC2::VPCEndpoint", {"VpcEndpointType": "Gateway"})
+    template.resource_properties_count_is("AWS::EC2::SecurityGroup", {
+        "GroupDescription": Match.string_like_regexp("Interface VPC endpoints"),
+    }, 0)
+
+
+def test_main_endpoints_are_limited_to_this_account(synth):
+    found = endpoints_by_vpc(network_template(synth, "prod"))
+    for name, properties in found["main"].items():
+        statements = properties["PolicyDocument"]["Statement"]
+        assert statements[0]["Action"] == "*"
+        assert statements[0]["Condition"] == {"StringEquals": {
+            "aws:PrincipalAccount": "123456789012", "aws:ResourceAccount": "123456789012",
+        }}
+        if name == "s3":
+            assert statements[1]["Action"] == "s3:GetObject"
+            assert statements[1]["Resource"] == "arn:aws:s3:::prod-us-east-1-starport-layer-bucket/*"
+        else:
+            assert len(statements) == 1
+        if properties["VpcEndpointType"] == "Interface":
+            (group,) = properties["SecurityGroupIds"]
+            assert group["Fn::GetAtt"][0].startswith("MainEndpointsSG")
+
+
+def test_sandbox_endpoints_allow_only_the_detonators_actions(synth):
+    found = endpoints_by_vpc(network_template(synth, "prod", vpc_endpoints=SANDBOX_SQS))
+    assert sorted(found["sandbox"]) == ["s3", "sqs"]
+    for name, properties in found["sandbox"].items():
+        (statement,) = properties["PolicyDocument"]["Statement"]
+        actions = statement["Action"]
+        assert sorted(actions if isinstance(actions, list) else [actions]) == sorted(vpc_endpoints.SANDBOX_SERVICES[name])
+        assert statement["Condition"]["StringEquals"]["aws:ResourceAccount"] == "123456789012"
+
+
+def test_main_endpoints_security_group_admits_https_from_the_vpc(synth):
+    network_template(synth, "prod").has_resource_properties("AWS::EC2::SecurityGroup", {
+        "GroupDescription": "Interface VPC endpoints in the main VPC",
+        "SecurityGroupIngress": [Match.object_like({
+            "IpProtocol": "tcp", "FromPort": 443, "ToPort": 443, "Description": "HTTPS from the main VPC",
+        })],
+    })
+
+
+def test_sandbox_s3_gateway_egress_uses_the_prefix_list(synth):
+    network_template(synth, "prod").has_resource_properties("AWS::EC2::SecurityGroupEgress", {
+        "Description": "S3 through the sandbox gateway endpoint",
+        "DestinationPrefixListId": Match.any_value(),
+        "FromPort": 443,
+        "ToPort": 443,
+    })
+
+
+def test_sandbox_interface_endpoints_answer_the_detonator_only(synth):
+    template = network_template(synth, "prod", vpc_endpoints=SANDBOX_SQS)
+    template.has_resource_properties("AWS::EC2::SecurityGroup", {
+        "GroupDescription": "Interface VPC endpoints in the sandbox VPC",
+        "SecurityGroupIngress": Match.absent(),
+    })
+    template.has_resource_properties("AWS::EC2::SecurityGroupIngress", {
+        "Description": "HTTPS from Sandbox Lambda functions",
+        "FromPort": 443,
+        "ToPort": 443,
+        "SourceSecurityGroupId": {"Fn::GetAtt": [Match.string_like_regexp("SandboxLambdaSG"), "GroupId"]},
+    })
+    template.has_resource_properties("AWS::EC2::SecurityGroupEgress", {
+        "Description": "AWS APIs through the sandbox interface endpoints",
+        "FromPort": 443,
+        "DestinationSecurityGroupId": {"Fn::GetAtt": [Match.string_like_regexp("SandboxEndpointsSG"), "GroupId"]},
+    })
+
+
+def test_sandbox_has_no_interface_security_group_by_default(synth):
+    network_template(synth, "prod").resource_properties_count_is("AWS::EC2::SecurityGroup", {
+        "GroupDescription": "Interface VPC endpoints in the sandbox VPC",
+    }, 0)
+
+
+def test_override_replaces_one_vpc_list():
+    selection = vpc_endpoints.resolve("staging", json.dumps({"staging": {"main": ["s3"]}}))
+    assert selection == {"main": ["s3"], "sandbox": vpc_endpoints.ENDPOINTS["staging"]["sandbox"]}
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"dev": {"sandbox": ["secretsmanager"]}}, "way out of the sandbox"),
+    ({"dev": {"main": ["ecr"]}}, "needs the s3 gateway"),
+    ({"dev": {"main": ["nope"]}}, "unknown VPC endpoint services"),
+    ({"dev": {"main": ["s3", "s3"]}}, "listed twice"),
+    ({"dev": {"main": "s3"}}, "must be a list"),
+    ({"dev": {"other": []}}, "unknown VPCs"),
+    ({"dev": ["s3"]}, "object keyed by VPC"),
+    (["s3"], "object keyed by environment"),
+    ("not json", "not valid JSON"),
+])
+def test_unsupported_overrides_are_rejected(overrides, message):
+    raw = overrides if isinstance(overrides, str) else json.dumps(overrides)
+    with pytest.raises(ValueError, match=message):
+        vpc_endpoints.resolve("dev", raw)
+
+
+def test_unsupported_override_fails_synth(synth):
+    with pytest.raises(ValueError, match="way out of the sandbox"):
+        synth("prod", vpc_endpoints=json.dumps({"prod": {"sandbox": ["s3", "sts"]}}))
@@ -0,0 +1,54 @@
+"""Secret lookups in lambda/common/python/scanner_common/warm_cache.py"""
+
+import os
+import sys
+
+import pytest
+
+from tests.conftest import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "lambda", "common", "python"))
+
+from scanner_common import warm_cache  # noqa: E402
+
+ARN = "arn:aws:secretsmanager:us-east-1:123456789012:secret:openai"
+
+
+class _SecretsManager:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def get_secret_value(self, SecretId):
+        self.calls += 1
+        return {"SecretString": self.value}
+
+
+@pytest.fixture
+def secret(monkeypatch):
+    def _secret(value):
+        client = _SecretsManager(value)
+        monkeypatch.setattr(warm_cache, "get_boto3_client", lambda name: client)
+        warm_cache.refresh_secret(ARN)
+        return client
+    yield _secret
+    warm_cache.refresh_secret(ARN)
+
+
+def test_field_of_a_json_secret(secret):
+    client = secret('{"OPENAI_API_KEY": "sk-test"}')
+    assert warm_cache.get_secret(ARN, field="OPENAI_API_KEY") == "sk-test"
+    assert warm_cache.get_secret(ARN, field="OTHER") is None
+    assert client.calls == 1
+
+
+def test_plain_string_secret_without_field(secret):
+    secret("sk-plain")
+    assert warm_cache.get_secret(ARN) == "sk-plain"
+
+
+@pytest.mark.parametrize("value", ["sk-plain", '["sk-test"]', '"sk-test"', "42"])
+def test_field_of_a_non_object_secret_names_secret_and_field(secret, value):
+    secret(value)
+    with pytest.raises(ValueError, match=f"{ARN}.*'OPENAI_API_KEY'"):
+        warm_cache.get_secret(ARN, field="OPENAI_API_KEY")
@@ -0,0 +1,95 @@
+"""Fork server of the detonator (lambda/script_detonator/zygote.py) against plain subprocesses"""
+
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.platform != "linux", reason="the zygote needs fork() and fd passing")
+
+SCRIPTS = {
+    "exit_0": "import sys\nprint('vulnerable')\nsys.exit(0)\n",
+    "exit_3": "import sys\nsys.stderr.write('inconclusive\\n')\nsys.exit(3)\n",
+    "exit_message": "import sys\nsys.exit('target refused the probe')\n",
+    "fall_through": "print('no explicit exit')\n",
+    "raise_exit": "raise SystemExit(2)\n",
+    "exception": "def probe():\n    raise ValueError('bad response')\n\nprobe()\n",
+    "env": ("import os, sys\nprint(os.environ['TARGET_URL'], os.environ['SCAN_ID'], os.environ.get('ONLY_PARENT'))\n"
+            "print(sys.argv[0] == __file__, __name__)\nsys.exit(1)\n"),
+    "atexit_and_threads": ("import atexit, sys, threading, time\n"
+                           "atexit.register(lambda: print('atexit ran'))\n"
+                           "t = threading.Thread(target=lambda: (time.sleep(0.2), print('thread done')))\n"
+                           "t.start()\nprint('main done')\n"),
+    "killed": "import os, signal\nprint('about to die', flush=True)\nos.kill(os.getpid(), signal.SIGTERM)\n",
+    "stdin": "import sys\nprint(repr(sys.stdin.read()))\nsys.exit(1)\n",
+}
+
+
+@pytest.fixture
+def execution(detonator):
+    import execution
+    return execution
+
+
+def run(execution, monkeypatch, tmp_path, name, use_zygote):
+    monkeypatch.setenv("DETONATOR_USE_ZYGOTE", "true" if use_zygote else "false")
+    path = tmp_path / f"{name}.py"
+    path.write_text(SCRIPTS[name])
+    env = {"PATH": os.environ.get("PATH", ""), "TARGET_URL": "http://10.0.0.1/", "SCAN_ID": "zy"}
+    result = execution.run_script(str(path), env, timeout=20)
+    assert result.runner == ("zygote" if use_zygote else "subprocess")
+    return result
+
+
+@pytest.mark.parametrize("name", sorted(SCRIPTS))
+def test_forked_script_matches_a_plain_subprocess(execution, monkeypatch, tmp_path, name):
+    monkeypatch.setenv("ONLY_PARENT", "leaks if set")
+    forked = run(execution, monkeypatch, tmp_path, name, use_zygote=True)
+    plain = run(execution, monkeypatch, tmp_path, name, use_zygote=False)
+    assert (forked.returncode, forked.stdout, forked.stderr) == (plain.returncode, plain.stdout, plain.stderr)
+    assert not forked.timed_out
+
+
+def test_parity_cases_behave_like_python(execution, monkeypatch, tmp_path):
+    results = {name: run(execution, monkeypatch, tmp_path, name, use_zygote=True) for name in SCRIPTS}
+    assert results["exit_message"].returncode == 1
+    assert results["exit_message"].stderr.strip() == "target refused the probe"
+    assert "ValueError: bad response" in results["exception"].stderr
+    assert results["env"].stdout.split() == ["http://10.0.0.1/", "zy", "None", "True", "__main__"]
+    assert results["atexit_and_threads"].stdout.splitlines() == ["main done", "thread done", "atexit ran"]
+    assert results["killed"].returncode == -signal.SIGTERM
+    assert results["stdin"].stdout.strip() == "''"
+
+
+def test_zygote_restarts_after_it_dies(execution, monkeypatch, tmp_path):
+    first = execution.get_zygote()
+    assert first is not None and first.alive
+    first._proc.kill()
+    first._proc.wait()
+    deadline = time.monotonic() + 5
+    while first.alive and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not first.alive
+
+    result = run(execution, monkeypatch, tmp_path, "exit_3", use_zygote=True)
+    assert result.returncode == 3
+    second = execution.get_zygote()
+    assert second is not first and second.alive
+
+
+def test_dead_zygote_refuses_requests(execution):
+    import zygote
+    server = zygote.Zygote()
+    server.close()
+    deadline = time.monotonic() + 5
+    while server.alive and time.monotonic() < deadline:
+        time.sleep(0.01)
+    r, w = os.pipe()
+    try:
+        with pytest.raises(zygote.ZygoteError):
+            server.spawn("/nonexistent.py", {}, w, w)
+    finally:
+        os.close(r)
+        os.close(w)